@@ -0,0 +1,92 @@
+"""Micro-benchmark of the blacklist of the community group, comparing the loop over the words the bot used to run
+with the compiled matcher, for blacklists of different sizes over a realistic volume of comments.
+It also compares the two ways the matcher can check a comment, the loop and the regular expression,
+around the size where the regular expression becomes faster, which sets ``REGEX_MIN_WORDS``.
+Run it from the root of the repository with ``python script/benchmark_blacklist.py``"""
+
+import random
+import re
+import string
+import time
+
+from spotted.data import Config
+from spotted.utils.blacklist_util import REGEX_MIN_WORDS, BlacklistMatcher
+
+N_COMMENTS = 10000
+BLACKLIST_SIZES = (10, 100, 1000, 5000)
+CROSSOVER_SIZES = (25, 50, 75, 100, 125, 150, 200, 250, 500)
+VOCABULARY = "lezione esame prof appunti aula orario domani qualcuno sa se oggi c'è ricevimento grazie mille".split()
+
+
+def random_word(rng: random.Random) -> str:
+    """Generates a word that looks like a spam word or a link"""
+    return "".join(rng.choices(string.ascii_lowercase + string.digits + "._/", k=rng.randint(5, 20)))
+
+
+def random_comment(rng: random.Random, blacklist: list[str]) -> str:
+    """Generates a comment of a few dozen words, of which about one every hundred contains a word of the blacklist"""
+    words = rng.choices(VOCABULARY, k=rng.randint(3, 60))
+    if rng.random() < 0.01:
+        words.insert(rng.randrange(len(words)), rng.choice(blacklist))
+    return " ".join(words)
+
+
+def loop_matches(blacklist: list[str], text: str) -> bool:
+    """Loop over the words of the blacklist, as spam_comment_msg did before the compiled matcher"""
+    return any(word in text for word in blacklist)
+
+
+def measure(function, comments: list[str]) -> tuple[float, int]:
+    """Returns the average time spent on a comment and the number of matches"""
+    start = time.perf_counter()
+    found = sum(1 for comment in comments if function(comment))
+    return (time.perf_counter() - start) / len(comments), found
+
+
+def crossover():
+    """Prints the cost of checking a comment with the loop and with the regular expression, near their crossover"""
+    rng = random.Random(42)
+    print(f"\nREGEX_MIN_WORDS = {REGEX_MIN_WORDS}")
+    print(f"{'words':>6}{'loop':>12}{'regex':>12}{'speedup':>10}")
+    for size in CROSSOVER_SIZES:
+        blacklist = [random_word(rng) for _ in range(size)]
+        comments = [random_comment(rng, blacklist) for _ in range(N_COMMENTS)]
+        pattern = re.compile(BlacklistMatcher.build_regex(blacklist))
+        loop, found_loop = min(
+            measure(lambda comment, blacklist=blacklist: loop_matches(blacklist, comment), comments) for _ in range(5)
+        )
+        regex, found_regex = min(
+            measure(lambda comment, pattern=pattern: pattern.search(comment) is not None, comments) for _ in range(5)
+        )
+        assert found_loop == found_regex
+        print(f"{size:>6}{loop * 1e6:>10.2f}µs{regex * 1e6:>10.2f}µs{loop / regex:>9.1f}x")
+
+
+def main():
+    """Prints the cost of checking a comment, with the loop and with the matcher, for each size of the blacklist"""
+    rng = random.Random(42)
+    print(f"{'words':>6}{'options':>18}{'loop':>12}{'matcher':>12}{'speedup':>10}{'compile':>12}")
+    for size in BLACKLIST_SIZES:
+        blacklist = [random_word(rng) for _ in range(size)]
+        comments = [random_comment(rng, blacklist) for _ in range(N_COMMENTS)]
+        for normalize in (False, True):
+            Config.override_settings(
+                {"post": {"blacklist_messages": blacklist, "blacklist_normalize": normalize}}
+            )
+            start = time.perf_counter()
+            BlacklistMatcher.compile()
+            compile_time = time.perf_counter() - start
+
+            before, found_before = measure(lambda comment, blacklist=blacklist: loop_matches(blacklist, comment), comments)
+            after, found_after = measure(BlacklistMatcher.matches, comments)
+            assert found_before == found_after
+            options = "normalize" if normalize else "none"
+            print(
+                f"{size:>6}{options:>18}{before * 1e6:>10.2f}µs{after * 1e6:>10.2f}µs"
+                f"{before / after:>9.1f}x{compile_time * 1e3:>10.2f}ms"
+            )
+    crossover()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Micro-benchmark of the dispatch of the callback queries, comparing the chain of regex CallbackQueryHandlers
+the bot used to register with the prefix router that replaced it.
+Run it from the root of the repository with ``python script/benchmark_callbacks.py``"""
+
+import timeit
+
+from telegram import CallbackQuery, Update, User
+from telegram.ext import CallbackQueryHandler
+
+from spotted.utils.callback_util import CallbackRouter
+
+NUMBER = 20000
+
+PATTERNS = {
+    "settings": r"^settings\.*",
+    "approve_yes": r"^approve_yes$",
+    "approve_no": r"^approve_no$",
+    "approve_status": r"^approve_status\.*",
+    "autoreply": r"^autoreply\.*",
+    "follow_spot": r"^follow_\.*",
+}
+
+CALLBACKS = ["settings,anonimo", "approve_yes", "approve_status,pause,3", "autoreply,1a2b3c,4", "follow_spot"]
+
+
+async def callback(_, __):
+    """Does nothing"""
+
+
+def find_handler(handlers: list[CallbackQueryHandler], update: Update):
+    """Tests the handlers in order, like the application does, and returns the args of the first match"""
+    for handler in handlers:
+        if handler.check_update(update):
+            return update.callback_query.data.split(",")[1:]  # EventInfo.args used to split the data again
+    return None
+
+
+def main():
+    """Prints the cost of finding the handler of each callback query, with the regex chain and with the router"""
+    handlers = [CallbackQueryHandler(callback, pattern=pattern) for pattern in PATTERNS.values()]
+    router = CallbackRouter({prefix: callback for prefix in PATTERNS})
+    user = User(1, "user", False)
+
+    print(f"{'callback data':<26}{'regex chain':>14}{'router':>12}{'speedup':>10}")
+    for data in CALLBACKS:
+        update = Update(0, callback_query=CallbackQuery("1", user, "chat", data=data))
+        before = timeit.timeit(lambda update=update: find_handler(handlers, update), number=NUMBER) / NUMBER
+        after = timeit.timeit(lambda update=update: router.check_update(update).args, number=NUMBER) / NUMBER
+        print(f"{data:<26}{before * 1e6:>12.2f}µs{after * 1e6:>10.2f}µs{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
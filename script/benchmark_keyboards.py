@@ -0,0 +1,44 @@
+"""Micro-benchmark of the keyboards built by the bot, comparing the cost of a call with and without the cache.
+Run it from the root of the repository with ``python script/benchmark_keyboards.py``"""
+
+import timeit
+
+from spotted.utils.keyboard_util import (
+    KeyboardCache,
+    get_confirm_kb,
+    get_paused_kb,
+    get_preview_kb,
+    get_published_post_kb,
+    get_settings_kb,
+)
+
+NUMBER = 20000
+
+KEYBOARDS = {
+    "get_confirm_kb()": get_confirm_kb,
+    "get_preview_kb()": get_preview_kb,
+    "get_settings_kb()": get_settings_kb,
+    "get_published_post_kb()": get_published_post_kb,
+    "get_paused_kb(0, 6)": lambda: get_paused_kb(0, 6),
+    "get_paused_kb(1, 6)": lambda: get_paused_kb(1, 6),
+}
+
+
+def uncached(builder):
+    """Calls the builder after emptying the cache, which is the cost of a call before the cache was added"""
+    KeyboardCache.clear()
+    return builder()
+
+
+def main():
+    """Prints the cost of a call of each keyboard, with and without the cache"""
+    print(f"{'keyboard':<26}{'uncached':>12}{'cached':>12}{'speedup':>10}")
+    for name, builder in KEYBOARDS.items():
+        before = timeit.timeit(lambda builder=builder: uncached(builder), number=NUMBER) / NUMBER
+        builder()  # warm up the cache
+        after = timeit.timeit(builder, number=NUMBER) / NUMBER
+        print(f"{name:<26}{before * 1e6:>10.2f}µs{after * 1e6:>10.2f}µs{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,95 @@
 """Modules used in this bot"""
 
+import asyncio
+import secrets
+import signal
+from contextlib import suppress
+
+from telegram import Update
 from telegram.ext import Application
 
-from spotted.data import Config, init_db
+from spotted.data import Config, SqlitePersistence, close_db, init_db
 from spotted.handlers import add_commands, add_handlers, add_jobs
+from spotted.utils.broadcast_util import follow_broadcaster
+from spotted.utils.purge_util import purge_engine
+from spotted.utils.rate_limit_util import OutboundRateLimiter
+from spotted.utils.update_processor_util import ChatUpdateProcessor
+from spotted.utils.webhook_util import WebhookServer
+
+
+async def shutdown_bot(_: Application):
+    """Releases the resources held by the bot once the application has stopped
+
+    Args:
+        _: supplied application
+    """
+    await follow_broadcaster.close()
+    await purge_engine.close()
+    close_db()
+
+
+async def run_webhook(application: Application):
+    """Serves the bot with the embedded webhook server, until the process receives SIGINT or SIGTERM
+
+    Args:
+        application: application that will process the updates
+    """
+    # without a secret token, anyone who can reach the server could forge updates
+    secret_token = Config.debug_get("webhook_secret_token") or secrets.token_urlsafe(32)
+    server = WebhookServer(
+        application,
+        listen=Config.debug_get("webhook_listen"),
+        port=Config.debug_get("webhook_port"),
+        url_path=Config.debug_get("webhook_path"),
+        secret_token=secret_token,
+    )
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for stop_signal in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):  # signal handlers are not available on Windows
+            loop.add_signal_handler(stop_signal, stop_event.set)
+
+    try:
+        await application.initialize()
+        if application.post_init is not None:
+            await application.post_init(application)
+        await server.start()
+        await application.start()
+        # chat_member updates are not sent by Telegram unless explicitly requested
+        await application.bot.set_webhook(
+            url=Config.debug_get("webhook_url"), allowed_updates=Update.ALL_TYPES, secret_token=secret_token
+        )
+        await stop_event.wait()
+    finally:  # the same steps Application.run_polling takes when stopping
+        await server.stop()
+        if application.running:
+            await application.stop()
+            if application.post_stop is not None:  # only called if the application was stopped
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown is not None:
+            await application.post_shutdown(application)
 
 
 def run_bot():
     """Init the database, add the handlers and start the bot"""
 
     init_db()
-    application = Application.builder().token(Config.settings_get("token")).post_init(add_commands).build()
+    builder = (
+        Application.builder()
+        .token(Config.settings_get("token"))
+        .rate_limiter(OutboundRateLimiter())
+        .concurrent_updates(ChatUpdateProcessor(Config.debug_get("concurrent_updates")))
+        .post_init(add_commands)
+        .post_shutdown(shutdown_bot)
+    )
+    if (persistence_interval := Config.debug_get("persistence_interval")) > 0:
+        builder.persistence(SqlitePersistence(update_interval=persistence_interval))
+    application = builder.build()
     add_handlers(application)
     add_jobs(application)
 
-    application.run_polling()
+    if Config.debug_get("webhook_url"):  # telegram pushes the updates to the embedded server
+        asyncio.run(run_webhook(application))
+    else:  # chat_member updates are not sent by Telegram unless explicitly requested
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
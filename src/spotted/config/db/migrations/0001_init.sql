@@ -1,4 +1,4 @@
-/*Used to instantiate the database the first time*/
+/*Initial schema of the database*/
 CREATE TABLE IF NOT EXISTS pending_post
 (
   user_id BIGINT NOT NULL,
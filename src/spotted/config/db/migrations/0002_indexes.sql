@@ -0,0 +1,12 @@
+/*Secondary indexes for the columns used by the most frequent lookups*/
+CREATE INDEX IF NOT EXISTS idx_pending_post_user_id ON pending_post (user_id);
+-----
+CREATE INDEX IF NOT EXISTS idx_admin_votes_post ON admin_votes (admin_group_id, g_message_id, is_upvote);
+-----
+CREATE INDEX IF NOT EXISTS idx_user_follow_message_id ON user_follow (message_id);
+-----
+CREATE INDEX IF NOT EXISTS idx_user_report_user_id_date ON user_report (user_id, message_date);
+-----
+CREATE INDEX IF NOT EXISTS idx_user_report_group_message ON user_report (admin_group_id, g_message_id);
+-----
+CREATE INDEX IF NOT EXISTS idx_spot_report_group_message ON spot_report (admin_group_id, g_message_id);
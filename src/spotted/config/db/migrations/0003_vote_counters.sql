@@ -0,0 +1,44 @@
+/*Denormalized approve and reject counters on the pending posts, kept in sync with admin_votes by triggers*/
+ALTER TABLE pending_post ADD COLUMN approve_count INTEGER NOT NULL DEFAULT 0;
+-----
+ALTER TABLE pending_post ADD COLUMN reject_count INTEGER NOT NULL DEFAULT 0;
+-----
+UPDATE pending_post SET
+  approve_count = (
+    SELECT COUNT(*) FROM admin_votes
+    WHERE admin_votes.admin_group_id = pending_post.admin_group_id
+      AND admin_votes.g_message_id = pending_post.g_message_id
+      AND admin_votes.is_upvote
+  ),
+  reject_count = (
+    SELECT COUNT(*) FROM admin_votes
+    WHERE admin_votes.admin_group_id = pending_post.admin_group_id
+      AND admin_votes.g_message_id = pending_post.g_message_id
+      AND NOT admin_votes.is_upvote
+  );
+-----
+CREATE TRIGGER IF NOT EXISTS count_new_vote
+   AFTER INSERT ON admin_votes
+    FOR EACH ROW
+BEGIN
+UPDATE pending_post SET approve_count = approve_count + (NEW.is_upvote != 0), reject_count = reject_count + (NEW.is_upvote = 0)
+WHERE admin_group_id = NEW.admin_group_id and g_message_id = NEW.g_message_id;
+END;
+-----
+CREATE TRIGGER IF NOT EXISTS count_changed_vote
+   AFTER UPDATE OF is_upvote ON admin_votes
+    FOR EACH ROW WHEN OLD.is_upvote != NEW.is_upvote
+BEGIN
+UPDATE pending_post SET
+  approve_count = approve_count + (NEW.is_upvote != 0) - (OLD.is_upvote != 0),
+  reject_count = reject_count + (NEW.is_upvote = 0) - (OLD.is_upvote = 0)
+WHERE admin_group_id = NEW.admin_group_id and g_message_id = NEW.g_message_id;
+END;
+-----
+CREATE TRIGGER IF NOT EXISTS count_deleted_vote
+   AFTER DELETE ON admin_votes
+    FOR EACH ROW
+BEGIN
+UPDATE pending_post SET approve_count = approve_count - (OLD.is_upvote != 0), reject_count = reject_count - (OLD.is_upvote = 0)
+WHERE admin_group_id = OLD.admin_group_id and g_message_id = OLD.g_message_id;
+END;
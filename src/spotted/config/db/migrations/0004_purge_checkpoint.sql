@@ -0,0 +1,13 @@
+/*Progress of the /purge command, so that it can be resumed after a restart*/
+CREATE TABLE IF NOT EXISTS purge_checkpoint
+(
+  id INTEGER NOT NULL DEFAULT 1 CHECK (id = 1),
+  chat_id BIGINT NOT NULL,
+  progress_message_id BIGINT DEFAULT NULL,
+  last_channel_id BIGINT DEFAULT NULL,
+  last_c_message_id BIGINT DEFAULT NULL,
+  total INTEGER NOT NULL DEFAULT 0,
+  checked INTEGER NOT NULL DEFAULT 0,
+  lost INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (id)
+);
@@ -0,0 +1,2 @@
+/*Status of the pending posts, claimed atomically by the handler that publishes or rejects the post*/
+ALTER TABLE pending_post ADD COLUMN status VARCHAR(16) NOT NULL DEFAULT 'pending';
@@ -0,0 +1,11 @@
+/*Author of each post published on the channel, kept until its automatic forward reaches the community group*/
+CREATE TABLE IF NOT EXISTS post_author
+(
+  channel_id BIGINT NOT NULL,
+  c_message_id BIGINT NOT NULL,
+  user_id BIGINT NOT NULL,
+  expire_at INTEGER NOT NULL,
+  PRIMARY KEY (channel_id, c_message_id)
+);
+-----
+CREATE INDEX IF NOT EXISTS idx_post_author_expire_at ON post_author (expire_at);
@@ -0,0 +1,9 @@
+/*Data of the bot and state of the conversations, kept across restarts*/
+CREATE TABLE IF NOT EXISTS persistence
+(
+  kind VARCHAR(16) NOT NULL,
+  name VARCHAR(64) NOT NULL DEFAULT '',
+  key VARCHAR(64) NOT NULL DEFAULT '',
+  data BLOB NOT NULL,
+  PRIMARY KEY (kind, name, key)
+);
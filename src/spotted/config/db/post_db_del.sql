@@ -19,4 +19,12 @@ DROP TABLE IF EXISTS user_report
 -----
 DROP TABLE IF EXISTS user_follow
 -----
-DROP TRIGGER IF EXISTS drop_old_warns ON warned_users
\ No newline at end of file
+DROP TABLE IF EXISTS purge_checkpoint
+-----
+DROP TABLE IF EXISTS post_author
+-----
+DROP TABLE IF EXISTS persistence
+-----
+DROP TRIGGER IF EXISTS drop_old_warns ON warned_users
+-----
+PRAGMA user_version = 0
\ No newline at end of file
@@ -2,34 +2,55 @@
 
 from telegram.ext import Application
 
+from .chat_cache import ChatAdminsCache, ChatCache
 from .config import Config
 from .data_reader import get_abs_path, read_md
 from .db_manager import DbManager
-from .pending_post import PendingPost
+from .db_migration import Migration, MigrationManager
+from .pending_post import PendingPost, PendingPostStatus
+from .persistence import SqlitePersistence
+from .post_author import PostAuthorStore
 from .post_data import PostData
 from .published_post import PublishedPost
+from .purge_checkpoint import PurgeCheckpoint
 from .report import Report
-from .user import User
+from .user import User, UserFlagsCache, UserStatus
 
 __all__ = [
     "Application",
+    "ChatAdminsCache",
+    "ChatCache",
     "Config",
     "get_abs_path",
     "read_md",
     "DbManager",
+    "Migration",
+    "MigrationManager",
     "PendingPost",
+    "PendingPostStatus",
+    "PostAuthorStore",
     "PostData",
     "PublishedPost",
+    "PurgeCheckpoint",
     "Report",
+    "SqlitePersistence",
     "User",
+    "UserFlagsCache",
+    "UserStatus",
 ]
 
 
 def init_db():
-    """Initialize the database.
+    """Initialize the database, applying any pending migration of the schema.
     If the debug.reset_on_load setting is True, it will delete the database and create a new one.
     """
     DbManager.register_adapters_and_converters()
     if Config.settings_get("debug", "reset_on_load"):
         DbManager.query_from_file("config", "db", "post_db_del.sql")
-    DbManager.query_from_file("config", "db", "post_db_init.sql")
+    MigrationManager.migrate()
+    DbManager.log_pragmas()
+
+
+def close_db():
+    """Closes all the connections to the database kept open by the connection pool"""
+    DbManager.close()
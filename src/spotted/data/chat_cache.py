@@ -0,0 +1,205 @@
+"""Caches of the information about the chats retrieved from the Telegram API"""
+
+import asyncio
+import time
+from collections import OrderedDict
+
+from telegram import Bot, ChatFullInfo
+
+from .config import Config
+
+
+class ChatCache:
+    """Read-through cache of the results of :meth:`telegram.Bot.get_chat`.
+    It keeps at most ``debug.chat_cache_size`` chats, evicting the least recently used ones,
+    and each chat expires after ``debug.chat_cache_ttl`` seconds.
+    Concurrent lookups of the same chat share a single request to the Telegram API
+    """
+
+    __entries: "OrderedDict[int, tuple[ChatFullInfo, float]]" = OrderedDict()
+    __in_flight: "dict[int, asyncio.Task[ChatFullInfo]]" = {}
+    __loop: asyncio.AbstractEventLoop | None = None
+    hits = 0
+    misses = 0
+
+    @classmethod
+    async def get_chat(cls, bot: Bot, chat_id: int) -> ChatFullInfo:
+        """Returns the chat with the given id, retrieving it from the Telegram API if it is not cached
+
+        Args:
+            bot: bot used to retrieve the chat
+            chat_id: id of the chat
+
+        Returns:
+            the chat
+        """
+        entry = cls.__entries.get(chat_id)
+        if entry is not None and entry[1] > time.monotonic():
+            cls.__entries.move_to_end(chat_id)
+            cls.hits += 1
+            return entry[0]
+
+        loop = asyncio.get_running_loop()
+        if cls.__loop is not loop:  # the requests of another event loop can no longer be awaited
+            cls.__loop = loop
+            cls.__in_flight = {}
+
+        task = cls.__in_flight.get(chat_id)
+        if task is None:
+            cls.misses += 1
+            task = asyncio.create_task(cls.__fetch(bot, chat_id))
+            cls.__in_flight[chat_id] = task
+        # if a caller is cancelled, the request is still completed for the others
+        return await asyncio.shield(task)
+
+    @classmethod
+    async def __fetch(cls, bot: Bot, chat_id: int) -> ChatFullInfo:
+        """Retrieves the chat from the Telegram API and stores it in the cache
+
+        Args:
+            bot: bot used to retrieve the chat
+            chat_id: id of the chat
+
+        Returns:
+            the chat
+        """
+        task = asyncio.current_task()
+        try:
+            chat = await bot.get_chat(chat_id)
+        finally:
+            is_current = cls.__in_flight.get(chat_id) is task
+            if is_current:
+                del cls.__in_flight[chat_id]
+
+        if not is_current:  # the chat has been invalidated while it was being retrieved
+            return chat
+        ttl = Config.debug_get("chat_cache_ttl", default=600)
+        max_size = Config.debug_get("chat_cache_size", default=256)
+        if ttl > 0 and max_size > 0:
+            cls.__entries[chat_id] = (chat, time.monotonic() + ttl)
+            cls.__entries.move_to_end(chat_id)
+            while len(cls.__entries) > max_size:
+                cls.__entries.popitem(last=False)
+        return chat
+
+    @classmethod
+    def invalidate(cls, chat_id: int):
+        """Removes the chat from the cache.
+        A request for the same chat still in progress will not store its result
+
+        Args:
+            chat_id: id of the chat
+        """
+        cls.__entries.pop(chat_id, None)
+        cls.__in_flight.pop(chat_id, None)
+
+    @classmethod
+    def clear(cls):
+        """Removes all the cached chats and resets the counters"""
+        cls.__entries.clear()
+        cls.__in_flight.clear()
+        cls.hits = 0
+        cls.misses = 0
+
+    @classmethod
+    def size(cls) -> int:
+        """Returns the number of chats currently cached"""
+        return len(cls.__entries)
+
+
+class ChatAdminsCache:
+    """Cache of the ids of the administrators of a chat, used to check who can run the moderation commands.
+    The list is retrieved from Telegram the first time it is needed, and again after ``debug.admins_cache_ttl`` seconds
+    or after a change in the administrators of the chat has been notified to the bot.
+    Concurrent lookups of the same chat share a single request to the Telegram API
+    """
+
+    __entries: dict[int, tuple[frozenset[int], float]] = {}
+    __in_flight: "dict[int, asyncio.Task[frozenset[int]]]" = {}
+    __loop: asyncio.AbstractEventLoop | None = None
+    hits = 0
+    misses = 0
+
+    @classmethod
+    async def get_admins(cls, bot: Bot, chat_id: int) -> frozenset[int]:
+        """Returns the ids of the administrators of the chat
+
+        Args:
+            bot: bot used to retrieve the administrators
+            chat_id: id of the chat
+
+        Returns:
+            ids of the administrators
+        """
+        entry = cls.__entries.get(chat_id)
+        if entry is not None and entry[1] > time.monotonic():
+            cls.hits += 1
+            return entry[0]
+
+        loop = asyncio.get_running_loop()
+        if cls.__loop is not loop:  # the requests of another event loop can no longer be awaited
+            cls.__loop = loop
+            cls.__in_flight = {}
+
+        task = cls.__in_flight.get(chat_id)
+        if task is None:
+            cls.misses += 1
+            task = asyncio.create_task(cls.__fetch(bot, chat_id))
+            cls.__in_flight[chat_id] = task
+        return await asyncio.shield(task)
+
+    @classmethod
+    async def is_admin(cls, bot: Bot, chat_id: int, user_id: int | None) -> bool:
+        """Checks whether the user is an administrator of the chat
+
+        Args:
+            bot: bot used to retrieve the administrators
+            chat_id: id of the chat
+            user_id: id of the user
+
+        Returns:
+            whether the user is an administrator
+        """
+        return user_id in await cls.get_admins(bot, chat_id)
+
+    @classmethod
+    async def __fetch(cls, bot: Bot, chat_id: int) -> frozenset[int]:
+        """Retrieves the administrators from the Telegram API and stores them in the cache
+
+        Args:
+            bot: bot used to retrieve the administrators
+            chat_id: id of the chat
+
+        Returns:
+            ids of the administrators
+        """
+        task = asyncio.current_task()
+        try:
+            admins = frozenset(admin.user.id for admin in await bot.get_chat_administrators(chat_id))
+        finally:
+            is_current = cls.__in_flight.get(chat_id) is task
+            if is_current:
+                del cls.__in_flight[chat_id]
+
+        ttl = Config.debug_get("admins_cache_ttl", default=3600)
+        if is_current and ttl > 0:  # skip the chats invalidated while they were being retrieved
+            cls.__entries[chat_id] = (admins, time.monotonic() + ttl)
+        return admins
+
+    @classmethod
+    def invalidate(cls, chat_id: int):
+        """Removes the administrators of the chat from the cache, so that they are retrieved again when needed
+
+        Args:
+            chat_id: id of the chat
+        """
+        cls.__entries.pop(chat_id, None)
+        cls.__in_flight.pop(chat_id, None)
+
+    @classmethod
+    def clear(cls):
+        """Removes all the cached administrators and resets the counters"""
+        cls.__entries.clear()
+        cls.__in_flight.clear()
+        cls.hits = 0
+        cls.misses = 0
@@ -15,6 +15,32 @@ SettingsDebugKeys = Literal[
     "log_file",
     "log_error_file",
     "db_file",
+    "db_pool_size",
+    "sqlite_pragmas",
+    "user_cache_size",
+    "user_cache_ttl",
+    "chat_cache_size",
+    "chat_cache_ttl",
+    "admins_cache_ttl",
+    "notification_concurrency",
+    "rate_limit_global",
+    "rate_limit_chat",
+    "rate_limit_chat_burst",
+    "rate_limit_group",
+    "rate_limit_max_retries",
+    "purge_concurrency",
+    "purge_progress_interval",
+    "post_author_ttl",
+    "post_author_cache_size",
+    "concurrent_updates",
+    "persistence_interval",
+    "conversation_timeouts",
+    "conversation_timeout_notify",
+    "webhook_url",
+    "webhook_listen",
+    "webhook_port",
+    "webhook_path",
+    "webhook_secret_token",
     "backup_chat_id",
     "backup_keep_pending",
     "crypto_key",
@@ -33,6 +59,8 @@ SettingsPostKeys = Literal[
     "replace_anonymous_comments",
     "delete_anonymous_comments",
     "blacklist_messages",
+    "blacklist_normalize",
+    "blacklist_ignore_case",
     "max_n_warns",
     "warn_expiration_days",
     "mute_default_duration_days",
@@ -51,6 +79,7 @@ class Config:
     DEFAULT_SETTINGS_PATH = str(resources.files("spotted") / "config" / "yaml" / "settings.yaml")
     DEFAULT_AUTOREPLIES_PATH = str(resources.files("spotted") / "config" / "yaml" / "autoreplies.yaml")
     __instance: "Config | None" = None
+    __generation = 0
 
     SETTINGS_PATH = "settings.yaml"
     AUTOREPLIES_PATH = "autoreplies.yaml"
@@ -65,6 +94,7 @@ class Config:
             force_reload: if True, the configuration will be reloaded immediately
         """
         cls.__instance = None
+        cls.__generation += 1
         if force_reload:
             cls.__get_instance()
 
@@ -169,6 +199,17 @@ class Config:
         """
         instance = cls.__get_instance()
         cls.__merge_settings(instance.settings, config)
+        cls.__generation += 1
+
+    @classmethod
+    def generation(cls) -> int:
+        """Counter increased each time the configuration is reloaded or overridden,
+        so that the values derived from it can be invalidated
+
+        Returns:
+            current generation of the configuration
+        """
+        return cls.__generation
 
     def __init__(self):
         if type(self).__instance is not None:
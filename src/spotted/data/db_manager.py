@@ -1,20 +1,183 @@
 """Handles the management of databases"""
 
+import asyncio
 import datetime
 import logging
 import os
+import queue
+import re
 import sqlite3
-from typing import Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from functools import partial
+from typing import Any, Callable, Iterator, TypeVar
 
 from .config import Config
 from .data_reader import read_file
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+PRAGMA_RE = re.compile(r"^[a-z_]+$")
+PRAGMA_VALUE_RE = re.compile(r"^-?\w+$")
 
-class DbManager:
+
+class ConnectionPool:
+    """Keeps long-lived connections to the sqlite database, so that queries do not pay for a new connection each time.
+    A single writer connection is shared behind a lock, since sqlite only allows one writer at a time,
+    while up to ``max_readers`` connections are kept for read-only queries.
+
+    Args:
+        db_file: path to the database file
+        max_readers: maximum number of reader connections kept open
+        pragmas: PRAGMA statements applied to each new connection, as a name -> value dictionary
+    """
+
+    def __init__(self, db_file: str, max_readers: int = 4, pragmas: dict[str, Any] | None = None):
+        self.db_file = db_file
+        self.pragmas = pragmas if pragmas is not None else {}
+        self.__writer: sqlite3.Connection | None = None
+        self.__writer_lock = threading.RLock()
+        self.__readers: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self.__readers_slots = threading.BoundedSemaphore(max(1, max_readers))
+        self.__closed = False
+
+    @property
+    def closed(self) -> bool:
+        """Whether the pool has been shut down"""
+        return self.__closed
+
+    def __connect(self) -> sqlite3.Connection:
+        """Opens a new connection to the database file, creating the file if it does not exist
+
+        Returns:
+            new sqlite connection, usable from any thread
+        """
+        if not os.path.exists(self.db_file):
+            with open(self.db_file, "w", encoding="utf-8"):
+                pass
+        conn = sqlite3.connect(self.db_file, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self.apply_pragmas(conn, self.pragmas)
+        return conn
+
+    @staticmethod
+    def apply_pragmas(conn: sqlite3.Connection, pragmas: dict[str, Any]):
+        """Applies the PRAGMA statements to the connection.
+        Names and values are validated, since they cannot be passed as query parameters
+
+        Args:
+            conn: connection the pragmas will be applied to
+            pragmas: PRAGMA statements to apply, as a name -> value dictionary
+        """
+        for name, value in pragmas.items():
+            if isinstance(value, bool):
+                value = int(value)
+            if not PRAGMA_RE.match(str(name)) or not PRAGMA_VALUE_RE.match(str(value)):
+                logger.warning("ConnectionPool: ignoring invalid pragma '%s = %s'", name, value)
+                continue
+            try:
+                conn.execute(f"PRAGMA {name} = {value}").fetchall()
+            except sqlite3.Error as ex:
+                logger.error("ConnectionPool: applying pragma '%s = %s': %s", name, value, ex)
+
+    @staticmethod
+    def __reset(conn: sqlite3.Connection) -> bool:
+        """Rolls back any transaction left open on the connection, so it can be safely reused
+
+        Args:
+            conn: connection to reset
+
+        Returns:
+            whether the connection is still usable
+        """
+        try:
+            conn.rollback()
+            return True
+        except sqlite3.Error as ex:
+            logger.warning("ConnectionPool: discarding broken connection: %s", ex)
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            return False
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Lends the writer connection. Only one thread at a time can hold it.
+        The transaction is committed when the block exits and rolled back if an exception is raised
+
+        Yields:
+            writer connection
+        """
+        with self.__writer_lock:
+            if self.__closed:
+                raise sqlite3.ProgrammingError("Cannot operate on a closed connection pool")
+            if self.__writer is None:
+                self.__writer = self.__connect()
+            conn = self.__writer
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                if not self.__reset(conn):
+                    self.__writer = None
+                raise
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Lends one of the reader connections, opening a new one if all are busy and the pool is not full.
+        Otherwise, it waits for one to be returned
+
+        Yields:
+            reader connection
+        """
+        if self.__closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed connection pool")
+        with self.__readers_slots:
+            try:
+                conn = self.__readers.get_nowait()
+            except queue.Empty:
+                conn = self.__connect()
+
+            usable = True
+            try:
+                yield conn
+            except BaseException:
+                usable = self.__reset(conn)
+                raise
+            finally:
+                if usable and conn.in_transaction:
+                    usable = self.__reset(conn)
+                if usable and not self.__closed:
+                    self.__readers.put(conn)
+                elif usable:
+                    conn.close()
+
+    def close(self):
+        """Closes all the connections held by the pool.
+        Connections currently lent will be closed as soon as they are returned
+        """
+        self.__closed = True
+        with self.__writer_lock:
+            if self.__writer is not None:
+                self.__writer.close()
+                self.__writer = None
+        while True:
+            try:
+                conn = self.__readers.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+
+class DbManager:  # pylint: disable=too-many-public-methods
     """Class that handles the management of databases"""
 
+    __pool: ConnectionPool | None = None
+    __pool_lock = threading.Lock()
+    __executor: ThreadPoolExecutor | None = None
+
     @staticmethod
     def register_adapters_and_converters():
         """
@@ -72,10 +235,168 @@ class DbManager:
             with open(db_file, "w", encoding="utf-8"):
                 pass
         conn = sqlite3.connect(db_file, detect_types=sqlite3.PARSE_DECLTYPES)
+        ConnectionPool.apply_pragmas(conn, Config.debug_get("sqlite_pragmas", default={}))
         conn.row_factory = cls.row_factory
         cur = conn.cursor()
         return conn, cur
 
+    @classmethod
+    def get_pool(cls) -> ConnectionPool:
+        """Returns the connection pool bound to the database file currently set in the configuration.
+        If the file changed since the last call, or the pool has been closed, a new pool is created
+
+        Returns:
+            connection pool used by all the queries
+        """
+        db_file = Config.debug_get("db_file")
+        with cls.__pool_lock:
+            if cls.__pool is None or cls.__pool.closed or cls.__pool.db_file != db_file:
+                if cls.__pool is not None:
+                    cls.__pool.close()
+                cls.__pool = ConnectionPool(
+                    db_file,
+                    max_readers=Config.debug_get("db_pool_size", default=4),
+                    pragmas=Config.debug_get("sqlite_pragmas", default={}),
+                )
+            return cls.__pool
+
+    @classmethod
+    def get_pragmas(cls, *names: str) -> dict[str, Any]:
+        """Reads the current value of the requested pragmas from the database.
+        If no name is provided, the pragmas listed in the ``sqlite_pragmas`` setting are read
+
+        Args:
+            names: names of the pragmas to read
+
+        Returns:
+            name -> current value dictionary
+        """
+        names = names or tuple(Config.debug_get("sqlite_pragmas", default={}))
+        pragmas: dict[str, Any] = {}
+        with cls.get_pool().reader() as conn:
+            for name in names:
+                if not PRAGMA_RE.match(name):
+                    continue
+                row = conn.execute(f"PRAGMA {name}").fetchone()
+                pragmas[name] = row[0] if row else None
+        return pragmas
+
+    @classmethod
+    def log_pragmas(cls):
+        """Logs the pragmas currently active on the database connections,
+        warning about any value that differs from the one requested in the ``sqlite_pragmas`` setting
+        """
+        requested = Config.debug_get("sqlite_pragmas", default={})
+        active = cls.get_pragmas(*requested)
+        logger.info("Database pragmas: %s", active)
+        for name, value in requested.items():
+            if name in active and str(active[name]).lower() != str(value).lower():
+                logger.warning("Database pragma '%s' is '%s' instead of '%s'", name, active[name], value)
+
+    @classmethod
+    def backup(cls, path: str):
+        """Copies a consistent snapshot of the database in the file at the given path, replacing its content.
+        Unlike a copy of the database file, the snapshot includes the data still in the write-ahead log,
+        and it can't be torn by a write happening at the same time
+
+        Args:
+            path: path of the backup file
+        """
+        with cls.get_pool().reader() as conn, closing(sqlite3.connect(path)) as target:
+            conn.backup(target)
+
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        """Returns the thread executor dedicated to the database queries, creating it if needed.
+        There is a worker for each reader connection, plus one for the writer
+
+        Returns:
+            thread executor used by the async methods
+        """
+        with cls.__pool_lock:
+            if cls.__executor is None:
+                cls.__executor = ThreadPoolExecutor(
+                    max_workers=Config.debug_get("db_pool_size", default=4) + 1, thread_name_prefix="spotted_db"
+                )
+            return cls.__executor
+
+    @classmethod
+    def close(cls):
+        """Closes all the pooled connections to the database and stops the database executor.
+        A new pool will be created the next time a query is executed
+        """
+        with cls.__pool_lock:
+            executor, cls.__executor = cls.__executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        with cls.__pool_lock:
+            if cls.__pool is not None:
+                cls.__pool.close()
+                cls.__pool = None
+
+    @classmethod
+    async def run_async(cls, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Runs a blocking function that accesses the database on the dedicated executor,
+        so that the event loop is never stalled by a slow or locked database
+
+        Args:
+            func: function to run
+            args: positional arguments passed to the function
+            kwargs: keyword arguments passed to the function
+
+        Returns:
+            value returned by the function
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls.get_executor(), partial(func, *args, **kwargs))
+
+    @classmethod
+    @contextmanager
+    def _writer_cursor(cls) -> Iterator[sqlite3.Cursor]:
+        """Yields a cursor on the pooled writer connection. The changes are committed when the block exits
+
+        Yields:
+            database cursor
+        """
+        with cls.get_pool().writer() as conn:
+            cur = conn.cursor()
+            cur.row_factory = cls.row_factory
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+    @classmethod
+    @contextmanager
+    def transaction(cls) -> Iterator[sqlite3.Cursor]:
+        """Yields a cursor on the writer connection, inside an immediate transaction.
+        All the queries executed with it are committed together when the block exits,
+        or rolled back if an exception is raised.
+        Unlike the other methods, the queries use ? placeholders and errors are not swallowed
+
+        Yields:
+            database cursor
+        """
+        with cls._writer_cursor() as cur:
+            cur.execute("BEGIN IMMEDIATE")
+            yield cur
+
+    @classmethod
+    @contextmanager
+    def _reader_cursor(cls) -> Iterator[sqlite3.Cursor]:
+        """Yields a cursor on one of the pooled reader connections
+
+        Yields:
+            database cursor
+        """
+        with cls.get_pool().reader() as conn:
+            cur = conn.cursor()
+            cur.row_factory = cls.row_factory
+            try:
+                yield cur
+            finally:
+                cur.close()
+
     @classmethod
     def query_from_file(cls, *file_path: str):
         """Commits all the queries in the specified file. The queries must be separated by a ----- string
@@ -84,13 +405,10 @@ class DbManager:
         Args:
             file_path: path of the text file containing the queries
         """
-        conn, cur = cls.get_db()
         queries = read_file(*file_path).split("-----")
-        for query in queries:
-            cls.__query_execute(cur=cur, query=query, error_str="query_from_file")
-        conn.commit()
-        cur.close()
-        conn.close()
+        with cls._writer_cursor() as cur:
+            for query in queries:
+                cls.__query_execute(cur=cur, query=query, error_str="query_from_file")
 
     @classmethod
     def query_from_string(cls, *queries: str):
@@ -100,13 +418,9 @@ class DbManager:
         Args:
             queries: tuple of queries
         """
-        conn, cur = cls.get_db()
-        for query in queries:
-            cls.__query_execute(cur=cur, query=query, error_str="query_from_string")
-
-        conn.commit()
-        cur.close()
-        conn.close()
+        with cls._writer_cursor() as cur:
+            for query in queries:
+                cls.__query_execute(cur=cur, query=query, error_str="query_from_string")
 
     @classmethod
     def select_from(
@@ -132,25 +446,77 @@ class DbManager:
         Returns:
             rows from the select
         """
-        conn, cur = cls.get_db()
-
         where = where.replace("%s", "?")
         where = f"WHERE {where}" if where else ""
         group_by = f"GROUP BY {group_by}" if group_by else ""
         order_by = f"ORDER BY {order_by}" if order_by else ""
 
-        cls.__query_execute(
-            cur=cur,
-            query=f"SELECT {select} FROM {table_name} {where} {group_by} {order_by}",
-            args=where_args,
-            error_str="select_from",
-        )
+        with cls._reader_cursor() as cur:
+            cls.__query_execute(
+                cur=cur,
+                query=f"SELECT {select} FROM {table_name} {where} {group_by} {order_by}",
+                args=where_args,
+                error_str="select_from",
+            )
+            return cur.fetchall()
+
+    @classmethod
+    def iter_select_from(
+        cls,
+        table_name: str,
+        select: str = "*",
+        where: str = "",
+        where_args: tuple | None = None,
+        order_by: str = "",
+        batch_size: int = 100,
+    ) -> Iterator[dict[str, Any]]:
+        """Lazily yields the results of a query, fetching them from the database in batches.
+        Executes "SELECT select FROM table_name [WHERE where (with where_args)] [ORDER BY order_by]".
+        A reader connection is held until the iterator is exhausted or closed
+
+        Args:
+            table_name: name of the table used in the FROM
+            select: columns considered for the query
+            where: where clause, with %s placeholders for the where_args
+            where_args: args used in the where clause
+            order_by: order by clause
+            batch_size: number of rows fetched from the database at a time
+
+        Yields:
+            rows from the select, one at a time
+        """
+        where = where.replace("%s", "?")
+        where = f"WHERE {where}" if where else ""
+        order_by = f"ORDER BY {order_by}" if order_by else ""
+
+        with cls._reader_cursor() as cur:
+            cls.__query_execute(
+                cur=cur,
+                query=f"SELECT {select} FROM {table_name} {where} {order_by}",
+                args=where_args,
+                error_str="iter_select_from",
+            )
+            while rows := cur.fetchmany(batch_size):
+                yield from rows
 
-        query_result = cur.fetchall()
-        conn.commit()
-        cur.close()
-        conn.close()
-        return query_result
+    @classmethod
+    def select_values(cls, select: str, args: tuple | None = None) -> dict[str, Any]:
+        """Returns the values of some expressions, computed with a single query.
+        Executes "SELECT select", without any FROM clause. Useful to evaluate multiple subqueries at once
+
+        Args:
+            select: expressions to evaluate, with %s placeholders for the args
+            args: args used in the expressions
+
+        Returns:
+            row with the values of the expressions, or an empty dictionary if the query failed
+        """
+        select = select.replace("%s", "?")
+
+        with cls._reader_cursor() as cur:
+            cls.__query_execute(cur=cur, query=f"SELECT {select}", args=args, error_str="select_values")
+            query_result = cur.fetchall()
+        return query_result[0] if len(query_result) > 0 else {}
 
     @classmethod
     def count_from(cls, table_name: str, select: str = "*", where: str = "", where_args: tuple | None = None) -> int:
@@ -166,22 +532,17 @@ class DbManager:
         Returns:
             number of rows
         """
-        conn, cur = cls.get_db()
-
         where = where.replace("%s", "?")
         where = f"WHERE {where}" if where else ""
 
-        cls.__query_execute(
-            cur=cur,
-            query=f"SELECT COUNT({select}) as number FROM {table_name} {where}",
-            args=where_args,
-            error_str="count_from",
-        )
-
-        query_result = cur.fetchall()
-        conn.commit()
-        cur.close()
-        conn.close()
+        with cls._reader_cursor() as cur:
+            cls.__query_execute(
+                cur=cur,
+                query=f"SELECT COUNT({select}) as number FROM {table_name} {where}",
+                args=where_args,
+                error_str="count_from",
+            )
+            query_result = cur.fetchall()
         return query_result[0]["number"] if len(query_result) > 0 else 0
 
     @classmethod
@@ -195,8 +556,6 @@ class DbManager:
             columns: columns that will be inserted, as a tuple of strings
             multiple_rows: whether or not multiple rows will be inserted at the same time
         """
-        conn, cur = cls.get_db()
-
         if multiple_rows:
             placeholders = ", ".join(["?" for _ in values[0]])
         else:
@@ -205,17 +564,14 @@ class DbManager:
         if columns:
             columns = "(" + ", ".join(columns) + ")"
 
-        cls.__query_execute(
-            cur=cur,
-            query=f"INSERT INTO {table_name} {columns} VALUES ({placeholders})",
-            args=values,
-            error_str="insert_into",
-            is_many=multiple_rows,
-        )
-
-        conn.commit()
-        cur.close()
-        conn.close()
+        with cls._writer_cursor() as cur:
+            cls.__query_execute(
+                cur=cur,
+                query=f"INSERT INTO {table_name} {columns} VALUES ({placeholders})",
+                args=values,
+                error_str="insert_into",
+                is_many=multiple_rows,
+            )
 
     @classmethod
     def update_from(cls, table_name: str, set_clause: str, where: str = "", args: tuple | None = None):
@@ -228,19 +584,14 @@ class DbManager:
             where: where clause, with %s placeholders for the where args
             args: args used both in the set clause and in the where clause, in this order
         """
-        conn, cur = cls.get_db()
-
         set_clause = set_clause.replace("%s", "?")
         where = where.replace("%s", "?")
         where = f"WHERE {where}" if where else ""
 
-        cls.__query_execute(
-            cur=cur, query=f"UPDATE {table_name} SET {set_clause} {where}", args=args, error_str="update_from"
-        )
-
-        conn.commit()
-        cur.close()
-        conn.close()
+        with cls._writer_cursor() as cur:
+            cls.__query_execute(
+                cur=cur, query=f"UPDATE {table_name} SET {set_clause} {where}", args=args, error_str="update_from"
+            )
 
     @classmethod
     def delete_from(cls, table_name: str, where: str = "", where_args: tuple | None = None):
@@ -252,15 +603,96 @@ class DbManager:
             where: where clause, with %s placeholders for the where args
             where_args: args used in the where clause
         """
-        conn, cur = cls.get_db()
-
         where = where.replace("%s", "?")
         where = f"WHERE {where}" if where else ""
 
-        cls.__query_execute(
-            cur=cur, query=f"DELETE FROM {table_name} {where}", args=where_args, error_str="delete_from"
-        )
+        with cls._writer_cursor() as cur:
+            cls.__query_execute(
+                cur=cur, query=f"DELETE FROM {table_name} {where}", args=where_args, error_str="delete_from"
+            )
+
+    @classmethod
+    async def aquery_from_string(cls, *queries: str):
+        """Awaitable version of :meth:`query_from_string`, executed on the database executor
+
+        Args:
+            queries: tuple of queries
+        """
+        await cls.run_async(cls.query_from_string, *queries)
+
+    @classmethod
+    async def aselect_from(
+        cls,
+        table_name: str,
+        select: str = "*",
+        where: str = "",
+        where_args: tuple | None = None,
+        group_by: str = "",
+        order_by: str = "",
+    ) -> list:
+        """Awaitable version of :meth:`select_from`, executed on the database executor
 
-        conn.commit()
-        cur.close()
-        conn.close()
+        Args:
+            table_name: name of the table used in the FROM
+            select: columns considered for the query
+            where: where clause, with %s placeholders for the where_args
+            where_args: args used in the where clause
+            group_by: group by clause
+            order_by: order by clause
+
+        Returns:
+            rows from the select
+        """
+        return await cls.run_async(cls.select_from, table_name, select, where, where_args, group_by, order_by)
+
+    @classmethod
+    async def acount_from(
+        cls, table_name: str, select: str = "*", where: str = "", where_args: tuple | None = None
+    ) -> int:
+        """Awaitable version of :meth:`count_from`, executed on the database executor
+
+        Args:
+            table_name: name of the table used in the FROM
+            select: columns considered for the query
+            where: where clause, with %s placeholders for the where_args
+            where_args: args used in the where clause
+
+        Returns:
+            number of rows
+        """
+        return await cls.run_async(cls.count_from, table_name, select, where, where_args)
+
+    @classmethod
+    async def ainsert_into(cls, table_name: str, values: tuple, columns: tuple | str = "", multiple_rows: bool = False):
+        """Awaitable version of :meth:`insert_into`, executed on the database executor
+
+        Args:
+            table_name: name of the table used in the INSERT INTO
+            values: values to be inserted. If multiple_rows is true, tuple of tuples of values to be inserted
+            columns: columns that will be inserted, as a tuple of strings
+            multiple_rows: whether or not multiple rows will be inserted at the same time
+        """
+        await cls.run_async(cls.insert_into, table_name, values, columns, multiple_rows)
+
+    @classmethod
+    async def aupdate_from(cls, table_name: str, set_clause: str, where: str = "", args: tuple | None = None):
+        """Awaitable version of :meth:`update_from`, executed on the database executor
+
+        Args:
+            table_name: name of the table used in the DELETE FROM
+            set_clause: set clause, with %s placeholders
+            where: where clause, with %s placeholders for the where args
+            args: args used both in the set clause and in the where clause, in this order
+        """
+        await cls.run_async(cls.update_from, table_name, set_clause, where, args)
+
+    @classmethod
+    async def adelete_from(cls, table_name: str, where: str = "", where_args: tuple | None = None):
+        """Awaitable version of :meth:`delete_from`, executed on the database executor
+
+        Args:
+            table_name: name of the table used in the DELETE FROM
+            where: where clause, with %s placeholders for the where args
+            where_args: args used in the where clause
+        """
+        await cls.run_async(cls.delete_from, table_name, where, where_args)
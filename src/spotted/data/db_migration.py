@@ -0,0 +1,133 @@
+"""Versioned migrations of the database schema"""
+
+import logging
+import os
+import re
+import sqlite3
+from contextlib import suppress
+from dataclasses import dataclass
+
+from .data_reader import get_abs_path
+from .db_manager import DbManager
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_FILE_RE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+@dataclass(frozen=True)
+class Migration:
+    """Class that represents a migration of the database schema
+
+    Args:
+        version: version of the schema after the migration is applied
+        name: short description of the migration
+        path: path of the sql file containing the queries, separated by a ----- string
+    """
+
+    version: int
+    name: str
+    path: str
+
+    def read_queries(self) -> list[str]:
+        """Reads the queries of the migration from its file
+
+        Returns:
+            list of queries to execute, in order
+        """
+        with open(self.path, "r", encoding="utf-8") as in_file:
+            return [query for query in in_file.read().split("-----") if query.strip()]
+
+
+class MigrationManager:
+    """Class that applies the migrations found in the migrations folder, in order.
+    The version of the schema is tracked with the ``user_version`` pragma of the database,
+    so each migration is applied exactly once
+    """
+
+    MIGRATIONS_PATH = get_abs_path("config", "db", "migrations")
+
+    @classmethod
+    def get_migrations(cls) -> list[Migration]:
+        """Lists the migrations in the migrations folder, sorted by version
+
+        Returns:
+            list of available migrations
+
+        Raises:
+            ValueError: if two migrations share the same version or a version is missing
+        """
+        migrations: list[Migration] = []
+        for file_name in os.listdir(cls.MIGRATIONS_PATH):
+            if (match := MIGRATION_FILE_RE.match(file_name)) is not None:
+                path = os.path.join(cls.MIGRATIONS_PATH, file_name)
+                migrations.append(Migration(version=int(match.group(1)), name=match.group(2), path=path))
+        migrations.sort(key=lambda migration: migration.version)
+
+        for expected_version, migration in enumerate(migrations, start=1):
+            if migration.version != expected_version:
+                raise ValueError(f"Expected migration version {expected_version}, found {migration.path}")
+        return migrations
+
+    @classmethod
+    def get_latest_version(cls) -> int:
+        """Returns the version the schema will have once all the migrations are applied"""
+        migrations = cls.get_migrations()
+        return migrations[-1].version if migrations else 0
+
+    @staticmethod
+    def get_current_version() -> int:
+        """Returns the version of the schema stored in the database"""
+        with DbManager.get_pool().reader() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    @classmethod
+    def migrate(cls, target_version: int | None = None) -> list[Migration]:
+        """Applies all the migrations newer than the current version of the schema, up to the target version.
+        Each migration runs in its own transaction, together with the update of the version,
+        so a failing migration leaves the database untouched
+
+        Args:
+            target_version: version to migrate to. If None, the latest version is used
+
+        Returns:
+            list of the migrations that have been applied
+        """
+        migrations = cls.get_migrations()
+        if target_version is None:
+            target_version = migrations[-1].version if migrations else 0
+        if cls.get_current_version() >= target_version:  # fast path: the schema is already up to date
+            return []
+
+        applied: list[Migration] = []
+        with DbManager.get_pool().writer() as conn:
+            # re-read the version while holding the writer, in case someone else migrated in the meantime
+            current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for migration in migrations:
+                if migration.version <= current_version or migration.version > target_version:
+                    continue
+                cls.__apply(conn, migration)
+                applied.append(migration)
+        return applied
+
+    @staticmethod
+    def __apply(conn: sqlite3.Connection, migration: Migration):
+        """Applies a single migration in a transaction, updating the version of the schema
+
+        Args:
+            conn: writer connection
+            migration: migration to apply
+        """
+        logger.info("Applying database migration %04d_%s", migration.version, migration.name)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for query in migration.read_queries():
+                conn.execute(query)
+            conn.execute(f"PRAGMA user_version = {migration.version:d}")
+            conn.execute("COMMIT")
+        except sqlite3.Error as ex:
+            logger.error("Database migration %04d_%s failed: %s", migration.version, migration.name, ex)
+            if conn.in_transaction:  # the failed statement may have already rolled back the transaction
+                with suppress(sqlite3.Error):  # the error of the migration is the one to report
+                    conn.rollback()
+            raise
@@ -1,15 +1,30 @@
 """Pending post management"""
 
+from collections.abc import Iterator
 from dataclasses import dataclass
 from datetime import datetime, timezone
+from enum import Enum
 
 from telegram import Message
 
 from .db_manager import DbManager
 
 
+class PendingPostStatus(str, Enum):
+    """Status of a pending post. Only the handler that moves it away from PENDING can publish or reject it"""
+
+    PENDING = "pending"
+    """The admins are still voting on the post"""
+    APPROVED = "approved"
+    """The post is being published on the channel"""
+    REJECTED = "rejected"
+    """The post is being rejected, or removed because of a ban or a warn of its author"""
+    CANCELLED = "cancelled"
+    """The post is being removed because its author cancelled it"""
+
+
 @dataclass()
-class PendingPost:
+class PendingPost:  # pylint: disable=too-many-instance-attributes,too-many-public-methods
     """Class that represents a pending post
 
     Args:
@@ -19,6 +34,9 @@ class PendingPost:
         admin_group_id: id of the admin group
         credit_username: username of the user that sent the post if it's a credit post
         date: when the post was sent
+        approve_count: number of approve votes the post has received
+        reject_count: number of reject votes the post has received
+        status: whether the post is still pending or a decision has been taken on it
     """
 
     user_id: int
@@ -27,6 +45,9 @@ class PendingPost:
     admin_group_id: int
     date: datetime
     credit_username: str | None = None
+    approve_count: int = 0
+    reject_count: int = 0
+    status: PendingPostStatus = PendingPostStatus.PENDING
 
     @classmethod
     def create(
@@ -57,6 +78,45 @@ class PendingPost:
             date=date,
         ).save_post()
 
+    @classmethod
+    async def acreate(
+        cls, user_message: Message, g_message_id: int, admin_group_id: int, credit_username: str | None = None
+    ) -> "PendingPost":
+        """Awaitable version of :meth:`create`, executed on the database executor
+
+        Args:
+            user_message: message sent by the user that contains the post
+            g_message_id: id of the post in the group
+            admin_group_id: id of the admin group
+            credit_username: username of the user that sent the post if it's a credit post
+
+        Returns:
+            instance of the class
+        """
+        return await DbManager.run_async(cls.create, user_message, g_message_id, admin_group_id, credit_username)
+
+    @classmethod
+    def from_row(cls, row: dict) -> "PendingPost":
+        """Builds a pending post from a row of the pending_post table
+
+        Args:
+            row: row of the pending_post table, with all its columns
+
+        Returns:
+            instance of the class
+        """
+        return cls(
+            user_id=row["user_id"],
+            u_message_id=row["u_message_id"],
+            admin_group_id=row["admin_group_id"],
+            g_message_id=row["g_message_id"],
+            credit_username=row["credit_username"],
+            date=row["message_date"],
+            approve_count=row["approve_count"],
+            reject_count=row["reject_count"],
+            status=PendingPostStatus(row["status"]),
+        )
+
     @classmethod
     def from_group(cls, g_message_id: int, admin_group_id: int) -> "PendingPost | None":
         """Retrieves a pending post from the info related to the admin group
@@ -77,15 +137,20 @@ class PendingPost:
         if not pending_post_arr:
             return None
 
-        pending_post = pending_post_arr[0]
-        return cls(
-            user_id=pending_post["user_id"],
-            u_message_id=pending_post["u_message_id"],
-            admin_group_id=pending_post["admin_group_id"],
-            g_message_id=pending_post["g_message_id"],
-            credit_username=pending_post["credit_username"],
-            date=pending_post["message_date"],
-        )
+        return cls.from_row(pending_post_arr[0])
+
+    @classmethod
+    async def afrom_group(cls, g_message_id: int, admin_group_id: int) -> "PendingPost | None":
+        """Awaitable version of :meth:`from_group`, executed on the database executor
+
+        Args:
+            g_message_id: id of the post in the group
+            admin_group_id: id of the admin group
+
+        Returns:
+            instance of the class
+        """
+        return await DbManager.run_async(cls.from_group, g_message_id, admin_group_id)
 
     @classmethod
     def from_user(cls, user_id: int) -> "PendingPost | None":
@@ -103,49 +168,176 @@ class PendingPost:
         if not pending_post_arr:
             return None
 
-        pending_post = pending_post_arr[0]
-        return cls(
-            user_id=pending_post["user_id"],
-            u_message_id=pending_post["u_message_id"],
-            admin_group_id=pending_post["admin_group_id"],
-            g_message_id=pending_post["g_message_id"],
-            credit_username=pending_post["credit_username"],
-            date=pending_post["message_date"],
-        )
+        return cls.from_row(pending_post_arr[0])
+
+    @classmethod
+    async def afrom_user(cls, user_id: int) -> "PendingPost | None":
+        """Awaitable version of :meth:`from_user`, executed on the database executor
+
+        Args:
+            user_id: id of the author of the post
+
+        Returns:
+            instance of the class
+        """
+        return await DbManager.run_async(cls.from_user, user_id)
 
     @staticmethod
-    def get_all(admin_group_id: int, before: datetime | None = None) -> list["PendingPost"]:
-        """Gets the list of pending posts in the specified admin group.
-        If before is specified, returns only the one sent before that timestamp
+    def __get_all_where(admin_group_id: int, before: datetime | None) -> tuple[str, tuple]:
+        """Builds the where clause used to select the pending posts in the specified admin group.
+        The posts whose decision has already been claimed are being handled by someone else, so they are excluded
 
         Args:
             admin_group_id: id of the admin group
             before: timestamp before which messages will be considered
 
         Returns:
-            list of ids of pending posts
+            where clause and its args
         """
+        pending = PendingPostStatus.PENDING.value
         if before:
-            pending_posts_id = DbManager.select_from(
-                select="g_message_id",
-                table_name="pending_post",
-                where="admin_group_id = %s and (message_date < %s or message_date IS NULL)",
-                where_args=(admin_group_id, before),
+            return (
+                "admin_group_id = %s and status = %s and (message_date < %s or message_date IS NULL)",
+                (admin_group_id, pending, before),
             )
-        else:
-            pending_posts_id = DbManager.select_from(
-                select="g_message_id",
-                table_name="pending_post",
-                where="admin_group_id = %s",
-                where_args=(admin_group_id,),
+        return "admin_group_id = %s and status = %s", (admin_group_id, pending)
+
+    @classmethod
+    def get_all(cls, admin_group_id: int, before: datetime | None = None) -> list["PendingPost"]:
+        """Gets the list of pending posts in the specified admin group.
+        If before is specified, returns only the one sent before that timestamp
+
+        Args:
+            admin_group_id: id of the admin group
+            before: timestamp before which messages will be considered
+
+        Returns:
+            list of pending posts
+        """
+        where, where_args = cls.__get_all_where(admin_group_id, before)
+        pending_posts = DbManager.select_from(
+            select="*", table_name="pending_post", where=where, where_args=where_args, order_by="g_message_id"
+        )
+        return [cls.from_row(pending_post) for pending_post in pending_posts]
+
+    @classmethod
+    def iter_all(
+        cls, admin_group_id: int, before: datetime | None = None, batch_size: int = 100
+    ) -> Iterator["PendingPost"]:
+        """Lazily yields the pending posts in the specified admin group, fetching them in batches.
+        If before is specified, yields only the one sent before that timestamp.
+        Unlike :meth:`get_all`, only a batch of posts is kept in memory at a time
+
+        Args:
+            admin_group_id: id of the admin group
+            before: timestamp before which messages will be considered
+            batch_size: number of posts fetched from the database at a time
+
+        Yields:
+            pending posts, ordered by g_message_id
+        """
+        where, where_args = cls.__get_all_where(admin_group_id, before)
+        for pending_post in DbManager.iter_select_from(
+            table_name="pending_post",
+            where=where,
+            where_args=where_args,
+            order_by="g_message_id",
+            batch_size=batch_size,
+        ):
+            yield cls.from_row(pending_post)
+
+    @staticmethod
+    async def aget_all(admin_group_id: int, before: datetime | None = None) -> list["PendingPost"]:
+        """Awaitable version of :meth:`get_all`, executed on the database executor
+
+        Args:
+            admin_group_id: id of the admin group
+            before: timestamp before which messages will be considered
+
+        Returns:
+            list of pending posts
+        """
+        return await DbManager.run_async(PendingPost.get_all, admin_group_id, before)
+
+    @classmethod
+    def pop_all(cls, admin_group_id: int, before: datetime | None = None) -> list["PendingPost"]:
+        """Removes the pending posts in the specified admin group, along with their votes, and returns them.
+        If before is specified, removes only the one sent before that timestamp.
+        All the posts are removed in a single transaction
+
+        Args:
+            admin_group_id: id of the admin group
+            before: timestamp before which messages will be considered
+
+        Returns:
+            list of the removed pending posts, ordered by g_message_id
+        """
+        where, where_args = cls.__get_all_where(admin_group_id, before)
+        where = where.replace("%s", "?")
+        with DbManager.transaction() as cur:
+            cur.execute(
+                "DELETE FROM admin_votes WHERE (admin_group_id, g_message_id) IN "
+                f"(SELECT admin_group_id, g_message_id FROM pending_post WHERE {where})",
+                where_args,
             )
-        pending_posts = []
-        for post in pending_posts_id:
-            g_message_id = int(post["g_message_id"])
-            pending_post = PendingPost.from_group(admin_group_id=admin_group_id, g_message_id=g_message_id)
-            if pending_post is not None:
-                pending_posts.append(pending_post)
-        return pending_posts
+            pending_posts = cur.execute(f"DELETE FROM pending_post WHERE {where} RETURNING *", where_args).fetchall()
+        return sorted(
+            (cls.from_row(pending_post) for pending_post in pending_posts), key=lambda post: post.g_message_id
+        )
+
+    @classmethod
+    async def apop_all(cls, admin_group_id: int, before: datetime | None = None) -> list["PendingPost"]:
+        """Awaitable version of :meth:`pop_all`, executed on the database executor
+
+        Args:
+            admin_group_id: id of the admin group
+            before: timestamp before which messages will be considered
+
+        Returns:
+            list of the removed pending posts, ordered by g_message_id
+        """
+        return await DbManager.run_async(cls.pop_all, admin_group_id, before)
+
+    @staticmethod
+    def get_remaining(admin_group_id: int, exclude_g_message_id: int | None = None) -> tuple[int, int | None]:
+        """Counts the pending posts in the specified admin group and finds the oldest one, with a single query.
+        If exclude_g_message_id is specified, that post is not considered, nor are the posts already being decided
+
+        Args:
+            admin_group_id: id of the admin group
+            exclude_g_message_id: id in the group of the post to exclude, if any
+
+        Returns:
+            number of pending posts and g_message_id of the oldest one, or None if there are none
+        """
+        where = "admin_group_id = %s and status = %s"
+        where_args: tuple[int | str, ...] = (admin_group_id, PendingPostStatus.PENDING.value)
+        if exclude_g_message_id is not None:
+            where += " and g_message_id != %s"
+            where_args += (exclude_g_message_id,)
+
+        remaining = DbManager.select_from(
+            select="COUNT(*) as number, MIN(g_message_id) as oldest",
+            table_name="pending_post",
+            where=where,
+            where_args=where_args,
+        )
+        if not remaining:
+            return 0, None
+        return remaining[0]["number"], remaining[0]["oldest"]
+
+    @staticmethod
+    async def aget_remaining(admin_group_id: int, exclude_g_message_id: int | None = None) -> tuple[int, int | None]:
+        """Awaitable version of :meth:`get_remaining`, executed on the database executor
+
+        Args:
+            admin_group_id: id of the admin group
+            exclude_g_message_id: id in the group of the post to exclude, if any
+
+        Returns:
+            number of pending posts and g_message_id of the oldest one, or None if there are none
+        """
+        return await DbManager.run_async(PendingPost.get_remaining, admin_group_id, exclude_g_message_id)
 
     def save_post(self) -> "PendingPost":
         """Saves the pending_post in the database"""
@@ -176,11 +368,14 @@ class PendingPost:
         Returns:
             number of votes
         """
-        return DbManager.count_from(
-            table_name="admin_votes",
-            where="g_message_id = %s and admin_group_id = %s and is_upvote = %s",
-            where_args=(self.g_message_id, self.admin_group_id, vote),
+        counter = "approve_count" if vote else "reject_count"
+        votes = DbManager.select_from(
+            select=counter,
+            table_name="pending_post",
+            where="admin_group_id = %s and g_message_id = %s",
+            where_args=(self.admin_group_id, self.g_message_id),
         )
+        return votes[0][counter] if votes else 0
 
     def get_credit_username(self) -> str | None:
         """Gets the username of the user that credited the post
@@ -216,29 +411,57 @@ class PendingPost:
 
         return [vote["admin_id"] for vote in votes]
 
-    def __get_admin_vote(self, admin_id: int) -> bool | None:
-        """Gets the vote of a specific admin on a pending post
+    async def aget_list_admin_votes(self, vote: "bool | None" = None) -> "list[int] | list[tuple[int, bool]]":
+        """Awaitable version of :meth:`get_list_admin_votes`, executed on the database executor
 
         Args:
-            admin_id: id of the admin that voted
+            vote: whether you look for the approve or reject votes, or None if you want all the votes
 
         Returns:
-            a bool representing the vote or None if a vote was not yet made
+            list of admins that approved or rejected a pending post
         """
-        vote = DbManager.select_from(
-            select="is_upvote",
-            table_name="admin_votes",
-            where="admin_id = %s and g_message_id = %s and admin_group_id = %s",
-            where_args=(admin_id, self.g_message_id, self.admin_group_id),
-        )
+        return await DbManager.run_async(self.get_list_admin_votes, vote)
 
-        if len(vote) == 0:  # the vote is not present
-            return None
+    def set_admin_vote(self, admin_id: int, approval: bool) -> int:
+        """Adds the vote of the admin on a specific post, or update the existing vote, if needed.
+        The vote and the read of the updated counters happen in a single transaction,
+        and the approve_count and reject_count of the instance are updated accordingly.
+        Votes on a post whose decision has already been claimed are ignored
 
-        return vote[0]["is_upvote"]
+        Args:
+            admin_id: id of the admin that voted
+            approval: whether the vote is approval or reject
 
-    def set_admin_vote(self, admin_id: int, approval: bool) -> int:
-        """Adds the vote of the admin on a specific post, or update the existing vote, if needed
+        Returns:
+            number of similar votes (all the approve or the reject), or -1 if the vote wasn't updated
+        """
+        with DbManager.transaction() as cur:
+            post_status = cur.execute(
+                "SELECT status FROM pending_post WHERE admin_group_id = ? and g_message_id = ?",
+                (self.admin_group_id, self.g_message_id),
+            ).fetchone()
+            if post_status is None or post_status["status"] != PendingPostStatus.PENDING.value:
+                return -1  # the post is no longer pending, or a decision has already been taken
+            cur.execute(
+                "INSERT INTO admin_votes (admin_id, g_message_id, admin_group_id, is_upvote) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (admin_id, g_message_id, admin_group_id) DO UPDATE SET is_upvote = excluded.is_upvote "
+                "WHERE is_upvote != excluded.is_upvote",
+                (admin_id, self.g_message_id, self.admin_group_id, approval),
+            )
+            if cur.rowcount <= 0:  # the vote was already present and the same as the approval
+                return -1
+            counters = cur.execute(
+                "SELECT approve_count, reject_count FROM pending_post WHERE admin_group_id = ? and g_message_id = ?",
+                (self.admin_group_id, self.g_message_id),
+            ).fetchone()
+
+        self.approve_count = counters["approve_count"]
+        self.reject_count = counters["reject_count"]
+        return self.approve_count if approval else self.reject_count
+
+    async def aset_admin_vote(self, admin_id: int, approval: bool) -> int:
+        """Awaitable version of :meth:`set_admin_vote`, executed on the database executor.
+        All the queries needed to register the vote are run in a single transaction
 
         Args:
             admin_id: id of the admin that voted
@@ -247,25 +470,54 @@ class PendingPost:
         Returns:
             number of similar votes (all the approve or the reject), or -1 if the vote wasn't updated
         """
-        vote = self.__get_admin_vote(admin_id)
-        if vote is None:  # there isn't a vote yet
-            DbManager.insert_into(
-                table_name="admin_votes",
-                columns=("admin_id", "g_message_id", "admin_group_id", "is_upvote"),
-                values=(admin_id, self.g_message_id, self.admin_group_id, approval),
+        return await DbManager.run_async(self.set_admin_vote, admin_id, approval)
+
+    def claim_decision(self, status: PendingPostStatus) -> bool:
+        """Atomically moves the post from the pending status to the one provided.
+        When more handlers try to decide the fate of the same post at the same time, only the first one succeeds,
+        so the post is published or rejected exactly once
+
+        Args:
+            status: new status of the post
+
+        Returns:
+            whether the post was still pending, and the caller must now carry out the decision
+        """
+        with DbManager.transaction() as cur:
+            cur.execute(
+                "UPDATE pending_post SET status = ? WHERE admin_group_id = ? and g_message_id = ? and status = ?",
+                (status.value, self.admin_group_id, self.g_message_id, PendingPostStatus.PENDING.value),
             )
-            number_of_votes = self.get_votes(vote=approval)
-        elif bool(vote) != approval:  # the vote was different from the approval
-            DbManager.update_from(
-                table_name="admin_votes",
-                set_clause="is_upvote = %s",
-                where="admin_id = %s and g_message_id = %s and admin_group_id = %s",
-                args=(approval, admin_id, self.g_message_id, self.admin_group_id),
+            claimed = cur.rowcount == 1
+        if claimed:
+            self.status = status
+        return claimed
+
+    async def aclaim_decision(self, status: PendingPostStatus) -> bool:
+        """Awaitable version of :meth:`claim_decision`, executed on the database executor
+
+        Args:
+            status: new status of the post
+
+        Returns:
+            whether the post was still pending, and the caller must now carry out the decision
+        """
+        return await DbManager.run_async(self.claim_decision, status)
+
+    def release_decision(self):
+        """Moves the post back to the pending status, if the decision claimed by this instance could not be carried out.
+        The admins can then vote on it again
+        """
+        with DbManager.transaction() as cur:
+            cur.execute(
+                "UPDATE pending_post SET status = ? WHERE admin_group_id = ? and g_message_id = ? and status = ?",
+                (PendingPostStatus.PENDING.value, self.admin_group_id, self.g_message_id, self.status.value),
             )
-            number_of_votes = self.get_votes(vote=approval)
-        else:
-            return -1
-        return number_of_votes
+        self.status = PendingPostStatus.PENDING
+
+    async def arelease_decision(self):
+        """Awaitable version of :meth:`release_decision`, executed on the database executor"""
+        await DbManager.run_async(self.release_decision)
 
     def delete_post(self):
         """Removes all entries on a post that is no longer pending"""
@@ -281,6 +533,10 @@ class PendingPost:
             where_args=(self.g_message_id, self.admin_group_id),
         )
 
+    async def adelete_post(self):
+        """Awaitable version of :meth:`delete_post`, executed on the database executor"""
+        await DbManager.run_async(self.delete_post)
+
     def __repr__(self) -> str:
         return (
             f"PendingPost: [ user_id: {self.user_id}\n"
@@ -288,5 +544,8 @@ class PendingPost:
             f"admin_group_id: {self.admin_group_id}\n"
             f"g_message_id: {self.g_message_id}\n"
             f"credit_username: {self.credit_username}\n"
+            f"approve_count: {self.approve_count}\n"
+            f"reject_count: {self.reject_count}\n"
+            f"status: {self.status.value}\n"
             f"date : {self.date} ]"
         )
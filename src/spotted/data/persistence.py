@@ -0,0 +1,192 @@
+"""Persistence of the data of the bot and of the state of the conversations in the database"""
+
+import asyncio
+import json
+import logging
+import pickle
+from typing import Any
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from .db_manager import DbManager
+
+logger = logging.getLogger(__name__)
+
+CallbackDataCache = tuple[list[tuple[str, float, dict[str, Any]]], dict[str, str]]
+"""Data of the callback data cache of the bot, in the form the base persistence expects it"""
+
+PersistenceKey = tuple[str, str, str]
+"""Kind of data, name of the conversation and key of the entry, identifying a row of the persistence table"""
+
+
+class SqlitePersistence(BasePersistence[dict, dict, dict]):
+    """Stores the user_data, chat_data and bot_data of the application and the state of the persistent conversations
+    in the persistence table of the database, so that they survive a restart of the bot.
+
+    The application hands over the data every ``update_interval`` seconds.
+    Only the entries that changed since they were last stored are marked as dirty,
+    and all of them are written in a single transaction on the database executor,
+    so handling an update never waits for the database
+
+    Args:
+        update_interval: seconds between two runs of the application updating the persistence
+    """
+
+    def __init__(self, update_interval: float = 60):
+        super().__init__(store_data=PersistenceInput(callback_data=False), update_interval=update_interval)
+        self.__stored: dict[PersistenceKey, bytes] = {}
+        self.__dirty: dict[PersistenceKey, bytes | None] = {}
+        self.__flush_task: asyncio.Task | None = None
+
+    @property
+    def pending_writes(self) -> int:
+        """Number of dirty entries waiting to be written to the database"""
+        return len(self.__dirty)
+
+    @staticmethod
+    def __load(kind: str, name: str = "") -> dict[str, bytes]:
+        """Reads all the entries of a kind from the database
+
+        Args:
+            kind: kind of data
+            name: name of the conversation, if the kind is conversation
+
+        Returns:
+            serialized data of each entry, by key
+        """
+        rows = DbManager.select_from(
+            table_name="persistence", select="key, data", where="kind = %s and name = %s", where_args=(kind, name)
+        )
+        return {row["key"]: row["data"] for row in rows}
+
+    async def __aload(self, kind: str, name: str = "") -> dict[str, Any]:
+        """Reads all the entries of a kind, remembering their serialized value to detect the future changes
+
+        Args:
+            kind: kind of data
+            name: name of the conversation, if the kind is conversation
+
+        Returns:
+            deserialized data of each entry, by key
+        """
+        entries = await DbManager.run_async(self.__load, kind, name)
+        for key, data in entries.items():
+            self.__stored[(kind, name, key)] = data
+        return {key: pickle.loads(data) for key, data in entries.items()}
+
+    def __mark(self, persistence_key: PersistenceKey, value: Any, delete: bool = False):
+        """Marks the entry as dirty if it differs from the stored one, and schedules a flush of the dirty entries
+
+        Args:
+            persistence_key: kind, name and key of the entry
+            value: new value of the entry
+            delete: whether the entry must be removed instead
+        """
+        data = None if delete else pickle.dumps(value)
+        if data == self.__stored.get(persistence_key):  # nothing changed since the last write
+            self.__dirty.pop(persistence_key, None)
+            return
+        self.__dirty[persistence_key] = data
+        if self.__flush_task is None or self.__flush_task.done():
+            # the task runs once all the updates of this run of the application have been marked
+            self.__flush_task = asyncio.create_task(self.__flush_dirty())
+
+    @staticmethod
+    def __write(entries: dict[PersistenceKey, bytes | None]):
+        """Writes the entries to the database in a single transaction
+
+        Args:
+            entries: serialized data of each entry, or None if the entry must be removed
+        """
+        with DbManager.transaction() as cur:
+            cur.executemany(
+                "DELETE FROM persistence WHERE kind = ? and name = ? and key = ?",
+                [key for key, data in entries.items() if data is None],
+            )
+            cur.executemany(
+                "INSERT OR REPLACE INTO persistence (kind, name, key, data) VALUES (?, ?, ?, ?)",
+                [(*key, data) for key, data in entries.items() if data is not None],
+            )
+
+    async def __flush_dirty(self) -> bool:
+        """Writes all the dirty entries to the database, until there are none left.
+        If the write fails, the entries are kept dirty and retried on the next flush
+
+        Returns:
+            whether all the dirty entries have been written
+        """
+        while self.__dirty:
+            entries, self.__dirty = self.__dirty, {}
+            try:
+                await DbManager.run_async(self.__write, entries)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Writing %d entries to the persistence", len(entries))
+                for key, data in entries.items():
+                    self.__dirty.setdefault(key, data)  # newer changes take precedence
+                return False
+            for key, data in entries.items():
+                if data is None:
+                    self.__stored.pop(key, None)
+                else:
+                    self.__stored[key] = data
+        return True
+
+    async def get_user_data(self) -> dict[int, dict]:
+        return {int(key): value for key, value in (await self.__aload("user_data")).items()}
+
+    async def get_chat_data(self) -> dict[int, dict]:
+        return {int(key): value for key, value in (await self.__aload("chat_data")).items()}
+
+    async def get_bot_data(self) -> dict:
+        return (await self.__aload("bot_data")).get("", {})
+
+    async def get_callback_data(self) -> CallbackDataCache | None:
+        return None  # callback data is not stored
+
+    async def get_conversations(self, name: str) -> dict[tuple[int | str, ...], object]:
+        return {tuple(json.loads(key)): state for key, state in (await self.__aload("conversation", name)).items()}
+
+    async def update_conversation(self, name: str, key: tuple[int | str, ...], new_state: object | None):
+        self.__mark(("conversation", name, json.dumps(key)), new_state, delete=new_state is None)
+
+    async def update_user_data(self, user_id: int, data: dict):
+        self.__mark(("user_data", "", str(user_id)), data)
+
+    async def update_chat_data(self, chat_id: int, data: dict):
+        self.__mark(("chat_data", "", str(chat_id)), data)
+
+    async def update_bot_data(self, data: dict):
+        self.__mark(("bot_data", "", ""), data)
+
+    async def update_callback_data(self, data: Any):
+        """Callback data is not stored"""
+
+    async def drop_chat_data(self, chat_id: int):
+        self.__mark(("chat_data", "", str(chat_id)), None, delete=True)
+
+    async def drop_user_data(self, user_id: int):
+        self.__mark(("user_data", "", str(user_id)), None, delete=True)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict):
+        """The data in memory is always the most recent, so there is nothing to refresh"""
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict):
+        """The data in memory is always the most recent, so there is nothing to refresh"""
+
+    async def refresh_bot_data(self, bot_data: dict):
+        """The data in memory is always the most recent, so there is nothing to refresh"""
+
+    async def flush(self):
+        """Writes the remaining dirty entries, waiting for the flush in progress, if any.
+        The entries are always written by the flush task, so that two writes never run at the same time
+        and an older value can't overwrite a newer one
+        """
+        while True:
+            if self.__flush_task is not None and not self.__flush_task.done():
+                await self.__flush_task
+                continue
+            if not self.__dirty:
+                return
+            self.__flush_task = asyncio.create_task(self.__flush_dirty())
+            if not await self.__flush_task:  # the entries are kept dirty, to be written the next time
+                return
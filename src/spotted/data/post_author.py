@@ -0,0 +1,126 @@
+"""Authors of the posts published on the channel, waiting for their automatic forward in the community group"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from .config import Config
+from .db_manager import DbManager
+
+
+class PostAuthorStore:
+    """Maps each post published on the channel to the user that sent it, so that the author can be credited
+    when the automatic forward of the post reaches the community group.
+    The mapping is stored in the database, so it survives a restart of the bot,
+    and each entry expires after ``debug.post_author_ttl`` seconds, in case the forward never arrives.
+    The most recent ``debug.post_author_cache_size`` entries are also kept in memory, to avoid reading them back
+    """
+
+    __entries: "OrderedDict[tuple[int, int], tuple[int, float]]" = OrderedDict()
+    __lock = threading.Lock()
+
+    @classmethod
+    def set(cls, channel_id: int, c_message_id: int, user_id: int):
+        """Stores the author of a post just published on the channel. The expired entries are removed
+
+        Args:
+            channel_id: id of the channel
+            c_message_id: id of the post in the channel
+            user_id: id of the author of the post
+        """
+        now = time.time()
+        expire_at = now + Config.debug_get("post_author_ttl", default=86400)
+        with DbManager.transaction() as cur:
+            cur.execute("DELETE FROM post_author WHERE expire_at <= ?", (int(now),))
+            cur.execute(
+                "INSERT OR REPLACE INTO post_author (channel_id, c_message_id, user_id, expire_at) VALUES (?, ?, ?, ?)",
+                (channel_id, c_message_id, user_id, int(expire_at)),
+            )
+
+        max_size = Config.debug_get("post_author_cache_size", default=256)
+        with cls.__lock:
+            cls.__entries[(channel_id, c_message_id)] = (user_id, expire_at)
+            while len(cls.__entries) > max(max_size, 0):
+                cls.__entries.popitem(last=False)
+
+    @classmethod
+    async def aset(cls, channel_id: int, c_message_id: int, user_id: int):
+        """Awaitable version of :meth:`set`, executed on the database executor
+
+        Args:
+            channel_id: id of the channel
+            c_message_id: id of the post in the channel
+            user_id: id of the author of the post
+        """
+        await DbManager.run_async(cls.set, channel_id, c_message_id, user_id)
+
+    @classmethod
+    def get(cls, channel_id: int, c_message_id: int) -> int | None:
+        """Retrieves the author of a post published on the channel, without removing it
+
+        Args:
+            channel_id: id of the channel
+            c_message_id: id of the post in the channel
+
+        Returns:
+            id of the author, or None if it is unknown or expired
+        """
+        with cls.__lock:
+            entry = cls.__entries.get((channel_id, c_message_id))
+        if entry is not None:
+            return entry[0] if entry[1] > time.time() else None
+
+        result = DbManager.select_from(
+            table_name="post_author",
+            select="user_id",
+            where="channel_id = %s and c_message_id = %s and expire_at > %s",
+            where_args=(channel_id, c_message_id, int(time.time())),
+        )
+        return result[0]["user_id"] if result else None
+
+    @classmethod
+    def pop(cls, channel_id: int, c_message_id: int) -> int | None:
+        """Removes the author of a post published on the channel, returning it
+
+        Args:
+            channel_id: id of the channel
+            c_message_id: id of the post in the channel
+
+        Returns:
+            id of the author, or None if it is unknown or expired
+        """
+        with cls.__lock:
+            cls.__entries.pop((channel_id, c_message_id), None)
+        with DbManager.transaction() as cur:
+            row = cur.execute(
+                "DELETE FROM post_author WHERE channel_id = ? and c_message_id = ? RETURNING user_id, expire_at",
+                (channel_id, c_message_id),
+            ).fetchone()
+        if row is None or row["expire_at"] <= time.time():
+            return None
+        return row["user_id"]
+
+    @classmethod
+    async def apop(cls, channel_id: int, c_message_id: int) -> int | None:
+        """Awaitable version of :meth:`pop`, executed on the database executor
+
+        Args:
+            channel_id: id of the channel
+            c_message_id: id of the post in the channel
+
+        Returns:
+            id of the author, or None if it is unknown or expired
+        """
+        return await DbManager.run_async(cls.pop, channel_id, c_message_id)
+
+    @classmethod
+    def size(cls) -> int:
+        """Number of entries kept in memory"""
+        with cls.__lock:
+            return len(cls.__entries)
+
+    @classmethod
+    def clear_cache(cls):
+        """Removes all the entries kept in memory. The ones in the database are not affected"""
+        with cls.__lock:
+            cls.__entries.clear()
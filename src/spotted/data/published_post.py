@@ -32,6 +32,19 @@ class PublishedPost:
         """
         return cls(channel_id=channel_id, c_message_id=c_message_id, date=datetime.now()).save_post()
 
+    @classmethod
+    async def acreate(cls, channel_id: int, c_message_id: int) -> "PublishedPost":
+        """Awaitable version of :meth:`create`, executed on the database executor
+
+        Args:
+            channel_id: id of the channel
+            c_message_id: id of the post in the channel
+
+        Returns:
+            instance of the class
+        """
+        return await DbManager.run_async(cls.create, channel_id, c_message_id)
+
     @classmethod
     def from_channel(cls, channel_id: int, c_message_id: int) -> "PublishedPost | None":
         """Retrieves a published post from the info related to the channel
@@ -54,6 +67,56 @@ class PublishedPost:
         post = result[0]
         return cls(channel_id=post["channel_id"], c_message_id=post["c_message_id"], date=post["message_date"])
 
+    @classmethod
+    async def afrom_channel(cls, channel_id: int, c_message_id: int) -> "PublishedPost | None":
+        """Awaitable version of :meth:`from_channel`, executed on the database executor
+
+        Args:
+            channel_id: id of the channel
+            c_message_id: id of the post in the channel
+
+        Returns:
+            instance of the class
+        """
+        return await DbManager.run_async(cls.from_channel, channel_id, c_message_id)
+
+    @classmethod
+    def get_after(cls, after: tuple[int, int] | None = None, limit: int = 100) -> "list[PublishedPost]":
+        """Retrieves the next page of published posts, ordered by channel and message id.
+        Used to scan the whole table without loading it in memory
+
+        Args:
+            after: key (channel_id, c_message_id) of the last post of the previous page. If None, starts from the first
+            limit: maximum number of posts to retrieve
+
+        Returns:
+            list of published posts
+        """
+        where, where_args = ("(channel_id, c_message_id) > (%s, %s)", after) if after is not None else ("", None)
+        rows = DbManager.select_from(
+            table_name="published_post",
+            where=where,
+            where_args=where_args,
+            order_by=f"channel_id, c_message_id LIMIT {limit:d}",
+        )
+        return [
+            cls(channel_id=post["channel_id"], c_message_id=post["c_message_id"], date=post["message_date"])
+            for post in rows
+        ]
+
+    @classmethod
+    async def aget_after(cls, after: tuple[int, int] | None = None, limit: int = 100) -> "list[PublishedPost]":
+        """Awaitable version of :meth:`get_after`, executed on the database executor
+
+        Args:
+            after: key (channel_id, c_message_id) of the last post of the previous page. If None, starts from the first
+            limit: maximum number of posts to retrieve
+
+        Returns:
+            list of published posts
+        """
+        return await DbManager.run_async(cls.get_after, after, limit)
+
     def save_post(self) -> "PublishedPost":
         """Saves the published_post in the database"""
         DbManager.insert_into(
@@ -0,0 +1,128 @@
+"""Progress of the /purge command"""
+
+from dataclasses import dataclass
+
+from .db_manager import DbManager
+from .published_post import PublishedPost
+
+
+@dataclass()
+class PurgeCheckpoint:
+    """Class that represents the progress of the /purge command, stored in the database to resume it after a restart.
+    There is at most one checkpoint at a time
+
+    Args:
+        chat_id: id of the chat where the purge has been started
+        progress_message_id: id of the message showing the progress of the purge
+        last_channel_id: channel of the last post checked
+        last_c_message_id: id of the last post checked in the channel
+        total: number of published posts when the purge has been started
+        checked: number of posts checked so far
+        lost: number of posts found to be deleted so far
+    """
+
+    chat_id: int
+    progress_message_id: int | None = None
+    last_channel_id: int | None = None
+    last_c_message_id: int | None = None
+    total: int = 0
+    checked: int = 0
+    lost: int = 0
+
+    @property
+    def last_key(self) -> tuple[int, int] | None:
+        """Key (channel_id, c_message_id) of the last post checked, or None if the purge has just started"""
+        if self.last_channel_id is None or self.last_c_message_id is None:
+            return None
+        return self.last_channel_id, self.last_c_message_id
+
+    @classmethod
+    def load(cls) -> "PurgeCheckpoint | None":
+        """Retrieves the checkpoint of the purge in progress
+
+        Returns:
+            instance of the class, or None if no purge is in progress
+        """
+        result = DbManager.select_from(
+            table_name="purge_checkpoint",
+            select="chat_id, progress_message_id, last_channel_id, last_c_message_id, total, checked, lost",
+        )
+        if len(result) == 0:
+            return None
+        return cls(**result[0])
+
+    @classmethod
+    async def aload(cls) -> "PurgeCheckpoint | None":
+        """Awaitable version of :meth:`load`, executed on the database executor
+
+        Returns:
+            instance of the class, or None if no purge is in progress
+        """
+        return await DbManager.run_async(cls.load)
+
+    def save(self) -> "PurgeCheckpoint":
+        """Saves the checkpoint in the database, replacing the previous one"""
+        with DbManager.transaction() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO purge_checkpoint "
+                "(id, chat_id, progress_message_id, last_channel_id, last_c_message_id, total, checked, lost) "
+                "VALUES (1, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.chat_id,
+                    self.progress_message_id,
+                    self.last_channel_id,
+                    self.last_c_message_id,
+                    self.total,
+                    self.checked,
+                    self.lost,
+                ),
+            )
+        return self
+
+    async def asave(self) -> "PurgeCheckpoint":
+        """Awaitable version of :meth:`save`, executed on the database executor"""
+        return await DbManager.run_async(self.save)
+
+    def advance(self, checked: list[PublishedPost], lost: list[PublishedPost]):
+        """Records that some posts have been checked, deleting the lost ones from the database.
+        Both changes are committed in a single transaction, so that no post is skipped after a restart.
+        The checkpoint is only updated once the transaction has been committed, so it always matches the database
+
+        Args:
+            checked: posts checked, ordered by channel and message id
+            lost: posts whose message could not be found in the channel
+        """
+        if not checked:
+            return
+        last_channel_id, last_c_message_id = checked[-1].channel_id, checked[-1].c_message_id
+        total_checked, total_lost = self.checked + len(checked), self.lost + len(lost)
+        with DbManager.transaction() as cur:
+            cur.executemany(
+                "DELETE FROM published_post WHERE channel_id = ? and c_message_id = ?",
+                [(post.channel_id, post.c_message_id) for post in lost],
+            )
+            cur.execute(
+                "UPDATE purge_checkpoint SET last_channel_id = ?, last_c_message_id = ?, checked = ?, lost = ?",
+                (last_channel_id, last_c_message_id, total_checked, total_lost),
+            )
+        self.last_channel_id, self.last_c_message_id = last_channel_id, last_c_message_id
+        self.checked, self.lost = total_checked, total_lost
+
+    async def aadvance(self, checked: list[PublishedPost], lost: list[PublishedPost]):
+        """Awaitable version of :meth:`advance`, executed on the database executor
+
+        Args:
+            checked: posts checked, ordered by channel and message id
+            lost: posts whose message could not be found in the channel
+        """
+        await DbManager.run_async(self.advance, checked, lost)
+
+    @staticmethod
+    def delete():
+        """Removes the checkpoint, once the purge has been completed"""
+        DbManager.delete_from(table_name="purge_checkpoint")
+
+    @staticmethod
+    async def adelete():
+        """Awaitable version of :meth:`delete`, executed on the database executor"""
+        await DbManager.run_async(PurgeCheckpoint.delete)
@@ -72,6 +72,23 @@ class Report:
             date=datetime.now(),
         ).save_report()
 
+    @classmethod
+    async def acreate_post_report(
+        cls, user_id: int, channel_id: int, c_message_id: int, admin_message: Message
+    ) -> "Report | None":
+        """Awaitable version of :meth:`create_post_report`, executed on the database executor
+
+        Args:
+            user_id: id of the user that reported
+            channel_id: id of the channel
+            c_message_id: id of the post in question in the channel
+            admin_message: message received in the admin group that references the report
+
+        Returns:
+            instance of the class or None if the report was not created
+        """
+        return await DbManager.run_async(cls.create_post_report, user_id, channel_id, c_message_id, admin_message)
+
     @classmethod
     def create_user_report(cls, user_id: int, target_username: str, admin_message: Message) -> "Report":
         """Adds the report of the user targeting another user
@@ -96,6 +113,20 @@ class Report:
             date=datetime.now(),
         ).save_report()
 
+    @classmethod
+    async def acreate_user_report(cls, user_id: int, target_username: str, admin_message: Message) -> "Report":
+        """Awaitable version of :meth:`create_user_report`, executed on the database executor
+
+        Args:
+            user_id: id of the user that reported
+            target_username: username of reported user
+            admin_message: message received in the admin group that references the report
+
+        Returns:
+            instance of the class
+        """
+        return await DbManager.run_async(cls.create_user_report, user_id, target_username, admin_message)
+
     @classmethod
     def get_post_report(cls, user_id: int, channel_id: int, c_message_id: int) -> "Report | None":
         """Gets the report of a specific user on a published post
@@ -128,6 +159,20 @@ class Report:
             date=report["message_date"],
         )
 
+    @classmethod
+    async def aget_post_report(cls, user_id: int, channel_id: int, c_message_id: int) -> "Report | None":
+        """Awaitable version of :meth:`get_post_report`, executed on the database executor
+
+        Args:
+            user_id: id of the user that reported
+            channel_id: id of the channel
+            c_message_id: id of the post in question in the channel
+
+        Returns:
+            instance of the class or None if the report was not present
+        """
+        return await DbManager.run_async(cls.get_post_report, user_id, channel_id, c_message_id)
+
     @classmethod
     def get_last_user_report(cls, user_id: int) -> "Report | None":
         """Gets the last user report of a specific user
@@ -157,6 +202,18 @@ class Report:
             g_message_id=report["g_message_id"],
         )
 
+    @classmethod
+    async def aget_last_user_report(cls, user_id: int) -> "Report | None":
+        """Awaitable version of :meth:`get_last_user_report`, executed on the database executor
+
+        Args:
+            user_id: id of the user that reported
+
+        Returns:
+            instance of the class or None if the report was not present
+        """
+        return await DbManager.run_async(cls.get_last_user_report, user_id)
+
     @classmethod
     def from_group(cls, admin_group_id: int, g_message_id: int) -> "Report | None":
         """Gets a report of any type related to the specified message in the admin group
@@ -204,6 +261,19 @@ class Report:
 
         return None
 
+    @classmethod
+    async def afrom_group(cls, admin_group_id: int, g_message_id: int) -> "Report | None":
+        """Awaitable version of :meth:`from_group`, executed on the database executor
+
+        Args:
+            admin_group_id: id of the admin group
+            g_message_id: id of the report in the group
+
+        Returns:
+            instance of the class or None if the report was not present
+        """
+        return await DbManager.run_async(cls.from_group, admin_group_id, g_message_id)
+
     def save_report(self) -> "Report":
         """Saves the report in the database"""
         if self.c_message_id is not None:
@@ -1,16 +1,160 @@
 """Users management"""
 
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from random import choice
+from typing import Callable, Literal
 
 from telegram import Bot, ChatPermissions
 
+from .chat_cache import ChatCache
 from .config import Config
 from .data_reader import read_md
 from .db_manager import DbManager
 from .pending_post import PendingPost
 
+UserFlag = Literal["banned", "muted", "credited"]
+
+
+class UserFlagsCache:
+    """Read-through cache of the banned, muted and credited flags of the users.
+    It keeps at most ``debug.user_cache_size`` flags, evicting the least recently used ones,
+    and each flag expires after ``debug.user_cache_ttl`` seconds.
+    Every :class:`User` method that changes a flag invalidates the flags of that user
+    """
+
+    FLAGS: tuple[UserFlag, ...] = ("banned", "muted", "credited")
+    __entries: "OrderedDict[tuple[int, UserFlag], tuple[bool, float]]" = OrderedDict()
+    __lock = threading.Lock()
+    __generation = 0
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def get(cls, user_id: int, flag: UserFlag, loader: Callable[[], bool]) -> bool:
+        """Returns the cached value of the flag of the user, loading and caching it on a miss
+
+        Args:
+            user_id: id of the user
+            flag: flag to read
+            loader: function that reads the flag from the database
+
+        Returns:
+            value of the flag
+        """
+        key = (user_id, flag)
+        with cls.__lock:
+            entry = cls.__entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                cls.__entries.move_to_end(key)
+                cls.hits += 1
+                return entry[0]
+            cls.misses += 1
+            generation = cls.__generation
+
+        value = loader()
+        cls.__store(key, value, generation)
+        return value
+
+    @classmethod
+    def generation(cls) -> int:
+        """Returns the current generation of the cache, which changes with every invalidation.
+        It must be read before querying the database for the flags passed to :meth:`put`
+        """
+        with cls.__lock:
+            return cls.__generation
+
+    @classmethod
+    def put(cls, user_id: int, flags: dict[UserFlag, bool], generation: int):
+        """Caches the flags of the user that have just been read from the database,
+        unless they have been invalidated since the query started
+
+        Args:
+            user_id: id of the user
+            flags: values of the flags
+            generation: generation of the cache before the flags were read from the database
+        """
+        for flag, value in flags.items():
+            cls.__store((user_id, flag), value, generation)
+
+    @classmethod
+    def __store(cls, key: tuple[int, UserFlag], value: bool, generation: int):
+        """Stores the value in the cache, unless an invalidation happened after it was read from the database
+
+        Args:
+            key: user id and flag
+            value: value of the flag
+            generation: generation of the cache when the value was read
+        """
+        ttl = Config.debug_get("user_cache_ttl", default=300)
+        max_size = Config.debug_get("user_cache_size", default=1024)
+        if ttl <= 0 or max_size <= 0:
+            return
+        with cls.__lock:
+            if generation != cls.__generation:  # the value may be stale
+                return
+            cls.__entries[key] = (value, time.monotonic() + ttl)
+            cls.__entries.move_to_end(key)
+            while len(cls.__entries) > max_size:
+                cls.__entries.popitem(last=False)
+
+    @classmethod
+    def invalidate(cls, user_id: int):
+        """Removes all the cached flags of the user
+
+        Args:
+            user_id: id of the user
+        """
+        with cls.__lock:
+            cls.__generation += 1
+            for flag in cls.FLAGS:
+                cls.__entries.pop((user_id, flag), None)
+
+    @classmethod
+    def clear(cls):
+        """Removes all the cached flags and resets the counters"""
+        with cls.__lock:
+            cls.__generation += 1
+            cls.__entries.clear()
+            cls.hits = 0
+            cls.misses = 0
+
+    @classmethod
+    def size(cls) -> int:
+        """Returns the number of flags currently cached"""
+        with cls.__lock:
+            return len(cls.__entries)
+
+
+@dataclass(frozen=True)
+class UserStatus:
+    """Immutable snapshot of the moderation flags of a user, loaded with a single query.
+    It is not updated when the user changes, so it should only be kept for the duration of a handler
+
+    Args:
+        user_id: id of the user
+        is_banned: if the user is banned or not
+        is_muted: if the user is muted or not
+        is_credited: if the user is in the credited list
+        is_pending: if the user has a post already pending or not
+        n_warns: count of consecutive warns of the user
+    """
+
+    user_id: int
+    is_banned: bool = False
+    is_muted: bool = False
+    is_credited: bool = False
+    is_pending: bool = False
+    n_warns: int = 0
+
+    @property
+    def is_warn_bannable(self) -> bool:
+        """If the user is bannable due to warns"""
+        return self.n_warns >= Config.post_get("max_n_warns")
+
 
 @dataclass()
 class User:  # pylint: disable=too-many-public-methods
@@ -43,17 +187,71 @@ class User:  # pylint: disable=too-many-public-methods
     @property
     def is_banned(self) -> bool:
         """If the user is banned or not"""
-        return DbManager.count_from(table_name="banned_users", where="user_id = %s", where_args=(self.user_id,)) > 0
+        return UserFlagsCache.get(self.user_id, "banned", lambda: self.__has_record("banned_users"))
 
     @property
     def is_muted(self) -> bool:
         """If the user is muted or not"""
-        return DbManager.count_from(table_name="muted_users", where="user_id = %s", where_args=(self.user_id,)) > 0
+        return UserFlagsCache.get(self.user_id, "muted", lambda: self.__has_record("muted_users"))
 
     @property
     def is_credited(self) -> bool:
         """If the user is in the credited list"""
-        return DbManager.count_from(table_name="credited_users", where="user_id = %s", where_args=(self.user_id,)) == 1
+        return UserFlagsCache.get(self.user_id, "credited", lambda: self.__has_record("credited_users"))
+
+    def __has_record(self, table_name: str) -> bool:
+        """Checks whether the user is present in the table
+
+        Args:
+            table_name: name of the table
+
+        Returns:
+            whether at least a row of the table refers to the user
+        """
+        return DbManager.count_from(table_name=table_name, where="user_id = %s", where_args=(self.user_id,)) > 0
+
+    def load_status(self) -> UserStatus:
+        """Loads all the moderation flags of the user with a single query
+
+        Returns:
+            snapshot of the status of the user
+        """
+        generation = UserFlagsCache.generation()  # read before the query, so an invalidation during it is noticed
+        status = DbManager.select_values(
+            select="EXISTS (SELECT 1 FROM banned_users WHERE user_id = %s) as is_banned, "
+            "EXISTS (SELECT 1 FROM muted_users WHERE user_id = %s) as is_muted, "
+            "EXISTS (SELECT 1 FROM credited_users WHERE user_id = %s) as is_credited, "
+            "EXISTS (SELECT 1 FROM pending_post WHERE user_id = %s) as is_pending, "
+            "(SELECT COUNT(*) FROM warned_users WHERE user_id = %s) as n_warns",
+            args=(self.user_id,) * 5,
+        )
+        user_status = UserStatus(
+            user_id=self.user_id,
+            is_banned=bool(status.get("is_banned")),
+            is_muted=bool(status.get("is_muted")),
+            is_credited=bool(status.get("is_credited")),
+            is_pending=bool(status.get("is_pending")),
+            n_warns=status.get("n_warns") or 0,
+        )
+        if status:  # the flags are fresh, so they can be used to refresh the cache
+            UserFlagsCache.put(
+                self.user_id,
+                {
+                    "banned": user_status.is_banned,
+                    "muted": user_status.is_muted,
+                    "credited": user_status.is_credited,
+                },
+                generation,
+            )
+        return user_status
+
+    async def aload_status(self) -> UserStatus:
+        """Awaitable version of :meth:`load_status`, executed on the database executor
+
+        Returns:
+            snapshot of the status of the user
+        """
+        return await DbManager.run_async(self.load_status)
 
     @classmethod
     def banned_users(cls) -> "list[User]":
@@ -104,16 +302,38 @@ class User:  # pylint: disable=too-many-public-methods
             )
         ]
 
+    @classmethod
+    async def afollowing_users(cls, message_id: int) -> "list[User]":
+        """Awaitable version of :meth:`following_users`, executed on the database executor
+
+        Args:
+            message_id: id of the post the users are following
+
+        Returns:
+            list of users with private_message_id set to the id of the private message
+            in the user's conversation with the bot
+        """
+        return await DbManager.run_async(cls.following_users, message_id)
+
     def get_n_warns(self) -> int:
         """Returns the count of consecutive warns of the user"""
         count = DbManager.count_from(table_name="warned_users", where="user_id = %s", where_args=(self.user_id,))
         return count if count else 0
 
+    async def aget_n_warns(self) -> int:
+        """Awaitable version of :meth:`get_n_warns`, executed on the database executor"""
+        return await DbManager.run_async(self.get_n_warns)
+
     def ban(self):
         """Adds the user to the banned list"""
 
         if not self.is_banned:
             DbManager.insert_into(table_name="banned_users", columns=("user_id",), values=(self.user_id,))
+            UserFlagsCache.invalidate(self.user_id)
+
+    async def aban(self):
+        """Awaitable version of :meth:`ban`, executed on the database executor"""
+        await DbManager.run_async(self.ban)
 
     def sban(self) -> bool:
         """Removes the user from the banned list
@@ -124,9 +344,18 @@ class User:  # pylint: disable=too-many-public-methods
         if self.is_banned:
             DbManager.delete_from(table_name="banned_users", where="user_id = %s", where_args=(self.user_id,))
             DbManager.delete_from(table_name="warned_users", where="user_id = %s", where_args=(self.user_id,))
+            UserFlagsCache.invalidate(self.user_id)
             return True
         return False
 
+    async def asban(self) -> bool:
+        """Awaitable version of :meth:`sban`, executed on the database executor
+
+        Returns:
+            whether the user was present in the banned list before the sban or not
+        """
+        return await DbManager.run_async(self.sban)
+
     async def mute(self, bot: Bot | None, days: int):
         """Mute a user restricting its actions inside the community group
 
@@ -145,11 +374,12 @@ class User:  # pylint: disable=too-many-public-methods
                 ),
             )
         expiration_date = datetime.now() + timedelta(days=days)
-        DbManager.insert_into(
+        await DbManager.ainsert_into(
             table_name="muted_users",
             columns=("user_id", "expire_date"),
             values=(self.user_id, expiration_date),
         )
+        UserFlagsCache.invalidate(self.user_id)
 
     async def unmute(self, bot: Bot | None) -> bool:
         """Unmute a user taking back all restrictions
@@ -173,10 +403,12 @@ class User:  # pylint: disable=too-many-public-methods
                 ),
             )
 
-        if not self.is_muted:
+        UserFlagsCache.invalidate(self.user_id)  # the mute record may have been removed by someone else
+        if not await DbManager.run_async(lambda: self.is_muted):
             return False
 
-        DbManager.delete_from(table_name="muted_users", where="user_id = %s", where_args=(self.user_id,))
+        await DbManager.adelete_from(table_name="muted_users", where="user_id = %s", where_args=(self.user_id,))
+        UserFlagsCache.invalidate(self.user_id)
         return True
 
     def warn(self):
@@ -191,6 +423,10 @@ class User:  # pylint: disable=too-many-public-methods
             table_name="warned_users", columns=("user_id", "expire_date"), values=(self.user_id, valid_until_date)
         )
 
+    async def awarn(self):
+        """Awaitable version of :meth:`warn`, executed on the database executor"""
+        await DbManager.run_async(self.warn)
+
     def become_anonym(self) -> bool:
         """Removes the user from the credited list, if he was present
 
@@ -200,8 +436,17 @@ class User:  # pylint: disable=too-many-public-methods
         already_anonym = not self.is_credited
         if not already_anonym:
             DbManager.delete_from(table_name="credited_users", where="user_id = %s", where_args=(self.user_id,))
+            UserFlagsCache.invalidate(self.user_id)
         return already_anonym
 
+    async def abecome_anonym(self) -> bool:
+        """Awaitable version of :meth:`become_anonym`, executed on the database executor
+
+        Returns:
+            whether the user was already anonym
+        """
+        return await DbManager.run_async(self.become_anonym)
+
     def become_credited(self) -> bool:
         """Adds the user to the credited list, if he wasn't already credited
 
@@ -211,8 +456,17 @@ class User:  # pylint: disable=too-many-public-methods
         already_credited = self.is_credited
         if not already_credited:
             DbManager.insert_into(table_name="credited_users", columns=("user_id",), values=(self.user_id,))
+            UserFlagsCache.invalidate(self.user_id)
         return already_credited
 
+    async def abecome_credited(self) -> bool:
+        """Awaitable version of :meth:`become_credited`, executed on the database executor
+
+        Returns:
+            whether the user was already credited
+        """
+        return await DbManager.run_async(self.become_credited)
+
     async def get_user_sign(self, bot: Bot) -> str:
         """Generates a sign for the user. It will be a random name for an anonym user
 
@@ -222,8 +476,8 @@ class User:  # pylint: disable=too-many-public-methods
         Returns:
             the sign of the user
         """
-        if self.is_credited:  # the user wants to be credited
-            chat = await bot.get_chat(self.user_id)
+        if await DbManager.run_async(lambda: self.is_credited):  # the user wants to be credited
+            chat = await ChatCache.get_chat(bot, self.user_id)
             if chat.username:
                 return f"@{chat.username}"
 
@@ -262,6 +516,17 @@ class User:  # pylint: disable=too-many-public-methods
         )
         return result[0]["private_message_id"] if result else None
 
+    async def aget_follow_private_message_id(self, message_id: int) -> int | None:
+        """Awaitable version of :meth:`get_follow_private_message_id`, executed on the database executor
+
+        Args:
+            message_id: id of the post
+
+        Returns:
+            whether the user is following the post or not
+        """
+        return await DbManager.run_async(self.get_follow_private_message_id, message_id)
+
     def set_follow(self, message_id: int, private_message_id: int | None):
         """Sets the follow status of the user.
         If the private_message_id is None, the user is not following the post anymore,
@@ -284,6 +549,15 @@ class User:  # pylint: disable=too-many-public-methods
             values=(self.user_id, message_id, private_message_id),
         )
 
+    async def aset_follow(self, message_id: int, private_message_id: int | None):
+        """Awaitable version of :meth:`set_follow`, executed on the database executor
+
+        Args:
+            message_id: id of the post
+            private_message_id: id of the private message. If None, the record is deleted
+        """
+        await DbManager.run_async(self.set_follow, message_id, private_message_id)
+
     def __repr__(self) -> str:
         return (
             f"User: [ user_id: {self.user_id}\n"
@@ -7,7 +7,7 @@ from pytz import utc
 from telegram import BotCommand, BotCommandScopeAllPrivateChats, BotCommandScopeChat
 from telegram.ext import (
     Application,
-    CallbackQueryHandler,
+    ChatMemberHandler,
     CommandHandler,
     MessageHandler,
     filters,
@@ -17,19 +17,27 @@ from telegram.warnings import PTBUserWarning
 from spotted.data.config import Config
 from spotted.debug import error_handler, log_message
 from spotted.handlers.spam_comment import spam_comment_msg
+from spotted.utils.blacklist_util import BlacklistMatcher
+from spotted.utils.callback_util import AUTOREPLY_PREFIX, CallbackRouter
 
 from .anonym_comment import anonymous_comment_msg
 from .approve import approve_no_callback, approve_status_callback, approve_yes_callback
 from .autoreply import autoreply_callback, autoreply_cmd
 from .ban import ban_cmd
 from .cancel import cancel_cmd
+from .chat_member import admins_changed_chat_member
 from .clean_pending import clean_pending_cmd
 from .db_backup import db_backup_cmd
 from .follow_comment import follow_spot_comment
 from .follow_spot import follow_spot_callback
 from .forwarded_post import forwarded_post_msg
 from .help import help_cmd
-from .job_handlers import clean_muted_users, clean_pending_job, db_backup_job
+from .job_handlers import (
+    clean_muted_users,
+    clean_pending_job,
+    db_backup_job,
+    resume_purge_job,
+)
 from .mute import mute_cmd
 from .purge import purge_cmd
 from .reload import reload_cmd
@@ -124,17 +132,32 @@ def add_handlers(app: Application):
     app.add_handler(CommandHandler("warn", warn_cmd, filters=admin_filter | community_filter))
     app.add_handler(CommandHandler("mute", mute_cmd, filters=admin_filter | community_filter))
 
+    # ChatMemberHandler: keeps the cached administrators of the community group up to date
+    app.add_handler(
+        ChatMemberHandler(
+            admins_changed_chat_member,
+            ChatMemberHandler.ANY_CHAT_MEMBER,
+            chat_id=Config.post_get("community_group_id"),
+        )
+    )
+
     # MessageHandler
     app.add_handler(MessageHandler(filters.REPLY & admin_filter & filters.Regex(r"^/reply"), reply_cmd))
     app.add_handler(MessageHandler(filters.REPLY & admin_filter & filters.Regex(r"^/autoreply"), autoreply_cmd))
 
-    # Callback handlers
-    app.add_handler(CallbackQueryHandler(settings_callback, pattern=r"^settings\.*"))
-    app.add_handler(CallbackQueryHandler(approve_yes_callback, pattern=r"^approve_yes$"))
-    app.add_handler(CallbackQueryHandler(approve_no_callback, pattern=r"^approve_no$"))
-    app.add_handler(CallbackQueryHandler(approve_status_callback, pattern=r"^approve_status\.*"))
-    app.add_handler(CallbackQueryHandler(autoreply_callback, pattern=r"^autoreply\.*"))
-    app.add_handler(CallbackQueryHandler(follow_spot_callback, pattern=r"^follow_\.*"))
+    # Callback handlers: a single router dispatches on the prefix of the callback data
+    app.add_handler(
+        CallbackRouter(
+            {
+                "settings": settings_callback,
+                "approve_yes": approve_yes_callback,
+                "approve_no": approve_no_callback,
+                "approve_status": approve_status_callback,
+                AUTOREPLY_PREFIX: autoreply_callback,
+                "follow_spot": follow_spot_callback,
+            }
+        )
+    )
 
     if Config.post_get("comments"):
         app.add_handler(
@@ -155,6 +178,7 @@ def add_handlers(app: Application):
     app.add_handler(MessageHandler(community_filter & filters.REPLY, follow_spot_comment))
 
     if Config.post_get("blacklist_messages") and len(Config.post_get("blacklist_messages")) > 0:
+        BlacklistMatcher.compile()  # compiled at startup, so that the first comment doesn't wait for it
         app.add_handler(
             MessageHandler(
                 community_filter & filters.TEXT,
@@ -174,3 +198,4 @@ def add_jobs(app: Application):
     app.job_queue.run_daily(clean_pending_job, time=time(hour=5, tzinfo=utc))  # run each day at 05:00 utc
     app.job_queue.run_daily(db_backup_job, time=time(hour=5, tzinfo=utc))  # run each day at 05:00 utc
     app.job_queue.run_daily(clean_muted_users, time=time(hour=5, tzinfo=utc))  # run each day at 05:00 utc
+    app.job_queue.run_once(resume_purge_job, when=0)  # run once when the bot starts
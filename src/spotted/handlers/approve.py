@@ -6,7 +6,7 @@ from telegram import Update
 from telegram.error import BadRequest, Forbidden
 from telegram.ext import CallbackContext
 
-from spotted.data import Config, PendingPost
+from spotted.data import Config, PendingPost, PendingPostStatus
 from spotted.utils import EventInfo
 from spotted.utils.keyboard_util import get_approve_kb, get_paused_kb
 
@@ -34,7 +34,7 @@ async def approve_status_callback(update: Update, context: CallbackContext):
         await info.answer_callback_query("In pausa")
         new_keyboard = get_paused_kb(pause_page, items_per_page)
     elif action == "play":  # if the the admin wants to resume approval of the post
-        pending_post = PendingPost.from_group(admin_group_id=info.chat_id, g_message_id=info.message_id)
+        pending_post = await PendingPost.afrom_group(admin_group_id=info.chat_id, g_message_id=info.message_id)
         if pending_post:
             await info.answer_callback_query("Ripreso")
             new_keyboard = get_approve_kb(pending_post=pending_post)
@@ -45,27 +45,42 @@ async def approve_status_callback(update: Update, context: CallbackContext):
     await info.edit_inline_keyboard(new_keyboard=new_keyboard)
 
 
-async def reject_post(info: EventInfo, pending_post: PendingPost, reason: str | None = None):
-    """Rejects a pending post
+async def reject_post(
+    info: EventInfo, pending_post: PendingPost, reason: str | None = None, autoreply: str | None = None
+) -> bool:
+    """Rejects a pending post, unless another admin has already decided its fate
 
     Args:
         info: information about the callback
         pending_post: pending post to reject
         reason: reason for the rejection, currently used on autoreply
+        autoreply: message sent to the user before the notification of the rejection, if any
+
+    Returns:
+        whether the post has been rejected by this call
     """
     user_id = pending_post.user_id
-    pending_post.set_admin_vote(info.user_id, False)
+    await pending_post.aset_admin_vote(info.user_id, False)
+    if not await pending_post.aclaim_decision(PendingPostStatus.REJECTED):  # someone else is handling the post
+        return False
 
     try:
-        await info.bot.send_message(
-            chat_id=user_id, text="Il tuo ultimo post è stato rifiutato\nPuoi controllare le regole con /rules"
-        )  # notify the user
-    except (BadRequest, Forbidden) as ex:
-        logger.warning("Notifying the user on approve_no: %s", ex)
+        try:
+            if autoreply is not None:
+                await info.bot.send_message(chat_id=user_id, text=autoreply)
+            await info.bot.send_message(
+                chat_id=user_id, text="Il tuo ultimo post è stato rifiutato\nPuoi controllare le regole con /rules"
+            )  # notify the user
+        except (BadRequest, Forbidden) as ex:
+            logger.warning("Notifying the user on approve_no: %s", ex)
 
-    # Shows the list of admins who refused the pending post and removes it form the db
-    await info.show_admins_votes(pending_post, reason)
-    pending_post.delete_post()
+        # Shows the list of admins who refused the pending post
+        await info.show_admins_votes(pending_post, reason)
+    except Exception:
+        await pending_post.arelease_decision()  # the admins can try to reject the post again
+        raise
+    await pending_post.adelete_post()
+    return True
 
 
 async def approve_yes_callback(update: Update, context: CallbackContext):
@@ -79,32 +94,41 @@ async def approve_yes_callback(update: Update, context: CallbackContext):
         context: context passed by the handler
     """
     info = EventInfo.from_callback(update, context)
-    pending_post = PendingPost.from_group(admin_group_id=info.chat_id, g_message_id=info.message_id)
+    pending_post = await PendingPost.afrom_group(admin_group_id=info.chat_id, g_message_id=info.message_id)
     if pending_post is None:  # this pending post is not present in the database
         return
 
     await info.answer_callback_query()  # end the spinning progress bar
-    n_approve = pending_post.set_admin_vote(info.user_id, True)
+    n_approve = await pending_post.aset_admin_vote(info.user_id, True)
 
     # The post passed the approval phase and is to be published
     if n_approve >= Config.post_get("n_votes"):
+        # only one of the admins voting at the same time can publish the post
+        if not await pending_post.aclaim_decision(PendingPostStatus.APPROVED):
+            return
         user_id = pending_post.user_id
-        await info.send_post_to_channel(user_id=user_id)
-
         try:
-            await info.bot.send_message(
-                chat_id=user_id, text=f"Il tuo ultimo post è stato pubblicato su {Config.post_get('channel_tag')}"
-            )  # notify the user
-        except (BadRequest, Forbidden) as ex:
-            logger.warning("Notifying the user on approve_yes: %s", ex)
+            await info.send_post_to_channel(user_id=user_id)
+        except Exception:
+            await pending_post.arelease_decision()  # the post was not published, so the admins can try again
+            raise
 
-        # Shows the list of admins who approved the pending post and removes it form the db
-        await info.show_admins_votes(pending_post)
-        pending_post.delete_post()
+        try:
+            try:
+                await info.bot.send_message(
+                    chat_id=user_id, text=f"Il tuo ultimo post è stato pubblicato su {Config.post_get('channel_tag')}"
+                )  # notify the user
+            except (BadRequest, Forbidden) as ex:
+                logger.warning("Notifying the user on approve_yes: %s", ex)
+
+            # Shows the list of admins who approved the pending post
+            await info.show_admins_votes(pending_post)
+        finally:  # the post is already on the channel, so it must never be published again
+            await pending_post.adelete_post()
         return
 
     if n_approve != -1:  # the vote changed
-        new_keyboard = get_approve_kb(pending_post=pending_post, approve=n_approve)
+        new_keyboard = get_approve_kb(pending_post=pending_post)
         await info.edit_inline_keyboard(new_keyboard=new_keyboard)
 
 
@@ -119,12 +143,12 @@ async def approve_no_callback(update: Update, context: CallbackContext):
         context: context passed by the handler
     """
     info = EventInfo.from_callback(update, context)
-    pending_post = PendingPost.from_group(admin_group_id=info.chat_id, g_message_id=info.message_id)
+    pending_post = await PendingPost.afrom_group(admin_group_id=info.chat_id, g_message_id=info.message_id)
     if pending_post is None:  # this pending post is not present in the database
         return
 
     await info.answer_callback_query()  # end the spinning progress bar
-    n_reject = pending_post.set_admin_vote(info.user_id, False)
+    n_reject = await pending_post.aset_admin_vote(info.user_id, False)
 
     # The post has been refused
     if n_reject >= Config.post_get("n_votes"):
@@ -132,5 +156,5 @@ async def approve_no_callback(update: Update, context: CallbackContext):
         return
 
     if n_reject != -1:  # the number of votes changed
-        new_keyboard = get_approve_kb(pending_post=pending_post, reject=n_reject)
+        new_keyboard = get_approve_kb(pending_post=pending_post)
         await info.edit_inline_keyboard(new_keyboard=new_keyboard)
@@ -5,6 +5,7 @@ from telegram.ext import CallbackContext
 
 from spotted.data import Config, PendingPost, Report
 from spotted.utils import EventInfo
+from spotted.utils.callback_util import decode_autoreply
 
 from .approve import reject_post
 
@@ -30,9 +31,11 @@ async def autoreply_cmd(update: Update, context: CallbackContext):
         return
 
     g_message_id = update.message.reply_to_message.message_id
-    if (pending_post := PendingPost.from_group(admin_group_id=info.chat_id, g_message_id=g_message_id)) is not None:
+    if (
+        pending_post := await PendingPost.afrom_group(admin_group_id=info.chat_id, g_message_id=g_message_id)
+    ) is not None:
         user_id = pending_post.user_id
-    elif (report := Report.from_group(admin_group_id=info.chat_id, g_message_id=g_message_id)) is not None:
+    elif (report := await Report.afrom_group(admin_group_id=info.chat_id, g_message_id=g_message_id)) is not None:
         user_id = report.user_id
     else:  # the message was not a pending post or a report
         await info.bot.send_message(
@@ -58,16 +61,19 @@ async def autoreply_callback(update: Update, context: CallbackContext):
         context: context passed by the handler
     """
     info = EventInfo.from_callback(update, context)
-    arg = info.args[0]  # arg is the key of the autoreplies dictionary in the config file
+    arg = decode_autoreply(info.args)  # arg is the key of the autoreplies dictionary in the config file
+    if arg is None:  # the button was created before the autoreplies changed
+        await info.answer_callback_query(text="Questa risposta automatica non è più disponibile")
+        return None
 
     all_autoreplies = Config.autoreplies_get("autoreplies")
     current_reply = all_autoreplies.get(arg)
-    pending_post = PendingPost.from_group(admin_group_id=info.chat_id, g_message_id=info.message_id)
+    pending_post = await PendingPost.afrom_group(admin_group_id=info.chat_id, g_message_id=info.message_id)
 
     if pending_post:
-        await info.bot.send_message(chat_id=pending_post.user_id, text=current_reply)
-
         if Config.settings_get("post", "reject_after_autoreply"):
-            await reject_post(info=info, pending_post=pending_post, reason=arg)
+            await reject_post(info=info, pending_post=pending_post, reason=arg, autoreply=current_reply)
+        else:
+            await info.bot.send_message(chat_id=pending_post.user_id, text=current_reply)
 
     return None
@@ -3,7 +3,7 @@
 from telegram import Update
 from telegram.ext import CallbackContext
 
-from spotted.data import Config, PendingPost, Report, User
+from spotted.data import Config, PendingPost, PendingPostStatus, Report, User
 from spotted.utils import EventInfo
 
 
@@ -18,11 +18,14 @@ async def ban_cmd(update: Update, context: CallbackContext):
     info = EventInfo.from_message(update, context)
     g_message_id = update.message.reply_to_message.message_id
     user_id = -1
-    if (pending_post := PendingPost.from_group(admin_group_id=info.chat_id, g_message_id=g_message_id)) is not None:
+    if (
+        pending_post := await PendingPost.afrom_group(admin_group_id=info.chat_id, g_message_id=g_message_id)
+    ) is not None:
         user_id = pending_post.user_id
-        pending_post.delete_post()
-        await info.edit_inline_keyboard(message_id=g_message_id)
-    elif (report := Report.from_group(admin_group_id=info.chat_id, g_message_id=g_message_id)) is not None:
+        if await pending_post.aclaim_decision(PendingPostStatus.REJECTED):  # the post may be getting published
+            await pending_post.adelete_post()
+            await info.edit_inline_keyboard(message_id=g_message_id)
+    elif (report := await Report.afrom_group(admin_group_id=info.chat_id, g_message_id=g_message_id)) is not None:
         user_id = report.user_id
     else:  # the reply does not refer to a pending post or a report
         await info.bot.send_message(
@@ -41,10 +44,10 @@ async def execute_ban(user_id: int, info: EventInfo):
     """
     user = User(user_id)
     receipt_chat_id = Config.post_get("admin_group_id")
-    if user.is_banned:
+    if (await user.aload_status()).is_banned:
         await info.bot.send_message(chat_id=receipt_chat_id, text="L'utente è già bannato")
         return
-    user.ban()
+    await user.aban()
     await info.bot.send_message(chat_id=receipt_chat_id, text="L'utente è stato bannato")
     await info.bot.send_message(
         chat_id=user.user_id,
@@ -3,7 +3,7 @@
 from telegram import Update
 from telegram.ext import CallbackContext
 
-from spotted.data import PendingPost
+from spotted.data import PendingPost, PendingPostStatus
 from spotted.utils import EventInfo
 
 from .constants import ConversationState
@@ -23,11 +23,15 @@ async def cancel_cmd(update: Update, context: CallbackContext) -> int:
     info = EventInfo.from_message(update, context)
     if not info.is_private_chat:  # you can only cancel a post with a private message
         return ConversationState.END.value
-    pending_post = PendingPost.from_user(user_id=info.user_id)
-    if pending_post:  # if the user has a pending post in evaluation, delete it
+    pending_post = await PendingPost.afrom_user(user_id=info.user_id)
+    if pending_post and not await pending_post.aclaim_decision(PendingPostStatus.CANCELLED):
+        await info.bot.send_message(
+            chat_id=info.chat_id, text="Lo spot è già stato valutato dagli admin e non può più essere cancellato"
+        )
+    elif pending_post:  # if the user has a pending post in evaluation, delete it
         admin_group_id = pending_post.admin_group_id
         g_message_id = pending_post.g_message_id
-        pending_post.delete_post()
+        await pending_post.adelete_post()
 
         await info.bot.delete_message(chat_id=admin_group_id, message_id=g_message_id)
         await info.bot.send_message(chat_id=info.chat_id, text="Lo spot precedentemente inviato è stato cancellato")
@@ -0,0 +1,25 @@
+"""Changes in the members of the community group"""
+
+from telegram import ChatMember, Update
+from telegram.ext import CallbackContext
+
+from spotted.data import ChatAdminsCache
+
+ADMIN_STATUSES = (ChatMember.ADMINISTRATOR, ChatMember.OWNER)
+
+
+async def admins_changed_chat_member(update: Update, context: CallbackContext):  # pylint: disable=unused-argument
+    """Handles the changes in the status of a member of the community group.
+    When a user is promoted or demoted, the cached administrators of the group are invalidated
+
+    Args:
+        update: update event
+        context: context passed by the handler
+    """
+    member_update = update.chat_member or update.my_chat_member
+    if member_update is None:
+        return
+    was_admin = member_update.old_chat_member.status in ADMIN_STATUSES
+    is_admin = member_update.new_chat_member.status in ADMIN_STATUSES
+    if was_admin != is_admin:
+        ChatAdminsCache.invalidate(member_update.chat.id)
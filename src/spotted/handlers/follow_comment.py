@@ -1,16 +1,20 @@
 """Detect Comment on a post in the comment group"""
 
+from functools import partial
+
 from telegram import Update
-from telegram.error import BadRequest, Forbidden
 from telegram.ext import CallbackContext
 
 from spotted.data import User
 from spotted.utils import EventInfo
+from spotted.utils.broadcast_util import follow_broadcaster
+from spotted.utils.rate_limit_util import Priority
 
 
 async def follow_spot_comment(update: Update, context: CallbackContext):
     """Handles a new comment on a post in the comment group.
     Checks if someone is following the post, and sends them an update in case.
+    The updates are delivered in the background, so the handler returns immediately.
 
     Args:
         update: update event
@@ -21,13 +25,24 @@ async def follow_spot_comment(update: Update, context: CallbackContext):
     # Get the spot's message_id
     reply_to_message_id = info.message.message_thread_id
     # Get a list of users who are following the spot
-    users = User.following_users(reply_to_message_id)
-
-    # Send them an update about the new comment
-    for user in users:
-        # Avoid sending if it's made by the same user
-        if not user.user_id == info.message.from_user.id:
-            try:
-                await info.message.copy(chat_id=user.user_id, reply_to_message_id=user.private_message_id)
-            except (BadRequest, Forbidden):  # The user deleted the message or blocked the bot, ignore
-                pass
+    users = await User.afollowing_users(reply_to_message_id)
+
+    # Send them an update about the new comment, avoiding the user that made it
+    follow_broadcaster.broadcast(
+        (
+            (
+                user.user_id,
+                partial(
+                    info.bot.copy_message,
+                    chat_id=user.user_id,
+                    from_chat_id=info.chat_id,
+                    message_id=info.message_id,
+                    reply_to_message_id=user.private_message_id,
+                    rate_limit_args={"priority": Priority.NOTIFICATION},
+                ),
+            )
+            for user in users
+            if user.user_id != info.message.from_user.id
+        ),
+        label=f"Follow notifications for post {reply_to_message_id}",
+    )
@@ -28,10 +28,10 @@ async def follow_spot_callback(update: Update, context: CallbackContext):
 
     # If the user is already following this spot, there is a reference to the private message.
     # Since the user clicked the button, he wants to stop following the spot.
-    if (private_message_id := user.get_follow_private_message_id(message_id)) is not None:
+    if (private_message_id := await user.aget_follow_private_message_id(message_id)) is not None:
         answer_text = "Non stai più seguendo questo spot"
         # Forget the stored data
-        user.set_follow(message_id, None)
+        await user.aset_follow(message_id, None)
 
         await info.bot.send_message(
             chat_id=info.user_id,
@@ -64,6 +64,6 @@ async def follow_spot_callback(update: Update, context: CallbackContext):
             return
 
         # Remember the user_id and message_id
-        user.set_follow(message_id, private_message.message_id)
+        await user.aset_follow(message_id, private_message.message_id)
 
     await info.answer_callback_query(text=answer_text)
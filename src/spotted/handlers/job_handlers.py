@@ -1,77 +1,114 @@
 """Scheduled jobs of the bot"""
 
+import asyncio
 import io
-import shutil
 import sqlite3
+import time
 from binascii import Error as BinasciiError
 from datetime import datetime, timedelta, timezone
 
 import pyzipper
 from cryptography.fernet import Fernet
-from telegram.error import BadRequest, Forbidden, TelegramError
+from telegram.error import TelegramError
 from telegram.ext import CallbackContext
 
-from spotted.data import Config, DbManager, PendingPost, User
+from spotted.data import Config, DbManager, PendingPost, PurgeCheckpoint, User
 from spotted.debug import logger
 from spotted.utils import EventInfo
+from spotted.utils.purge_util import purge_engine
+from spotted.utils.rate_limit_util import Priority
 
 
 async def clean_pending_job(context: CallbackContext):
     """Job called each day at 05:00 utc.
-    Automatically rejects all pending posts that are older than the chosen amount of hours
+    Automatically rejects all pending posts that are older than the chosen amount of hours.
+    The posts are removed from the database all at once, then their messages are deleted and their authors notified
+    with up to ``debug.notification_concurrency`` requests at the same time
 
     Args:
         context: context passed by the jobqueue
     """
     info = EventInfo.from_job(context)
     admin_group_id = Config.post_get("admin_group_id")
+    start_time = time.monotonic()
 
     before_time = datetime.now(tz=timezone.utc) - timedelta(hours=Config.post_get("remove_after_h"))
-    pending_posts = PendingPost.get_all(admin_group_id=admin_group_id, before=before_time)
+    pending_posts = await PendingPost.apop_all(admin_group_id=admin_group_id, before=before_time)
 
-    # For each pending post older than before_time
-    removed = 0
-    for pending_post in pending_posts:
-        message_id = pending_post.g_message_id
+    semaphore = asyncio.Semaphore(max(1, Config.debug_get("notification_concurrency", default=8)))
+    results = await asyncio.gather(
+        *(clean_pending_post(info, pending_post, semaphore) for pending_post in pending_posts),
+        return_exceptions=True,  # a single failure must not prevent the others and the summary
+    )
+    outcomes: list[tuple[bool, bool]] = []
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.error("Cleaning a pending post: %s", result)
+            result = (False, False)
+        outcomes.append(result)
+    removed = sum(1 for is_removed, _ in outcomes if is_removed)
+    not_notified = sum(1 for is_removed, is_notified in outcomes if is_removed and not is_notified)
+    elapsed = time.monotonic() - start_time
+    logger.info(
+        "clean_pending: removed %d, not removed %d, not notified %d in %.2fs",
+        removed,
+        len(pending_posts) - removed,
+        not_notified,
+        elapsed,
+    )
+
+    text = f"Sono stati eliminati {removed} messaggi rimasti in sospeso"
+    if removed < len(pending_posts) or not_notified > 0:
+        text += f"\n{len(pending_posts) - removed} messaggi non eliminati, {not_notified} utenti non notificati"
+    await info.bot.send_message(chat_id=admin_group_id, text=f"{text}\nTempo impiegato: {elapsed:.1f}s")
+
+
+async def clean_pending_post(
+    info: EventInfo, pending_post: PendingPost, semaphore: asyncio.Semaphore
+) -> tuple[bool, bool]:
+    """Deletes the message of a pending post already removed from the database, then notifies its author
+
+    Args:
+        info: information about the job
+        pending_post: pending post to clean
+        semaphore: semaphore that bounds the number of posts cleaned at the same time
+
+    Returns:
+        whether the message has been deleted and whether the author has been notified
+    """
+    async with semaphore:
         try:  # deleting the message associated with the pending post to remote
-            await info.bot.delete_message(chat_id=admin_group_id, message_id=message_id)
-            removed += 1
-            try:  # sending a notification to the user
-                await info.bot.send_message(
-                    chat_id=pending_post.user_id,
-                    text="Gli admin erano sicuramente molto impegnati e non sono riusciti a valutare lo spot in tempo",
-                )
-            except (BadRequest, Forbidden) as ex:
-                logger.warning("Notifying the user on /clean_pending: %s", ex)
-        except BadRequest as ex:
+            await info.bot.delete_message(
+                chat_id=pending_post.admin_group_id,
+                message_id=pending_post.g_message_id,
+                rate_limit_args={"priority": Priority.BULK},
+            )
+        except TelegramError as ex:
             logger.error("Deleting old pending message: %s", ex)
-        finally:  # delete the data associated with the pending post
-            pending_post.delete_post()
-
-    await info.bot.send_message(
-        chat_id=admin_group_id, text=f"Sono stati eliminati {removed} messaggi rimasti in sospeso"
-    )
+            return False, False
+        try:  # sending a notification to the user
+            await info.bot.send_message(
+                chat_id=pending_post.user_id,
+                text="Gli admin erano sicuramente molto impegnati e non sono riusciti a valutare lo spot in tempo",
+                rate_limit_args={"priority": Priority.BULK},
+            )
+        except TelegramError as ex:
+            logger.warning("Notifying the user on /clean_pending: %s", ex)
+            return True, False
+        return True, True
 
 
 def get_updated_backup_path() -> str:
     """Get the path of the database backup file, applying some transformations if needed.
+    It creates a consistent copy of the database, including the data still in the write-ahead log.
     If `backup_keep_pending` is set to `False`,
-    it creates a copy of the database file and drops the `pending_post` table from the copy,
-    so the backup won't contain any pending post.
+    it drops the `pending_post` table from the copy, so the backup won't contain any pending post.
 
     Returns:
         path of the database backup file
     """
-    db_path = Config.debug_get("db_file")
-    if Config.debug_get("backup_keep_pending"):
-        return db_path
-    # If we need to apply some transformations to the backup,
-    # we create a copy of the database file and apply the transformations to the copy,
-    # so we don't modify the original file
-    # This may be simplified once we switch to python 3.11,
-    # as the `sqlite3` module can read from a bytes stream
-    backup_path = db_path + ".backup"
-    shutil.copy(db_path, backup_path)
+    backup_path = Config.debug_get("db_file") + ".backup"
+    DbManager.backup(backup_path)
     # 1. drop the pending_post table from the backup database
     if not Config.debug_get("backup_keep_pending"):
         with sqlite3.connect(backup_path, detect_types=sqlite3.PARSE_DECLTYPES) as conn:
@@ -152,12 +189,26 @@ async def clean_muted_users(context: CallbackContext):
     Args:
         context: context passed by the jobqueue
     """
-    expired_muted = DbManager.select_from(
+    expired_muted = await DbManager.aselect_from(
         table_name="muted_users", select="user_id", where="expire_date < DATETIME('now')"
     )
     if len(expired_muted) == 0:
         return
     for user in expired_muted:
         user_id = user["user_id"]
-        DbManager.delete_from(table_name="muted_users", where="user_id = %s", where_args=(user_id,))
+        await DbManager.adelete_from(table_name="muted_users", where="user_id = %s", where_args=(user_id,))
         await User(user_id).unmute(context.bot)
+
+
+async def resume_purge_job(context: CallbackContext):
+    """Job called once when the bot starts.
+    Resumes the /purge command interrupted by a restart, if any
+
+    Args:
+        context: context passed by the jobqueue
+    """
+    checkpoint = await PurgeCheckpoint.aload()
+    if checkpoint is None or purge_engine.running:
+        return
+    logger.info("Resuming the /purge command after %d posts", checkpoint.checked)
+    purge_engine.start(context.bot, checkpoint)
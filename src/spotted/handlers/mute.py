@@ -3,7 +3,7 @@
 from telegram import Update
 from telegram.ext import CallbackContext
 
-from spotted.data import Config, User
+from spotted.data import ChatAdminsCache, Config, User
 from spotted.utils import EventInfo
 
 
@@ -15,11 +15,11 @@ async def mute_cmd(update: Update, context: CallbackContext):
         context: context passed by the handler
     """
     info = EventInfo.from_message(update, context)
-    admins = [admin.user.id for admin in await info.bot.get_chat_administrators(Config.post_get("community_group_id"))]
+    is_admin = await ChatAdminsCache.is_admin(info.bot, Config.post_get("community_group_id"), info.user_id)
     g_message = update.message.reply_to_message
-    if (info.user_id not in admins) or (g_message is None):
+    if (not is_admin) or (g_message is None):
         text = "Per mutare rispondi ad un commento con /mute <days>\nIl numero di giorni è opzionale, di default è 7"
-        if info.user_id not in admins:
+        if not is_admin:
             text = "Non sei un admin"
         await info.bot.send_message(chat_id=info.user_id, text=text)
         await info.message.delete()
@@ -5,6 +5,7 @@ from telegram.ext import CallbackContext
 
 from spotted.data import Config
 from spotted.utils import EventInfo
+from spotted.utils.blacklist_util import BlacklistMatcher
 
 
 async def reload_cmd(update: Update, context: CallbackContext):
@@ -25,6 +26,7 @@ async def reload_cmd(update: Update, context: CallbackContext):
     """
     info = EventInfo.from_message(update, context)
     Config.reload()
+    BlacklistMatcher.compile()
     await info.bot.send_message(
         chat_id=info.chat_id, text="Configurazione ricaricata", reply_to_message_id=info.message_id
     )
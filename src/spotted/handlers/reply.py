@@ -27,12 +27,14 @@ async def reply_cmd(update: Update, context: CallbackContext):
     # Build the reply text from the args
     reply_text = " ".join(info.args)
     g_message_id = update.message.reply_to_message.message_id
-    if (pending_post := PendingPost.from_group(admin_group_id=info.chat_id, g_message_id=g_message_id)) is not None:
+    if (
+        pending_post := await PendingPost.afrom_group(admin_group_id=info.chat_id, g_message_id=g_message_id)
+    ) is not None:
         await info.bot.send_message(
             chat_id=pending_post.user_id,
             text=f"COMUNICAZIONE DEGLI ADMIN SUL TUO ULTIMO POST:\n{reply_text}",
         )
-    elif (report := Report.from_group(admin_group_id=info.chat_id, g_message_id=g_message_id)) is not None:
+    elif (report := await Report.afrom_group(admin_group_id=info.chat_id, g_message_id=g_message_id)) is not None:
         await info.bot.send_message(
             chat_id=report.user_id, text=f"COMUNICAZIONE DEGLI ADMIN SUL TUO ULTIMO REPORT:\n{reply_text}"
         )
@@ -8,11 +8,12 @@ from telegram.ext import (
     CommandHandler,
     ConversationHandler,
     MessageHandler,
+    TypeHandler,
     filters,
 )
 
 from spotted.data import Config, Report, User
-from spotted.utils import EventInfo, conv_cancel
+from spotted.utils import EventInfo, conv_cancel, conv_timeout, get_conversation_timeout
 
 from .constants import INVALID_MESSAGE_TYPE_ERROR, ConversationState
 
@@ -32,9 +33,13 @@ def report_spot_conv_handler() -> ConversationHandler:
             ConversationState.REPORTING_SPOT.value: [
                 MessageHandler(~filters.COMMAND & ~filters.UpdateType.EDITED_MESSAGE & filters.TEXT, report_spot_msg)
             ],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conv_timeout("report", ("current_post_reported",)))],
         },
         fallbacks=[CommandHandler("cancel", conv_cancel("report"))],
         allow_reentry=False,
+        name="report_spot",
+        conversation_timeout=get_conversation_timeout("report_spot"),
+        persistent=Config.debug_get("persistence_interval") > 0,
         per_chat=False,
     )
 
@@ -52,9 +57,11 @@ async def report_spot_callback(update: Update, context: CallbackContext) -> int:
     info = EventInfo.from_callback(update, context)
     abusive_message_id = info.message.reply_to_message.message_id if Config.post_get("comments") else info.message_id
 
-    report = Report.get_post_report(user_id=info.user_id, channel_id=info.chat_id, c_message_id=abusive_message_id)
-    user = User(info.user_id)
-    if user.is_banned:
+    report = await Report.aget_post_report(
+        user_id=info.user_id, channel_id=info.chat_id, c_message_id=abusive_message_id
+    )
+    user_status = await User(info.user_id).aload_status()
+    if user_status.is_banned:
         await info.answer_callback_query(text="Sei stato bannato, non puoi segnalare post")
         return ConversationState.END.value
     if report is not None:  # this user has already reported this post
@@ -109,7 +116,7 @@ async def report_spot_msg(update: Update, context: CallbackContext) -> int:
         chat_id=info.chat_id, text="Gli admins verificheranno quanto accaduto. Grazie per la collaborazione!"
     )
 
-    Report.create_post_report(
+    await Report.acreate_post_report(
         user_id=info.user_id, channel_id=channel_id, c_message_id=target_message_id, admin_message=admin_message
     )
 
@@ -6,11 +6,12 @@ from telegram.ext import (
     CommandHandler,
     ConversationHandler,
     MessageHandler,
+    TypeHandler,
     filters,
 )
 
 from spotted.data import Config, Report
-from spotted.utils import EventInfo, conv_cancel
+from spotted.utils import EventInfo, conv_cancel, conv_timeout, get_conversation_timeout
 
 from .constants import CHAT_PRIVATE_ERROR, INVALID_MESSAGE_TYPE_ERROR, ConversationState
 
@@ -34,9 +35,13 @@ def report_user_conv_handler() -> ConversationHandler:
             ConversationState.REPORTING_USER_REASON.value: [
                 MessageHandler(~filters.COMMAND & ~filters.UpdateType.EDITED_MESSAGE, report_user_sent_msg)
             ],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conv_timeout("report", ("current_report_target",)))],
         },
         fallbacks=[CommandHandler("cancel", conv_cancel("report"))],
         allow_reentry=False,
+        name="report_user",
+        conversation_timeout=get_conversation_timeout("report_user"),
+        persistent=Config.debug_get("persistence_interval") > 0,
     )
 
 
@@ -56,7 +61,7 @@ async def report_cmd(update: Update, context: CallbackContext) -> int:
         await info.bot.send_message(chat_id=info.chat_id, text=CHAT_PRIVATE_ERROR)
         return ConversationState.END.value
 
-    user_report = Report.get_last_user_report(user_id=info.user_id)
+    user_report = await Report.aget_last_user_report(user_id=info.user_id)
 
     if user_report is not None:
         minutes_elapsed = user_report.minutes_passed
@@ -145,6 +150,6 @@ async def report_user_sent_msg(update: Update, context: CallbackContext) -> int:
         chat_id=info.chat_id, text="Gli admins verificheranno quanto accaduto. Grazie per la collaborazione!"
     )
 
-    Report.create_user_report(user_id=info.user_id, target_username=target_username, admin_message=admin_message)
+    await Report.acreate_user_report(user_id=info.user_id, target_username=target_username, admin_message=admin_message)
 
     return ConversationState.END.value
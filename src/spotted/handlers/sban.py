@@ -36,7 +36,7 @@ async def sban_cmd(update: Update, context: CallbackContext):
             sban_fail.append(user_id_or_idx)
             continue
 
-        user.sban()
+        await user.asban()
         num_sban += 1
         try:
             await info.bot.send_message(
@@ -46,12 +46,16 @@ async def settings_callback(update: Update, context: CallbackContext):
     if action == "anonimo":  # if the user wants to be anonym
         text = (
             "Sei già anonimo"
-            if user.become_anonym()  # if the user was already anonym
+            if await user.abecome_anonym()  # if the user was already anonym
             else "La tua preferenza è stata aggiornata\nOra i tuoi post saranno anonimi"
         )
 
     elif action == "credit":  # if the user wants to be credited
-        text = "Sei già creditato nei post\n" if user.become_credited() else "La tua preferenza è stata aggiornata\n"
+        text = (
+            "Sei già creditato nei post\n"
+            if await user.abecome_credited()
+            else "La tua preferenza è stata aggiornata\n"
+        )
         text += (
             f"I tuoi post avranno come credit @{info.user_username}"
             if info.user_username
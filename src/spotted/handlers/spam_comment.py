@@ -3,8 +3,8 @@
 from telegram import Update
 from telegram.ext import CallbackContext
 
-from spotted.data import Config
 from spotted.utils import EventInfo
+from spotted.utils.blacklist_util import BlacklistMatcher
 
 
 async def spam_comment_msg(update: Update, context: CallbackContext) -> None:
@@ -16,13 +16,9 @@ async def spam_comment_msg(update: Update, context: CallbackContext) -> None:
         context: context passed by the handler
     """
     info = EventInfo.from_message(update, context)
-    # The following code performs a safety check.
-    # The filter already ensures that the message's text contains the spam word
-    for message in Config.post_get("blacklist_messages"):
-        if message in info.message.text:
-            await info.message.delete()
-            await info.bot.ban_chat_member(
-                chat_id=info.chat_id,
-                user_id=info.message.from_user.id,
-            )
-            return
+    if BlacklistMatcher.matches(info.message.text):
+        await info.message.delete()
+        await info.bot.ban_chat_member(
+            chat_id=info.chat_id,
+            user_id=info.message.from_user.id,
+        )
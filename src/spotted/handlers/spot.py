@@ -9,12 +9,20 @@ from telegram.ext import (
     CommandHandler,
     ConversationHandler,
     MessageHandler,
+    TypeHandler,
     filters,
 )
 
 from spotted.data import Config, User
 from spotted.data.data_reader import read_md
-from spotted.utils import EventInfo, conv_cancel, get_confirm_kb, get_preview_kb
+from spotted.utils import (
+    EventInfo,
+    conv_cancel,
+    conv_timeout,
+    get_confirm_kb,
+    get_conversation_timeout,
+    get_preview_kb,
+)
 
 from .constants import CHAT_PRIVATE_ERROR, INVALID_MESSAGE_TYPE_ERROR, ConversationState
 
@@ -41,9 +49,13 @@ def spot_conv_handler() -> ConversationHandler:
             ConversationState.POSTING_CONFIRM.value: [
                 CallbackQueryHandler(spot_confirm_query, pattern=r"^post_confirm,.+")
             ],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conv_timeout("spot", ("show_preview",)))],
         },
         fallbacks=[CommandHandler("cancel", conv_cancel("spot"))],
         allow_reentry=False,
+        name="spot",
+        conversation_timeout=get_conversation_timeout("spot"),
+        persistent=Config.debug_get("persistence_interval") > 0,
     )
 
 
@@ -59,16 +71,16 @@ async def spot_cmd(update: Update, context: CallbackContext) -> int:
         next state of the conversation
     """
     info = EventInfo.from_message(update, context)
-    user = User(info.user_id)
     if not info.is_private_chat:  # you can only post from a private chat
         await info.bot.send_message(chat_id=info.chat_id, text=CHAT_PRIVATE_ERROR)
         return ConversationState.END.value
 
-    if user.is_banned:  # the user is banned
+    user_status = await User(info.user_id).aload_status()
+    if user_status.is_banned:  # the user is banned
         await info.bot.send_message(chat_id=info.chat_id, text="Sei stato bannato 😅")
         return ConversationState.END.value
 
-    if user.is_pending:  # there is already a post in pending
+    if user_status.is_pending:  # there is already a post in pending
         await info.bot.send_message(chat_id=info.chat_id, text="Hai già un post in approvazione 🧐")
         return ConversationState.END.value
 
@@ -163,9 +175,10 @@ async def spot_confirm_query(update: Update, context: CallbackContext) -> int:
     arg = info.query_data.split(",")[1]
     text = "Qualcosa è andato storto!"
     if arg == "submit":  # if the the user wants to publish the post
-        if User(info.user_id).is_pending:  # there is already a spot in pending by this user
+        user_status = await User(info.user_id).aload_status()
+        if user_status.is_pending:  # there is already a spot in pending by this user
             text = "Hai già un post in approvazione 🧐"
-        elif await info.send_post_to_admins():
+        elif await info.send_post_to_admins(user_status=user_status):
             text = (
                 "Il tuo post è in fase di valutazione\n"
                 f"Una volta pubblicato, lo potrai trovare su {Config.post_get('channel_tag')}"
@@ -3,7 +3,14 @@
 from telegram import Update
 from telegram.ext import CallbackContext
 
-from spotted.data import Config, PendingPost, Report, User
+from spotted.data import (
+    ChatAdminsCache,
+    Config,
+    PendingPost,
+    PendingPostStatus,
+    Report,
+    User,
+)
 from spotted.handlers.ban import execute_ban
 from spotted.utils import EventInfo
 
@@ -16,9 +23,9 @@ async def warn_cmd(update: Update, context: CallbackContext):
         context: context passed by the handler
     """
     info = EventInfo.from_message(update, context)
-    admins = [admin.user.id for admin in await info.bot.get_chat_administrators(Config.post_get("community_group_id"))]
+    is_admin = await ChatAdminsCache.is_admin(info.bot, Config.post_get("community_group_id"), info.user_id)
     g_message = update.message.reply_to_message
-    if info.user_id not in admins:
+    if not is_admin:
         await info.bot.send_message(chat_id=info.user_id, text="Non sei admin")
         await info.message.delete()
         return
@@ -31,12 +38,15 @@ async def warn_cmd(update: Update, context: CallbackContext):
     from_community = False
     user_id = -1
     if (
-        pending_post := PendingPost.from_group(admin_group_id=info.chat_id, g_message_id=g_message.message_id)
+        pending_post := await PendingPost.afrom_group(admin_group_id=info.chat_id, g_message_id=g_message.message_id)
     ) is not None:
         user_id = pending_post.user_id
-        pending_post.delete_post()
-        await info.edit_inline_keyboard(message_id=g_message.message_id)
-    elif (report := Report.from_group(admin_group_id=info.chat_id, g_message_id=g_message.message_id)) is not None:
+        if await pending_post.aclaim_decision(PendingPostStatus.REJECTED):  # the post may be getting published
+            await pending_post.adelete_post()
+            await info.edit_inline_keyboard(message_id=g_message.message_id)
+    elif (
+        report := await Report.afrom_group(admin_group_id=info.chat_id, g_message_id=g_message.message_id)
+    ) is not None:
         user_id = report.user_id
     elif g_message.chat_id == Config.post_get("community_group_id"):
         user_id = g_message.from_user.id
@@ -55,8 +65,9 @@ async def execute_warn(info: EventInfo, user_id: int, comment: str, from_communi
          from_community: a flag for auto-delete command invokation
     """
     user = User(user_id)
-    user.warn()
-    n_warns = user.get_n_warns()
+    await user.awarn()
+    user_status = await user.aload_status()
+    n_warns = user_status.n_warns
     await info.bot.send_message(
         chat_id=user.user_id,
         text=f"Sei stato warnato su SpottedDMI, hai {n_warns} warn su"
@@ -69,7 +80,7 @@ async def execute_warn(info: EventInfo, user_id: int, comment: str, from_communi
         chat_id=Config.post_get("admin_group_id"),
         text=f"L'utente ha ricevuto il {n_warns}° warn\n" f"Motivo: {comment}",
     )
-    if user.is_warn_bannable:
+    if user_status.is_warn_bannable:
         await execute_ban(user.user_id, info)
     if from_community:
         await info.message.delete()
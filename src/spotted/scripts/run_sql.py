@@ -1,15 +1,16 @@
 import argparse
 from typing import TYPE_CHECKING, cast
 
-from spotted.data import Config, DbManager
+from spotted.data import Config, DbManager, MigrationManager
 
 if TYPE_CHECKING:
 
     class RunSQLArgs(argparse.Namespace):
         """Type hinting for the command line arguments"""
 
-        sql_file: str
+        sql_file: str | None
         db_file: str
+        migrate: bool
 
 
 def parse_args() -> "RunSQLArgs":
@@ -22,16 +23,37 @@ def parse_args() -> "RunSQLArgs":
     parser.add_argument(
         "sql_file",
         type=str,
+        nargs="?",
         help="Path to the SQL file. Multiple queries must be separated by a ';'",
     )
     parser.add_argument("db_file", type=str, help="Path to the database file")
-    return cast("RunSQLArgs", parser.parse_args())
+    parser.add_argument(
+        "-m",
+        "--migrate",
+        action="store_true",
+        help="Apply the pending migrations of the schema before running the SQL file, if any",
+    )
+    args = cast("RunSQLArgs", parser.parse_args())
+    if args.sql_file is None and not args.migrate:
+        parser.error("either the sql_file or the --migrate option must be provided")
+    return args
 
 
 def main():
     """Main function"""
     args = parse_args()
     Config.override_settings({"debug": {"db_file": args.db_file}})
+
+    if args.migrate:
+        applied = MigrationManager.migrate()
+        for migration in applied:
+            print(f"Applied migration {migration.version:04d}_{migration.name}")
+        print(f"Schema version: {MigrationManager.get_current_version()}/{MigrationManager.get_latest_version()}")
+        DbManager.close()
+
+    if args.sql_file is None:
+        return
+
     conn, cur = DbManager.get_db()
 
     with open(args.sql_file, "r", encoding="utf-8") as sql_file:
@@ -1,6 +1,11 @@
 """Modules that provide various util"""
 
-from .conversation_util import conv_cancel, conv_fail
+from .conversation_util import (
+    conv_cancel,
+    conv_fail,
+    conv_timeout,
+    get_conversation_timeout,
+)
 from .info_util import EventInfo
 from .keyboard_util import (
     get_approve_kb,
@@ -15,6 +20,8 @@ from .utils import get_user_by_id_or_index
 __all__ = [
     "conv_cancel",
     "conv_fail",
+    "conv_timeout",
+    "get_conversation_timeout",
     "EventInfo",
     "get_approve_kb",
     "get_confirm_kb",
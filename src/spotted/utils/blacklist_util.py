@@ -0,0 +1,141 @@
+"""Matching of the comments against the blacklist of the community group"""
+
+import re
+import threading
+import unicodedata
+from collections.abc import Iterable
+
+from spotted.data import Config
+
+INVISIBLE_CHARS = "\u00ad\u034f\u180e\u200b\u200c\u200d\u2060\ufeff"
+"""Characters that are not rendered, which could be used to split a word of the blacklist"""
+
+HOMOGLYPHS = dict(
+    zip(
+        "АВСЕНІЈКМОРЅТХУасеіјорѕхуԁɡΑΒΕΗΙΚΜΝΟΡΤΥΧΖαικνορτυχ",
+        "ABCEHIJKMOPSTXYaceijopsxydgABEHIKMNOPTYXZaikvoptux",
+    )
+)
+"""Cyrillic and Greek letters that look like a latin one, mapped to it"""
+
+EVASION_CHARS = re.compile(f"[{INVISIBLE_CHARS}{''.join(HOMOGLYPHS)}]")
+"""Invisible characters and homoglyphs. Replacing the few matches is much faster than translating the whole text"""
+
+COMBINING_MARKS = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]")
+"""Blocks of the combining marks, like the accents separated from their letter by the NFKD normalization"""
+
+REGEX_MIN_WORDS = 100
+"""Below this number of words, looking for each of them in the text is faster than the regular expression.
+Both cost about the same at 100 words, as measured by ``script/benchmark_blacklist.py``"""
+
+
+class BlacklistMatcher:
+    """Finds whether a text contains any of the words in ``post.blacklist_messages``.
+    The words are compiled once per configuration into a single regular expression shaped like a trie,
+    so each text is scanned once, however many words there are.
+    Short blacklists are matched by looking for each word in the text instead, which is faster for them.
+    The expression is compiled again when the configuration is reloaded or overridden.
+
+    If ``post.blacklist_normalize`` is set, both the words and the texts are normalized first,
+    so that fullwidth letters, accents, invisible characters and homoglyphs don't evade the blacklist.
+    If ``post.blacklist_ignore_case`` is set, the comparison ignores the case
+    """
+
+    __pattern: re.Pattern | None = None
+    __words: tuple[str, ...] = ()
+    __options = (False, False)
+    __generation = -1
+    __lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str, normalize: bool, ignore_case: bool) -> str:
+        """Transforms the text in the form used for the comparison
+
+        Args:
+            text: text to transform
+            normalize: whether to apply the unicode normalization and replace the homoglyphs
+            ignore_case: whether to ignore the case
+
+        Returns:
+            transformed text
+        """
+        if normalize and not text.isascii():  # ascii text is already normalized
+            text = unicodedata.normalize("NFKD", text)
+            text = EVASION_CHARS.sub(lambda match: HOMOGLYPHS.get(match.group(), ""), text)
+            text = COMBINING_MARKS.sub("", text)
+        if ignore_case:
+            text = text.casefold()
+        return text
+
+    @staticmethod
+    def build_regex(words: Iterable[str]) -> str:
+        """Builds a regular expression that matches any of the words, where the words sharing a prefix share a branch.
+        If a word is the prefix of another one, the longer word is dropped, since any text containing it
+        contains the shorter one too
+
+        Args:
+            words: words to match. Empty words are ignored
+
+        Returns:
+            regular expression matching any of the words, or an empty string if there are no words
+        """
+        trie: dict = {}
+        for word in words:
+            if not word:
+                continue
+            node = trie
+            for char in word:
+                if "" in node:  # a prefix of the word is already in the trie
+                    break
+                node = node.setdefault(char, {})
+            else:
+                node.clear()
+                node[""] = {}  # end of a word
+
+        def to_regex(node: dict) -> str:
+            if "" in node:
+                return ""
+            chars = [re.escape(char) for char, child in sorted(node.items()) if "" in child]
+            branches = [re.escape(char) + to_regex(child) for char, child in sorted(node.items()) if "" not in child]
+            if len(chars) == 1:
+                branches.append(chars[0])
+            elif chars:
+                branches.append(f"[{''.join(chars)}]")
+            return branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+
+        return to_regex(trie) if trie else ""
+
+    @classmethod
+    def compile(cls):
+        """Compiles the words of the blacklist in the current configuration"""
+        with cls.__lock:
+            generation = Config.generation()
+            normalize = Config.post_get("blacklist_normalize", default=False)
+            ignore_case = Config.post_get("blacklist_ignore_case", default=False)
+            words = {
+                cls.normalize(word, normalize, ignore_case) for word in Config.post_get("blacklist_messages") or []
+            }
+            words.discard("")
+            if len(words) < REGEX_MIN_WORDS:
+                cls.__words, cls.__pattern = tuple(words), None
+            else:
+                cls.__words, cls.__pattern = (), re.compile(cls.build_regex(words))
+            cls.__options = (normalize, ignore_case)
+            cls.__generation = generation
+
+    @classmethod
+    def matches(cls, text: str) -> bool:
+        """Checks whether the text contains any of the words of the blacklist
+
+        Args:
+            text: text to check
+
+        Returns:
+            whether a word of the blacklist has been found
+        """
+        if cls.__generation != Config.generation():
+            cls.compile()
+        text = cls.normalize(text, *cls.__options)
+        if cls.__pattern is not None:
+            return cls.__pattern.search(text) is not None
+        return any(word in text for word in cls.__words)
@@ -0,0 +1,233 @@
+"""Background delivery of the same notification to many users"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable
+
+import httpx
+from telegram.error import (
+    BadRequest,
+    Forbidden,
+    NetworkError,
+    RetryAfter,
+    TelegramError,
+)
+
+from spotted.data import Config
+
+logger = logging.getLogger(__name__)
+
+SendCallback = Callable[[], Awaitable[Any]]
+
+UNSENT_REQUEST_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+"""Errors of the http client raised before the request reaches Telegram, so repeating it can't send a message twice"""
+
+
+def is_unsent(ex: NetworkError) -> bool:
+    """Checks whether the request that raised the error has certainly not reached Telegram.
+    Other network errors, like a timeout while waiting for the response, may happen after the message has been sent
+
+    Args:
+        ex: error raised by the request
+
+    Returns:
+        whether the request can be repeated safely
+    """
+    return isinstance(ex.__cause__, UNSENT_REQUEST_ERRORS)
+
+
+@dataclass
+class BroadcastMetrics:
+    """Delivery metrics of a broadcaster, or of a single batch of messages
+
+    Args:
+        submitted: number of messages submitted
+        sent: number of messages delivered
+        failed: number of messages that could not be delivered
+        retried: number of attempts repeated after a temporary error
+        rate_limited: number of messages that failed with RetryAfter, once the rate limiter has stopped retrying them
+    """
+
+    submitted: int = 0
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    rate_limited: int = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of messages that are still waiting to be delivered"""
+        return self.submitted - self.sent - self.failed
+
+
+@dataclass
+class BroadcastBatch:
+    """Group of messages submitted together, e.g. the notifications for a new comment.
+    A summary is logged once all the messages have been delivered or have failed
+
+    Args:
+        label: description of the batch, used in the logs
+        metrics: delivery metrics of the batch
+        start_time: when the batch has been submitted
+    """
+
+    label: str
+    metrics: BroadcastMetrics = field(default_factory=BroadcastMetrics)
+    start_time: float = field(default_factory=time.monotonic)
+
+    def complete(self, sent: bool):
+        """Records the outcome of a message of the batch
+
+        Args:
+            sent: whether the message has been delivered
+        """
+        if sent:
+            self.metrics.sent += 1
+        else:
+            self.metrics.failed += 1
+        if self.metrics.pending == 0:
+            logger.info(
+                "%s: sent %d, failed %d, retried %d in %.2fs",
+                self.label,
+                self.metrics.sent,
+                self.metrics.failed,
+                self.metrics.retried,
+                time.monotonic() - self.start_time,
+            )
+
+
+@dataclass
+class _Delivery:
+    """Message waiting to be delivered"""
+
+    chat_id: int
+    send: SendCallback
+    batch: BroadcastBatch
+
+
+class Broadcaster:
+    """Delivers messages in the background, with bounded concurrency.
+    The rate limits of the Telegram API are enforced by the :class:`OutboundRateLimiter` of the bot,
+    so the callbacks should pass ``rate_limit_args={"priority": Priority.NOTIFICATION}``.
+    The rate limiter is also the only one retrying the requests Telegram answers with RetryAfter.
+    A message is retried here only if its request did not reach Telegram, so that it is never sent twice
+
+    Args:
+        name: name of the broadcaster, used in the logs
+        max_retries: maximum number of times a message is retried after a connection error
+    """
+
+    def __init__(self, name: str, max_retries: int = 3):
+        self.name = name
+        self.max_retries = max_retries
+        self.metrics = BroadcastMetrics()
+        self.__queue: deque[_Delivery] = deque()
+        self.__workers: set[asyncio.Task] = set()
+        self.__loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def pending(self) -> int:
+        """Number of messages waiting to be delivered"""
+        return len(self.__queue)
+
+    def __bind_loop(self):
+        """Makes sure the state of the broadcaster belongs to the running event loop.
+        If the loop has changed, the deliveries left by the previous one are discarded
+        """
+        loop = asyncio.get_running_loop()
+        if self.__loop is loop:
+            return
+        if self.__queue:
+            logger.warning("%s: discarding %d deliveries of a closed event loop", self.name, len(self.__queue))
+        self.__loop = loop
+        self.__queue.clear()
+        self.__workers.clear()
+
+    def broadcast(self, deliveries: Iterable[tuple[int, SendCallback]], label: str) -> BroadcastBatch:
+        """Submits a batch of messages, returning immediately
+
+        Args:
+            deliveries: pairs of chat id and callback that sends the message to that chat
+            label: description of the batch, used in the logs
+
+        Returns:
+            batch the messages belong to, whose metrics are updated as they are delivered
+        """
+        self.__bind_loop()
+        batch = BroadcastBatch(label=label)
+        for chat_id, send in deliveries:
+            self.__queue.append(_Delivery(chat_id=chat_id, send=send, batch=batch))
+            batch.metrics.submitted += 1
+            self.metrics.submitted += 1
+
+        max_workers = max(1, Config.debug_get("notification_concurrency", default=8))
+        while len(self.__workers) < min(max_workers, len(self.__queue)):
+            worker = asyncio.create_task(self.__work(), name=f"{self.name}_worker")
+            self.__workers.add(worker)
+            worker.add_done_callback(self.__workers.discard)
+        return batch
+
+    async def join(self):
+        """Waits for all the submitted messages to be delivered"""
+        while self.__workers:
+            await asyncio.gather(*self.__workers, return_exceptions=True)
+
+    async def close(self):
+        """Stops the deliveries, discarding the messages that have not been sent yet"""
+        if self.__queue:
+            logger.warning("%s: discarding %d deliveries on shutdown", self.name, len(self.__queue))
+        self.__queue.clear()
+        for worker in self.__workers:
+            worker.cancel()
+        await asyncio.gather(*self.__workers, return_exceptions=True)
+
+    async def __work(self):
+        """Delivers the messages in the queue until it is empty"""
+        while self.__queue:
+            delivery = self.__queue.popleft()
+            sent = await self.__deliver(delivery)
+            if sent:
+                self.metrics.sent += 1
+            else:
+                self.metrics.failed += 1
+            delivery.batch.complete(sent)
+
+    async def __deliver(self, delivery: _Delivery) -> bool:
+        """Sends a message, retrying it after the errors that certainly prevented it from reaching Telegram
+
+        Args:
+            delivery: message to send
+
+        Returns:
+            whether the message has been delivered
+        """
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                self.metrics.retried += 1
+                delivery.batch.metrics.retried += 1
+            try:
+                await delivery.send()
+                return True
+            except RetryAfter as ex:  # flood control, already retried by the rate limiter
+                self.metrics.rate_limited += 1
+                delivery.batch.metrics.rate_limited += 1
+                logger.warning("%s: sending to %d: %s", self.name, delivery.chat_id, ex)
+            except (BadRequest, Forbidden):  # the user deleted the message or blocked the bot
+                pass
+            except NetworkError as ex:
+                logger.warning("%s: sending to %d: %s", self.name, delivery.chat_id, ex)
+                if is_unsent(ex):  # unlike a timeout, the message can't have been sent
+                    await asyncio.sleep(2**attempt)
+                    continue
+            except TelegramError as ex:
+                logger.error("%s: sending to %d: %s", self.name, delivery.chat_id, ex)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("%s: sending to %d", self.name, delivery.chat_id)
+            return False
+        return False
+
+
+follow_broadcaster = Broadcaster("follow_notifications")
@@ -0,0 +1,147 @@
+"""Routing of the callback queries to their handlers"""
+
+from hashlib import sha1
+from typing import Any, Callable, Coroutine, NamedTuple, Sequence
+
+from telegram import Update
+from telegram.ext import Application, BaseHandler, CallbackContext
+
+from spotted.data import Config
+
+CallbackFunction = Callable[[Update, CallbackContext], Coroutine[Any, Any, Any]]
+"""Function handling a callback query"""
+
+AUTOREPLY_PREFIX = "autoreply"
+"""Prefix of the callback data of the autoreply buttons"""
+
+
+class CallbackData(NamedTuple):
+    """Callback data of a button, in the form ``prefix,arg1,arg2,...``"""
+
+    prefix: str
+    args: tuple[str, ...]
+
+    @classmethod
+    def parse(cls, data: str) -> "CallbackData":
+        """Splits the callback data of a button into its prefix and its args
+
+        Args:
+            data: callback data of the button
+
+        Returns:
+            parsed callback data
+        """
+        prefix, *args = data.split(",")
+        return cls(prefix, tuple(args))
+
+
+class CallbackRouter(BaseHandler[Update, CallbackContext, Any]):
+    """Handler of all the callback queries whose data starts with one of the registered prefixes.
+    The callback data is parsed only once, and the callback is found with a lookup on its prefix,
+    instead of testing the pattern of a CallbackQueryHandler for each of them.
+    The args of the callback data are made available in ``context.args``
+
+    Args:
+        routes: callback to call for each prefix
+        block: whether the application must wait for the callback to complete
+    """
+
+    def __init__(self, routes: dict[str, CallbackFunction] | None = None, block: bool = True):
+        super().__init__(unrouted_callback, block=block)
+        self.routes: dict[str, CallbackFunction] = dict(routes or {})
+
+    def add_route(self, prefix: str, callback: CallbackFunction):
+        """Registers the callback for the callback queries with the given prefix
+
+        Args:
+            prefix: prefix of the callback data
+            callback: function handling the callback query
+        """
+        self.routes[prefix] = callback
+
+    def check_update(self, update: object) -> CallbackData | None:
+        """Checks whether the update is a callback query with one of the registered prefixes
+
+        Args:
+            update: incoming update
+
+        Returns:
+            parsed callback data, or None if the update must not be handled by the router
+        """
+        if not isinstance(update, Update) or update.callback_query is None or update.callback_query.data is None:
+            return None
+        callback_data = CallbackData.parse(update.callback_query.data)
+        if callback_data.prefix not in self.routes:
+            return None
+        return callback_data
+
+    def collect_additional_context(
+        self,
+        context: CallbackContext,
+        update: Update,
+        application: Application,
+        check_result: object,
+    ):
+        if isinstance(check_result, CallbackData):
+            context.args = list(check_result.args)
+
+    async def handle_update(
+        self,
+        update: Update,
+        application: Application,
+        check_result: object,
+        context: CallbackContext,
+    ):
+        if not isinstance(check_result, CallbackData):  # check_update never matches in this case
+            return None
+        self.collect_additional_context(context, update, application, check_result)
+        return await self.routes[check_result.prefix](update, context)
+
+
+async def unrouted_callback(_: Update, __: CallbackContext):
+    """Callback of the CallbackRouter required by the base handler.
+    It is never called, since the router calls the callback registered for the prefix directly
+    """
+
+
+def get_autoreplies_version() -> str:
+    """Short hash of the keys of the autoreplies, in order.
+    It is the same across restarts, and changes whenever an autoreply is added, removed or moved
+
+    Returns:
+        version of the autoreplies
+    """
+    keys = "\n".join(Config.autoreplies_get("autoreplies"))
+    return sha1(keys.encode(), usedforsecurity=False).hexdigest()[:6]
+
+
+def encode_autoreply(key: str) -> str:
+    """Generates the callback data of the button of an autoreply.
+    The key is replaced by its index, so that the data stays well within the 64 bytes allowed by Telegram,
+    and the version of the autoreplies makes sure an old button never selects a different autoreply
+
+    Args:
+        key: key of the autoreply in the autoreplies dictionary in the config file
+
+    Returns:
+        callback data of the button
+    """
+    index = list(Config.autoreplies_get("autoreplies")).index(key)
+    return f"{AUTOREPLY_PREFIX},{get_autoreplies_version()},{index}"
+
+
+def decode_autoreply(args: Sequence[str]) -> str | None:
+    """Finds the key of the autoreply selected by a button.
+    The buttons created before the short ids were introduced, which contain the key itself, are still accepted
+
+    Args:
+        args: args of the callback data of the button
+
+    Returns:
+        key of the autoreply, or None if the button refers to autoreplies that are no longer available
+    """
+    keys = list(Config.autoreplies_get("autoreplies"))
+    if len(args) == 2 and args[0] == get_autoreplies_version() and args[1].isdigit() and int(args[1]) < len(keys):
+        return keys[int(args[1])]
+    legacy_key = ",".join(args)
+    return legacy_key if legacy_key in keys else None
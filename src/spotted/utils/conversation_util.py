@@ -5,9 +5,10 @@ from typing import Any, Callable
 
 from telegram import Update
 from telegram.constants import ParseMode
-from telegram.ext import CallbackContext
+from telegram.error import BadRequest, Forbidden
+from telegram.ext import Application, CallbackContext, ConversationHandler
 
-from spotted.data import read_md
+from spotted.data import Config, read_md
 from spotted.utils.info_util import EventInfo
 
 
@@ -84,3 +85,76 @@ def conv_cancel(family: str) -> Callable[[Any, Any], Coroutine[Any, Any, int]]:
         return -1
 
     return cancel
+
+
+def get_conversation_timeout(name: str) -> int | None:
+    """Returns the number of seconds after which an idle conversation is ended,
+    as configured in ``debug.conversation_timeouts``
+
+    Args:
+        name: name of the conversation
+
+    Returns:
+        timeout of the conversation, or None if it never times out
+    """
+    timeout = Config.debug_get("conversation_timeouts", default={}).get(name, 0)
+    return timeout if timeout > 0 else None
+
+
+def conv_timeout(family: str, user_data_keys: tuple[str, ...] = ()) -> Callable[[Any, Any], Coroutine[Any, Any, None]]:
+    """Creates a function used to handle a conversation that timed out because the user stopped answering.
+    The data the conversation kept in the user_data is removed,
+    and if ``debug.conversation_timeout_notify`` is True the user is notified
+
+    Args:
+        family: family of the command
+        user_data_keys: keys of the user_data used only by the conversation
+
+    Returns:
+        function used to handle the timeout
+    """
+
+    async def timeout(update: Update, context: CallbackContext):
+        """Handles the timeout of the conversation.
+        Frees the user_data of the conversation, dropping the whole user_data if nothing else is left
+
+        Args:
+            update: last update received by the conversation
+            context: context passed by the handler
+        """
+        user = update.effective_user
+        if user is None:
+            return
+        if context.user_data is not None:
+            for key in user_data_keys:
+                context.user_data.pop(key, None)
+            if not context.user_data:
+                context.application.drop_user_data(user.id)
+
+        if not Config.debug_get("conversation_timeout_notify"):
+            return
+        try:  # the last update may come from a group, so the user is notified in the private chat
+            await context.bot.send_message(
+                chat_id=user.id, text=read_md(f"{family}_timeout"), parse_mode=ParseMode.MARKDOWN_V2
+            )
+        except (BadRequest, Forbidden):  # the user may have blocked the bot in the meantime
+            pass
+
+    return timeout
+
+
+def live_conversations(application: Application) -> dict[str, int]:
+    """Counts the conversations currently in progress, for each named conversation handler of the application
+
+    Args:
+        application: application the conversation handlers are registered to
+
+    Returns:
+        number of conversations in progress, by name of the conversation
+    """
+    return {
+        handler.name: len(handler._conversations)  # pylint: disable=protected-access
+        for handlers in application.handlers.values()
+        for handler in handlers
+        if isinstance(handler, ConversationHandler) and handler.name is not None
+    }
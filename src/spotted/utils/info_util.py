@@ -3,7 +3,6 @@
 from typing import Literal, cast
 
 from telegram import (
-    Bot,
     CallbackQuery,
     Chat,
     InlineKeyboardMarkup,
@@ -16,9 +15,17 @@ from telegram import (
     Update,
 )
 from telegram.error import BadRequest
-from telegram.ext import CallbackContext
-
-from spotted.data import Config, PendingPost, PublishedPost, User
+from telegram.ext import CallbackContext, ExtBot
+
+from spotted.data import (
+    ChatCache,
+    Config,
+    PendingPost,
+    PostAuthorStore,
+    PublishedPost,
+    User,
+    UserStatus,
+)
 from spotted.debug.log_manager import logger
 from spotted.utils.keyboard_util import (
     get_approve_kb,
@@ -32,7 +39,7 @@ class EventInfo:  # pylint: disable=too-many-public-methods
 
     def __init__(
         self,
-        bot: Bot,
+        bot: ExtBot,
         ctx: CallbackContext,
         update: Update | None = None,
         message: Message | None = None,
@@ -45,8 +52,8 @@ class EventInfo:  # pylint: disable=too-many-public-methods
         self.__query = query
 
     @property
-    def bot(self) -> Bot:
-        """Instance of the telegram bot"""
+    def bot(self) -> ExtBot:
+        """Instance of the telegram bot, which accepts the rate_limit_args of the rate limiter"""
         return self.__bot
 
     @property
@@ -117,6 +124,8 @@ class EventInfo:  # pylint: disable=too-many-public-methods
         If the update was caused by a callback, the callback data is splitted by ',' and returned"""
         # if the update was caused by a callback, the callback data is splitted by ',' and returned
         if self.__query is not None and self.__query.data is not None:
+            if self.__ctx.args is not None:  # the callback router has already parsed the callback data
+                return self.__ctx.args
             args = self.__query.data.split(",")
             if len(args) > 1:
                 return args[1:]
@@ -340,9 +349,12 @@ class EventInfo:  # pylint: disable=too-many-public-methods
         except BadRequest as ex:
             logger.error("EventInfo.edit_inline_keyboard: %s", ex)
 
-    async def send_post_to_admins(self) -> bool:
+    async def send_post_to_admins(self, user_status: UserStatus | None = None) -> bool:
         """Sends the post to the admin group, so it can be approved
 
+        Args:
+            user_status: status of the user that sent the post, if already loaded by the caller
+
         Returns:
             whether or not the operation was successful
         """
@@ -352,50 +364,19 @@ class EventInfo:  # pylint: disable=too-many-public-methods
         if message is None:
             return False
         admin_group_id = Config.post_get("admin_group_id")
-        poll = message.poll  # if the message is a poll, get its reference
 
         if self.user_id is None:
             return False
-        user = User(self.user_id)
-        credit_username: str | None = None
-        if user.is_credited:
-            assert self.chat_id is not None
-            chat = await self.bot.get_chat(self.chat_id)
-            if chat.username:
-                credit_username = chat.username
+        if user_status is None:
+            user_status = await User(self.user_id).aload_status()
+        credit_username = await self.__get_credit_username(user_status)
         try:
-            g_message: Message | MessageId
-            if poll:  # makes sure the poll is anonym
-                g_message = await self.__bot.send_poll(
-                    chat_id=admin_group_id,
-                    question=poll.question,
-                    options=[option.text for option in poll.options],
-                    type=poll.type,
-                    allows_multiple_answers=poll.allows_multiple_answers,
-                    correct_option_id=cast(Literal[0, 1, 2, 3, 4, 5, 6, 7, 8, 9] | None, poll.correct_option_id),
-                    reply_markup=get_approve_kb(credited_username=credit_username),
-                )
-            elif message.text and message.entities:  # maintains the previews, if present
-                show_preview = (self.user_data or {}).get("show_preview", True)
-                g_message = await self.__bot.send_message(
-                    chat_id=admin_group_id,
-                    text=message.text,
-                    reply_markup=get_approve_kb(credited_username=credit_username),
-                    entities=message.entities,
-                    link_preview_options=LinkPreviewOptions(not show_preview),
-                )
-            else:
-                g_message = await self.__bot.copy_message(
-                    chat_id=admin_group_id,
-                    from_chat_id=message.chat_id,
-                    message_id=message.message_id,
-                    reply_markup=get_approve_kb(credited_username=credit_username),
-                )
+            g_message = await self.__copy_post_to(admin_group_id, message, credit_username)
         except BadRequest as ex:
             logger.error("Sending the post on send_post_to: %s", ex)
             return False
 
-        PendingPost.create(
+        await PendingPost.acreate(
             user_message=message,
             admin_group_id=admin_group_id,
             g_message_id=g_message.message_id,
@@ -404,6 +385,59 @@ class EventInfo:  # pylint: disable=too-many-public-methods
 
         return True
 
+    async def __get_credit_username(self, user_status: UserStatus) -> str | None:
+        """Gets the username shown as the author of the post, if the user wants to be credited
+
+        Args:
+            user_status: status of the user that sent the post
+
+        Returns:
+            username of the user, or None if the post is anonymous or the user has no username
+        """
+        if not user_status.is_credited:
+            return None
+        assert self.chat_id is not None
+        chat = await ChatCache.get_chat(self.bot, self.chat_id)
+        return chat.username or None
+
+    async def __copy_post_to(self, chat_id: int, message: Message, credit_username: str | None) -> Message | MessageId:
+        """Sends a copy of the post to the admin group, with the keyboard used to vote it
+
+        Args:
+            chat_id: id of the admin group
+            message: message containing the post
+            credit_username: username shown as the author of the post, if any
+
+        Returns:
+            message sent to the admin group
+        """
+        poll = message.poll  # if the message is a poll, get its reference
+        if poll:  # makes sure the poll is anonym
+            return await self.__bot.send_poll(
+                chat_id=chat_id,
+                question=poll.question,
+                options=[option.text for option in poll.options],
+                type=poll.type,
+                allows_multiple_answers=poll.allows_multiple_answers,
+                correct_option_id=cast(Literal[0, 1, 2, 3, 4, 5, 6, 7, 8, 9] | None, poll.correct_option_id),
+                reply_markup=get_approve_kb(credited_username=credit_username),
+            )
+        if message.text and message.entities:  # maintains the previews, if present
+            show_preview = (self.user_data or {}).get("show_preview", True)
+            return await self.__bot.send_message(
+                chat_id=chat_id,
+                text=message.text,
+                reply_markup=get_approve_kb(credited_username=credit_username),
+                entities=message.entities,
+                link_preview_options=LinkPreviewOptions(not show_preview),
+            )
+        return await self.__bot.copy_message(
+            chat_id=chat_id,
+            from_chat_id=message.chat_id,
+            message_id=message.message_id,
+            reply_markup=get_approve_kb(credited_username=credit_username),
+        )
+
     async def send_post_to_channel(self, user_id: int):
         """Sends the post to  the channel, so it can be enjoyed by the users (and voted, if comments are disabled)"""
 
@@ -436,9 +470,9 @@ class EventInfo:  # pylint: disable=too-many-public-methods
             )
 
         if not Config.post_get("comments"):  # if the user can vote directly on the post
-            PublishedPost.create(c_message_id=c_message.message_id, channel_id=channel_id)
+            await PublishedPost.acreate(c_message_id=c_message.message_id, channel_id=channel_id)
         else:  # ... else, if comments are enabled, save the user_id, so the user can be credited
-            self.bot_data[f"{channel_id},{c_message.message_id}"] = user_id
+            await PostAuthorStore.aset(channel_id=channel_id, c_message_id=c_message.message_id, user_id=user_id)
 
     async def send_post_to_channel_group(self):
         """If comments are enabled, sends the post to the group associated to the channel,
@@ -448,9 +482,12 @@ class EventInfo:  # pylint: disable=too-many-public-methods
         message = self.__message
         assert message is not None
         community_group_id = Config.post_get("community_group_id")
-        user_id = self.bot_data.pop(f"{self.forward_from_chat_id},{self.forward_from_id}", -1)
+        user_id = None
+        channel_id, c_message_id = self.forward_from_chat_id, self.forward_from_id
+        if channel_id is not None and c_message_id is not None:  # the message was forwarded from the channel
+            user_id = await PostAuthorStore.apop(channel_id=channel_id, c_message_id=c_message_id)
 
-        sign = await User(user_id).get_user_sign(bot=self.__bot)
+        sign = await User(user_id if user_id is not None else -1).get_user_sign(bot=self.__bot)
         post_message = await self.__bot.send_message(
             chat_id=community_group_id,
             text=f"by: {sign}",
@@ -458,7 +495,7 @@ class EventInfo:  # pylint: disable=too-many-public-methods
             reply_to_message_id=message.message_id,
         )
 
-        PublishedPost.create(channel_id=community_group_id, c_message_id=post_message.message_id)
+        await PublishedPost.acreate(channel_id=community_group_id, c_message_id=post_message.message_id)
 
     async def show_admins_votes(self, pending_post: PendingPost, reason: str | None = None):
         """After a post is been approved or rejected, shows the admins that approved or rejected it \
@@ -470,7 +507,7 @@ class EventInfo:  # pylint: disable=too-many-public-methods
         """
         inline_keyboard = await get_post_outcome_kb(
             bot=self.__bot,
-            votes=cast(list[tuple[int, bool]], pending_post.get_list_admin_votes(vote=None)),
+            votes=cast(list[tuple[int, bool]], await pending_post.aget_list_admin_votes(vote=None)),
             reason=reason,
         )
 
@@ -478,22 +515,14 @@ class EventInfo:  # pylint: disable=too-many-public-methods
             chat_id=pending_post.admin_group_id, message_id=pending_post.g_message_id, reply_markup=inline_keyboard
         )
 
-        remaining_pending_posts = PendingPost.get_all(admin_group_id=pending_post.admin_group_id)
-
-        # remove the post from the pending posts
-        remaining_pending_posts = [
-            post for post in remaining_pending_posts if post.g_message_id != pending_post.g_message_id
-        ]
-
-        remaining_pending_posts.sort(key=lambda post: post.g_message_id)
-
-        remaining_pending_posts_count = len(remaining_pending_posts)
+        remaining_pending_posts_count, oldest_g_message_id = await PendingPost.aget_remaining(
+            admin_group_id=pending_post.admin_group_id, exclude_g_message_id=pending_post.g_message_id
+        )
 
         # if there are pending post, reply to the oldest one with the number of remaining pending posts
         if remaining_pending_posts_count > 0:
             text = f"⬆️ Post in attesa\nRimangono {remaining_pending_posts_count} post in attesa"
-            oldest_pending_post = remaining_pending_posts[0]
 
             await self.__bot.send_message(
-                chat_id=pending_post.admin_group_id, text=text, reply_to_message_id=oldest_pending_post.g_message_id
+                chat_id=pending_post.admin_group_id, text=text, reply_to_message_id=oldest_g_message_id
             )
@@ -1,13 +1,64 @@
 """Creates the inlinekeyboard sent by the bot in its messages.
 Callback_data format: <callback_family>_<callback_name>,[arg]"""
 
+import asyncio
+from collections.abc import Callable, Hashable
 from itertools import islice, zip_longest
+from typing import TypeVar
 
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
 
-from spotted.data import Config, PendingPost
+from spotted.data import ChatCache, Config, PendingPost
+from spotted.utils.callback_util import encode_autoreply
 from spotted.utils.constants import APPROVED_KB, REJECTED_KB
 
+T = TypeVar("T")
+
+
+class KeyboardCache:
+    """Cache of the keyboards that only depend on the configuration.
+    Telegram objects are immutable, so the same keyboard can be sent in any number of messages.
+    The whole cache is invalidated when the configuration is reloaded or overridden
+    """
+
+    __keyboards: dict[Hashable, object] = {}
+    __generation = -1
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def get(cls, key: Hashable, builder: Callable[[], T]) -> T:
+        """Returns the cached keyboard, building and caching it on a miss
+
+        Args:
+            key: key identifying the keyboard, including any argument it is built with
+            builder: function that builds the keyboard
+
+        Returns:
+            keyboard
+        """
+        if cls.__generation != Config.generation():  # the configuration changed since the keyboards were built
+            cls.__keyboards.clear()
+            cls.__generation = Config.generation()
+        if key in cls.__keyboards:
+            cls.hits += 1
+            return cls.__keyboards[key]  # type: ignore[return-value]
+        cls.misses += 1
+        keyboard = cls.__keyboards[key] = builder()
+        return keyboard
+
+    @classmethod
+    def size(cls) -> int:
+        """Number of cached keyboards"""
+        return len(cls.__keyboards)
+
+    @classmethod
+    def clear(cls):
+        """Removes all the cached keyboards and resets the counters"""
+        cls.__keyboards.clear()
+        cls.hits = 0
+        cls.misses = 0
+
 
 def get_confirm_kb() -> InlineKeyboardMarkup:
     """Generates the InlineKeyboard to confirm the creation of the post
@@ -15,13 +66,16 @@ def get_confirm_kb() -> InlineKeyboardMarkup:
     Returns:
         new inline keyboard
     """
-    return InlineKeyboardMarkup(
-        [
+    return KeyboardCache.get(
+        "confirm",
+        lambda: InlineKeyboardMarkup(
             [
-                InlineKeyboardButton(text="Si", callback_data="post_confirm,submit"),
-                InlineKeyboardButton(text="No", callback_data="post_confirm,cancel"),
+                [
+                    InlineKeyboardButton(text="Si", callback_data="post_confirm,submit"),
+                    InlineKeyboardButton(text="No", callback_data="post_confirm,cancel"),
+                ]
             ]
-        ]
+        ),
     )
 
 
@@ -31,13 +85,16 @@ def get_preview_kb() -> InlineKeyboardMarkup:
     Returns:
         new inline keyboard
     """
-    return InlineKeyboardMarkup(
-        [
+    return KeyboardCache.get(
+        "preview",
+        lambda: InlineKeyboardMarkup(
             [
-                InlineKeyboardButton(text="Si", callback_data="post_preview,accept"),
-                InlineKeyboardButton(text="No", callback_data="post_preview,reject"),
+                [
+                    InlineKeyboardButton(text="Si", callback_data="post_preview,accept"),
+                    InlineKeyboardButton(text="No", callback_data="post_preview,reject"),
+                ]
             ]
-        ]
+        ),
     )
 
 
@@ -47,13 +104,16 @@ def get_settings_kb() -> InlineKeyboardMarkup:
     Returns:
         new inline keyboard
     """
-    return InlineKeyboardMarkup(
-        [
+    return KeyboardCache.get(
+        "settings",
+        lambda: InlineKeyboardMarkup(
             [
-                InlineKeyboardButton(" Anonimo ", callback_data="settings,anonimo"),
-                InlineKeyboardButton(" Con credit ", callback_data="settings,credit"),
+                [
+                    InlineKeyboardButton(" Anonimo ", callback_data="settings,anonimo"),
+                    InlineKeyboardButton(" Con credit ", callback_data="settings,credit"),
+                ]
             ]
-        ]
+        ),
     )
 
 
@@ -62,9 +122,8 @@ def get_approve_kb(
 ) -> InlineKeyboardMarkup:
     """Generates the InlineKeyboard for the pending post.
     If the pending post is None, the keyboard will be generated with 0 votes.
-    Otherwise, the keyboard will be generated with the correct number of votes.
-    To avoid unnecessary queries, the number of votes can be passed as an argument
-    and will be assumed to be correct.
+    Otherwise, the keyboard will be generated with the number of votes stored in the pending post.
+    The number of votes can also be passed as an argument and will be assumed to be correct.
 
     Args:
         pending_post: existing pending post to which the keyboard is attached
@@ -79,8 +138,8 @@ def get_approve_kb(
         n_approve = 0
         n_reject = 0
     else:
-        n_approve = pending_post.get_votes(vote=True) if approve < 0 else approve
-        n_reject = pending_post.get_votes(vote=False) if reject < 0 else reject
+        n_approve = pending_post.approve_count if approve < 0 else approve
+        n_reject = pending_post.reject_count if reject < 0 else reject
         credited_username = pending_post.get_credit_username()
     return InlineKeyboardMarkup(
         [
@@ -99,7 +158,7 @@ def get_approve_kb(
 
 
 def get_autoreply_kb(page: int, items_per_page: int) -> list[list[InlineKeyboardButton]]:
-    """Generates the keyboard for the autoreplies
+    """Generates the keyboard for the autoreplies. The rows of each page are built once and then cached
 
     Args:
         page: page of the autoreplies
@@ -108,6 +167,20 @@ def get_autoreply_kb(page: int, items_per_page: int) -> list[list[InlineKeyboard
     Returns:
         new part of keyboard
     """
+    rows = KeyboardCache.get(("autoreply", page, items_per_page), lambda: _build_autoreply_rows(page, items_per_page))
+    return [list(row) for row in rows]
+
+
+def _build_autoreply_rows(page: int, items_per_page: int) -> tuple[tuple[InlineKeyboardButton, ...], ...]:
+    """Builds the rows of buttons of a page of autoreplies, two buttons per row
+
+    Args:
+        page: page of the autoreplies
+        items_per_page: number of items per page
+
+    Returns:
+        rows of the keyboard
+    """
     keyboard = []
 
     autoreplies = islice(Config.autoreplies_get("autoreplies"), page * items_per_page, (page + 1) * items_per_page)
@@ -116,17 +189,31 @@ def get_autoreply_kb(page: int, items_per_page: int) -> list[list[InlineKeyboard
         new_row = []
         for autoreply in row:
             if autoreply is not None:
-                new_row.append(InlineKeyboardButton(autoreply, callback_data=f"autoreply,{autoreply}"))
-        keyboard.append(new_row)
+                new_row.append(InlineKeyboardButton(autoreply, callback_data=encode_autoreply(autoreply)))
+        keyboard.append(tuple(new_row))
 
-    return keyboard
+    return tuple(keyboard)
 
 
 def get_paused_kb(page: int, items_per_page: int) -> InlineKeyboardMarkup:
-    """Generates the InlineKeyboard for the paused post
+    """Generates the InlineKeyboard for the paused post. Each page is built once and then cached
+
+    Args:
+        page: page of the autoreplies
+        items_per_page: number of items per page
+
+    Returns:
+        autoreplies keyboard append with resume button
+    """
+    return KeyboardCache.get(("paused", page, items_per_page), lambda: _build_paused_kb(page, items_per_page))
+
+
+def _build_paused_kb(page: int, items_per_page: int) -> InlineKeyboardMarkup:
+    """Builds the InlineKeyboard for a page of the paused post
 
     Args:
         page: page of the autoreplies
+        items_per_page: number of items per page
 
     Returns:
         autoreplies keyboard append with resume button
@@ -158,6 +245,15 @@ def get_paused_kb(page: int, items_per_page: int) -> InlineKeyboardMarkup:
 def get_published_post_kb() -> InlineKeyboardMarkup | None:
     """Generates the InlineKeyboard for the published post adding the report button if needed
 
+    Returns:
+        new inline keyboard
+    """
+    return KeyboardCache.get("published_post", _build_published_post_kb)
+
+
+def _build_published_post_kb() -> InlineKeyboardMarkup | None:
+    """Builds the InlineKeyboard for the published post adding the report button if needed
+
     Returns:
         new inline keyboard
     """
@@ -193,16 +289,17 @@ async def get_post_outcome_kb(
     approved_by = [vote[0] for vote in votes if vote[1]]
     rejected_by = [vote[0] for vote in votes if not vote[1]]
 
+    # retrieve all the voters at once, instead of one request after the other
+    voters = list(dict.fromkeys(approved_by + rejected_by))
+    chats = await asyncio.gather(*(ChatCache.get_chat(bot, voter) for voter in voters))
+    usernames = {voter: chat.username for voter, chat in zip(voters, chats)}
+
     # keyboard with 2 columns: one for the approve votes and one for the reject votes
     for approve, reject in zip_longest(approved_by, rejected_by, fillvalue=False):
         keyboard.append(
             [
-                InlineKeyboardButton(
-                    f"🟢 {(await bot.get_chat(approve)).username}" if approve else "", callback_data="none"
-                ),
-                InlineKeyboardButton(
-                    f"🔴 {(await bot.get_chat(reject)).username}" if reject else "", callback_data="none"
-                ),
+                InlineKeyboardButton(f"🟢 {usernames[approve]}" if approve else "", callback_data="none"),
+                InlineKeyboardButton(f"🔴 {usernames[reject]}" if reject else "", callback_data="none"),
             ]
         )
 
@@ -0,0 +1,209 @@
+"""Background search of the published posts whose message has been deleted from the channel"""
+
+import asyncio
+import logging
+import time
+
+from telegram.error import BadRequest, TelegramError
+from telegram.ext import ExtBot
+
+from spotted.data import Config, PublishedPost, PurgeCheckpoint
+from spotted.utils.rate_limit_util import Priority
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 100
+"""Maximum number of messages that can be forwarded or deleted with a single request"""
+LOST_MESSAGES_ERRORS = ("message to forward not found", "message_id_invalid")
+"""Errors returned by Telegram when none of the messages to forward exist"""
+
+
+class PurgeEngine:
+    """Checks which published posts still exist in the channel, deleting the lost ones from the database.
+    The posts are read from the database one page at a time and checked in batches of up to 100 messages,
+    forwarding them all at once to the admin group and deleting the copies right after.
+    Up to ``debug.purge_concurrency`` batches are checked at the same time, with the rate limits of the bot.
+    The progress is saved in a :class:`PurgeCheckpoint` after each page, so that the purge can be resumed after a restart,
+    and it is shown in the admin group every ``debug.purge_progress_interval`` seconds
+    """
+
+    def __init__(self):
+        self.__task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        """Whether a purge is in progress"""
+        return self.__task is not None and not self.__task.done()
+
+    def start(self, bot: ExtBot, checkpoint: PurgeCheckpoint) -> bool:
+        """Starts the purge in the background, from the checkpoint
+
+        Args:
+            bot: bot used to check the posts
+            checkpoint: progress of the purge, already saved in the database
+
+        Returns:
+            whether the purge has been started, or False if one was already in progress
+        """
+        if self.running:
+            return False
+        self.__task = asyncio.create_task(self.run(bot, checkpoint), name="purge")
+        return True
+
+    async def join(self):
+        """Waits for the purge in progress, if any, to complete"""
+        if self.__task is not None:
+            await asyncio.gather(self.__task, return_exceptions=True)
+
+    async def close(self):
+        """Stops the purge in progress. It will be resumed from the last checkpoint"""
+        if self.__task is not None:
+            self.__task.cancel()
+            await asyncio.gather(self.__task, return_exceptions=True)
+            self.__task = None
+
+    async def run(self, bot: ExtBot, checkpoint: PurgeCheckpoint):
+        """Checks all the published posts after the checkpoint, then notifies the outcome in the chat of the checkpoint
+
+        Args:
+            bot: bot used to check the posts
+            checkpoint: progress of the purge, already saved in the database
+        """
+        concurrency = max(1, Config.debug_get("purge_concurrency", default=2))
+        progress_interval = Config.debug_get("purge_progress_interval", default=30)
+        last_progress = time.monotonic()
+        try:
+            while posts := await PublishedPost.aget_after(checkpoint.last_key, limit=MAX_BATCH_SIZE * concurrency):
+                batches = self.split_batches(posts)
+                # every batch is awaited, so that none of them is still running when the purge is interrupted
+                results = await asyncio.gather(
+                    *(self.find_lost(bot, checkpoint.chat_id, batch) for batch in batches), return_exceptions=True
+                )
+                lost: list[PublishedPost] = []
+                for result in results:
+                    if isinstance(result, BaseException):
+                        raise result
+                    lost.extend(result)
+                await checkpoint.aadvance(checked=posts, lost=lost)
+
+                if time.monotonic() - last_progress >= progress_interval:
+                    last_progress = time.monotonic()
+                    await self.__show_progress(bot, checkpoint)
+        except TelegramError as ex:  # the purge can be resumed with /purge
+            logger.error("Purge interrupted: %s", ex)
+            await self.__notify_interrupted(bot, checkpoint, ex)
+            return
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            logger.exception("Purge interrupted by an unexpected error")
+            try:
+                await checkpoint.asave()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Saving the checkpoint of the interrupted purge")
+            await self.__notify_interrupted(bot, checkpoint, ex)
+            return
+
+        await PurgeCheckpoint.adelete()
+        total = checkpoint.checked
+        avg = round(checkpoint.lost / (total if total != 0 else 1), 3)
+        await bot.send_message(
+            checkpoint.chat_id, text=f"Dei {total} totali, {checkpoint.lost} sono andati persi. Il rapporto è {avg}"
+        )
+
+    @staticmethod
+    def split_batches(posts: list[PublishedPost]) -> list[list[PublishedPost]]:
+        """Splits the posts in batches of consecutive posts of the same channel, with at most 100 posts each
+
+        Args:
+            posts: posts to split, ordered by channel and message id
+
+        Returns:
+            batches of posts, in the same order
+        """
+        batches: list[list[PublishedPost]] = []
+        for post in posts:
+            if not batches or len(batches[-1]) == MAX_BATCH_SIZE or batches[-1][0].channel_id != post.channel_id:
+                batches.append([])
+            batches[-1].append(post)
+        return batches
+
+    async def find_lost(self, bot: ExtBot, chat_id: int, posts: list[PublishedPost]) -> list[PublishedPost]:
+        """Finds the posts whose message no longer exists in the channel.
+        The posts are forwarded to the chat all at once, and the copies are deleted right after.
+        Telegram skips the messages that can't be found, so if only some of them have been forwarded,
+        the batch is split in half until the missing ones are identified
+
+        Args:
+            bot: bot used to check the posts
+            chat_id: chat the posts are temporarily forwarded to
+            posts: posts of the same channel to check, at most 100
+
+        Returns:
+            posts whose message could not be found
+        """
+        try:
+            forwarded = await bot.forward_messages(
+                chat_id,
+                from_chat_id=posts[0].channel_id,
+                message_ids=[post.c_message_id for post in posts],
+                disable_notification=True,
+                rate_limit_args={"priority": Priority.BULK},
+            )
+        except BadRequest as ex:
+            if not any(error in ex.message.lower() for error in LOST_MESSAGES_ERRORS):
+                raise  # e.g. the bot is no longer allowed to read the channel
+            forwarded = ()
+
+        if forwarded:
+            try:
+                await bot.delete_messages(
+                    chat_id,
+                    message_ids=[message.message_id for message in forwarded],
+                    rate_limit_args={"priority": Priority.BULK},
+                )
+            except BadRequest as ex:
+                logger.warning("Deleting the messages forwarded by /purge: %s", ex)
+
+        if len(forwarded) == 0:
+            return posts
+        if len(forwarded) == len(posts):
+            return []
+        half = len(posts) // 2
+        return await self.find_lost(bot, chat_id, posts[:half]) + await self.find_lost(bot, chat_id, posts[half:])
+
+    @staticmethod
+    async def __notify_interrupted(bot: ExtBot, checkpoint: PurgeCheckpoint, ex: Exception):
+        """Notifies that the purge has been interrupted, and that it can be resumed with /purge
+
+        Args:
+            bot: bot used to send the message
+            checkpoint: progress of the purge
+            ex: error that interrupted the purge
+        """
+        await bot.send_message(
+            checkpoint.chat_id,
+            text=f"✖️ Purge interrotto dopo {checkpoint.checked} post: {ex}\nUsa /purge per riprenderlo",
+        )
+
+    @staticmethod
+    async def __show_progress(bot: ExtBot, checkpoint: PurgeCheckpoint):
+        """Updates the message showing the progress of the purge
+
+        Args:
+            bot: bot used to edit the message
+            checkpoint: progress of the purge
+        """
+        if checkpoint.progress_message_id is None:
+            return
+        try:
+            await bot.edit_message_text(
+                chat_id=checkpoint.chat_id,
+                message_id=checkpoint.progress_message_id,
+                text=f"Purge in corso: controllati {checkpoint.checked} post su {checkpoint.total}, "
+                f"{checkpoint.lost} persi",
+                rate_limit_args={"priority": Priority.BULK},
+            )
+        except BadRequest as ex:
+            logger.warning("Updating the progress of /purge: %s", ex)
+
+
+purge_engine = PurgeEngine()
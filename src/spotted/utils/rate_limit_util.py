@@ -0,0 +1,339 @@
+"""Tools used to respect the rate limits of the Telegram API"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import warnings
+from collections import OrderedDict
+from datetime import timedelta
+from enum import IntEnum
+from typing import Any, Callable, Coroutine
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from telegram.warnings import PTBDeprecationWarning
+
+from spotted.data import Config
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Priority of a request to the Telegram API. Requests with a lower value are served first"""
+
+    ADMIN = 0
+    """Requests to the admin group, e.g. updating the votes of a pending post"""
+    USER = 1
+    """Replies to the users interacting with the bot"""
+    NOTIFICATION = 2
+    """Notifications sent in the background, e.g. to the users following a spot"""
+    BULK = 3
+    """Requests made by scheduled jobs or maintenance commands"""
+
+
+class TokenBucket:  # pylint: disable=too-many-instance-attributes
+    """Asynchronous token bucket.
+    Up to ``capacity`` tokens can be consumed in a burst, then they are refilled at ``rate`` tokens per second.
+    Coroutines waiting for a token are served by priority, and in order among the same priority
+
+    Args:
+        rate: tokens added to the bucket each second
+        capacity: maximum number of tokens in the bucket. Defaults to the rate, with a minimum of 1
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError("The rate of a token bucket must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.__tokens = self.capacity
+        self.__last_refill = time.monotonic()
+        self.__last_used = self.__last_refill
+        self.__waiters: list[tuple[int, int]] = []
+        self.__tickets = itertools.count()
+        self.__condition = asyncio.Condition()
+
+    def __refill(self):
+        """Adds the tokens accumulated since the last refill"""
+        now = time.monotonic()
+        self.__tokens = min(self.capacity, self.__tokens + (now - self.__last_refill) * self.rate)
+        self.__last_refill = now
+
+    @property
+    def tokens(self) -> float:
+        """Number of tokens currently available"""
+        self.__refill()
+        return self.__tokens
+
+    @property
+    def is_idle(self) -> bool:
+        """Whether no one is waiting for a token and the last one was consumed longer ago than it takes to refill
+        the bucket, so that replacing it with a new bucket would not change the rate limit
+        """
+        return not self.__waiters and time.monotonic() - self.__last_used >= self.capacity / self.rate
+
+    def try_acquire(self) -> bool:
+        """Consumes a token, if one is available and no one else is waiting for it
+
+        Returns:
+            whether the token has been consumed
+        """
+        if self.__waiters:
+            return False
+        self.__refill()
+        if self.__tokens >= 1:
+            self.__tokens -= 1
+            self.__last_used = time.monotonic()
+            return True
+        return False
+
+    async def acquire(self, priority: int = 0):
+        """Consumes a token, waiting for one to be available if needed
+
+        Args:
+            priority: priority of the request. Waiters with a lower value are served first
+        """
+        waiter = (priority, next(self.__tickets))
+        async with self.__condition:
+            heapq.heappush(self.__waiters, waiter)
+            try:
+                while True:
+                    self.__refill()
+                    is_first = self.__waiters[0] == waiter
+                    if is_first and self.__tokens >= 1:
+                        heapq.heappop(self.__waiters)
+                        self.__tokens -= 1
+                        self.__last_used = time.monotonic()
+                        return
+                    # only the first waiter knows when the next token will be available
+                    timeout = (1 - self.__tokens) / self.rate if is_first else None
+                    try:
+                        await asyncio.wait_for(self.__condition.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                if waiter in self.__waiters:  # the waiter has been cancelled
+                    self.__waiters.remove(waiter)
+                    heapq.heapify(self.__waiters)
+                self.__condition.notify_all()
+
+
+def get_retry_after(ex: RetryAfter) -> float:
+    """Gets the number of seconds to wait before retrying a request that failed due to flood control
+
+    Args:
+        ex: exception raised by the Telegram API
+
+    Returns:
+        seconds to wait
+    """
+    with warnings.catch_warnings():  # retry_after will become a timedelta in future versions
+        warnings.simplefilter("ignore", PTBDeprecationWarning)
+        retry_after = ex.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+SEND_ENDPOINTS = frozenset(
+    {
+        "sendMessage",
+        "sendPhoto",
+        "sendAudio",
+        "sendDocument",
+        "sendVideo",
+        "sendAnimation",
+        "sendVoice",
+        "sendVideoNote",
+        "sendPaidMedia",
+        "sendMediaGroup",
+        "sendLocation",
+        "sendVenue",
+        "sendContact",
+        "sendPoll",
+        "sendDice",
+        "sendSticker",
+        "sendInvoice",
+        "sendGame",
+        "copyMessage",
+        "copyMessages",
+        "forwardMessage",
+        "forwardMessages",
+    }
+)
+"""Endpoints that send new messages in a chat, which are the only ones subject to the limits of each chat"""
+
+
+class OutboundRateLimiter(BaseRateLimiter[dict[str, Any]]):
+    """Rate limiter every request of the bot goes through.
+    It enforces a global token bucket and a token bucket for each private chat and for each group,
+    serving the requests by :class:`Priority`.
+    The buckets of the chats only apply to the requests sending new messages (:data:`SEND_ENDPOINTS`),
+    while edits, deletions and moderation actions are only subject to the global bucket.
+    When Telegram answers with RetryAfter, all the requests are paused for the requested time,
+    and the failed one is retried up to ``debug.rate_limit_max_retries`` times.
+    This is the only place where flood waits are retried: the :class:`Broadcaster` gives up on a message
+    that still fails with RetryAfter, so a notification takes at most ``debug.rate_limit_max_retries + 1`` attempts.
+
+    At most :attr:`MAX_CHAT_BUCKETS` buckets of the chats are kept. When a new one is needed,
+    the buckets that have been idle for longer than their refill window are dropped, starting from the least recently
+    used one. If there are still too many, the least recently used one is dropped anyway.
+    Since each attempt of a request takes its bucket again, the ones in use are the last to be dropped.
+
+    The priority of a request can be set with ``rate_limit_args={"priority": Priority.BULK}``.
+    Otherwise, the requests to the admin group have :attr:`Priority.ADMIN` and all the others :attr:`Priority.USER`
+    """
+
+    MAX_CHAT_BUCKETS = 1024
+
+    def __init__(self):
+        self.__global_bucket = TokenBucket(rate=1)
+        self.__chat_buckets: OrderedDict[int | str, TokenBucket] = OrderedDict()
+        self.__paused_until = 0.0
+        self.retried = 0
+
+    async def initialize(self):
+        """Creates the token buckets, reading the limits from the settings"""
+        rate = Config.debug_get("rate_limit_global", default=30)
+        self.__global_bucket = TokenBucket(rate=rate, capacity=rate)
+        self.__chat_buckets.clear()
+        self.__paused_until = 0.0
+
+    async def shutdown(self):
+        """Clears the token buckets"""
+        self.__chat_buckets.clear()
+
+    @staticmethod
+    def get_priority(data: dict[str, Any], rate_limit_args: dict[str, Any] | None) -> int:
+        """Gets the priority of a request
+
+        Args:
+            data: parameters of the request
+            rate_limit_args: additional arguments passed to the bot method, if any
+
+        Returns:
+            priority of the request
+        """
+        if rate_limit_args is not None and "priority" in rate_limit_args:
+            return int(rate_limit_args["priority"])
+        if str(data.get("chat_id")) == str(Config.post_get("admin_group_id")):
+            return Priority.ADMIN
+        return Priority.USER
+
+    @staticmethod
+    def get_chat_key(chat_id: int | str) -> int | str:
+        """Returns the key of the token bucket of the chat, so that the same chat always uses the same bucket,
+        whether it is referred to by its id, by its id as a string or, for the channel of the bot, by its tag
+
+        Args:
+            chat_id: id or public username of the chat
+
+        Returns:
+            key of the chat
+        """
+        if isinstance(chat_id, int):
+            return chat_id
+        if chat_id.lstrip("-").isdigit():
+            return int(chat_id)
+        if chat_id.lower() == str(Config.post_get("channel_tag")).lower():
+            return int(Config.post_get("channel_id"))
+        return chat_id.lower()
+
+    @property
+    def chat_buckets(self) -> int:
+        """Number of token buckets of the chats currently kept"""
+        return len(self.__chat_buckets)
+
+    def __get_chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        """Returns the token bucket of the chat, creating it if needed.
+        Groups and channels have a negative id or a public username
+
+        Args:
+            chat_id: id of the chat
+
+        Returns:
+            token bucket of the chat
+        """
+        chat_id = self.get_chat_key(chat_id)
+        bucket = self.__chat_buckets.get(chat_id)
+        if bucket is not None:
+            self.__chat_buckets.move_to_end(chat_id)
+            return bucket
+        self.__evict_chat_buckets()
+        if isinstance(chat_id, str) or chat_id < 0:
+            per_minute = Config.debug_get("rate_limit_group", default=20)
+            bucket = TokenBucket(rate=per_minute / 60, capacity=per_minute)
+        else:
+            bucket = TokenBucket(
+                rate=Config.debug_get("rate_limit_chat", default=1),
+                capacity=Config.debug_get("rate_limit_chat_burst", default=3),
+            )
+        self.__chat_buckets[chat_id] = bucket
+        return bucket
+
+    def __evict_chat_buckets(self):
+        """Drops the least recently used buckets of the chats while they are idle,
+        then the least recently used ones anyway, until there is room for a new bucket.
+        A request still waiting on a dropped bucket keeps using it
+        """
+        while self.__chat_buckets:
+            bucket = next(iter(self.__chat_buckets.values()))
+            if not bucket.is_idle and len(self.__chat_buckets) < self.MAX_CHAT_BUCKETS:
+                return
+            self.__chat_buckets.popitem(last=False)
+
+    async def __wait_turn(self, chat_id: int | str | None, priority: int):
+        """Waits until the request can be sent without exceeding any rate limit
+
+        Args:
+            chat_id: id of the chat the request sends a message to, if any
+            priority: priority of the request
+        """
+        loop = asyncio.get_running_loop()
+        while (delay := self.__paused_until - loop.time()) > 0:
+            await asyncio.sleep(delay)
+        if chat_id is not None:
+            await self.__get_chat_bucket(chat_id).acquire(priority)
+        await self.__global_bucket.acquire(priority)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, bool | dict[str, Any] | list[dict[str, Any]]]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: dict[str, Any] | None,
+    ) -> bool | dict[str, Any] | list[dict[str, Any]]:
+        """Sends the request as soon as the rate limits allow it, retrying it if Telegram asks to
+
+        Args:
+            callback: coroutine function that sends the request
+            args: positional arguments for the callback
+            kwargs: keyword arguments for the callback
+            endpoint: endpoint of the Telegram API
+            data: parameters of the request
+            rate_limit_args: additional arguments passed to the bot method, if any
+
+        Returns:
+            result of the request
+        """
+        priority = self.get_priority(data, rate_limit_args)
+        chat_id = data.get("chat_id") if endpoint in SEND_ENDPOINTS else None
+        max_retries = Config.debug_get("rate_limit_max_retries", default=3)
+        attempt = 0
+        while True:
+            await self.__wait_turn(chat_id, priority)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as ex:
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                self.retried += 1
+                retry_after = get_retry_after(ex)
+                loop = asyncio.get_running_loop()
+                self.__paused_until = max(self.__paused_until, loop.time() + retry_after)
+                logger.warning("%s: %s, retrying (%d/%d)", endpoint, ex, attempt, max_retries)
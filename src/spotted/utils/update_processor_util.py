@@ -0,0 +1,92 @@
+"""Processor that handles the updates concurrently, while keeping the order of the ones that depend on each other"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Hashable
+
+from telegram import Update
+from telegram.constants import ChatType
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class ChatUpdateProcessor(BaseUpdateProcessor):
+    """Update processor that handles the updates coming from different chats in parallel,
+    while the updates of the same chat are processed one at a time, in the order they were received.
+    This keeps the conversations and the commands of each user consistent.
+
+    The callback queries of the buttons in a group are serialized per message instead,
+    so that the votes on the same pending post are counted one at a time,
+    but the admins can vote different posts at the same time.
+    Updates that don't belong to any chat are processed without restrictions
+
+    Args:
+        max_concurrent_updates: maximum number of updates processed at the same time.
+            The updates waiting for their turn in a chat don't count towards this limit
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self.__queues: dict[Hashable, deque[Awaitable[Any]]] = {}
+
+    @staticmethod
+    def get_update_key(update: object) -> Hashable | None:
+        """Returns the key identifying the updates that must be processed in order with the given one
+
+        Args:
+            update: update to be processed
+
+        Returns:
+            key of the update, or None if it can be processed without restrictions
+        """
+        if not isinstance(update, Update) or update.effective_chat is None:
+            return None
+        chat = update.effective_chat
+        query = update.callback_query
+        if query is not None and query.message is not None and chat.type != ChatType.PRIVATE:
+            return ("message", chat.id, query.message.message_id)
+        return ("chat", chat.id)
+
+    @property
+    def active_keys(self) -> int:
+        """Number of keys with at least an update being processed or waiting for its turn"""
+        return len(self.__queues)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        """Processes the update, unless another update with the same key is being processed.
+        In that case the update is queued, and it will be processed by the other one as soon as it has finished,
+        so that waiting for its turn does not take one of the ``max_concurrent_updates`` slots
+
+        Args:
+            update: update to be processed
+            coroutine: coroutine that processes the update
+        """
+        key = self.get_update_key(update)
+        if key is None:
+            await coroutine
+            return
+
+        if (queue := self.__queues.get(key)) is not None:
+            queue.append(coroutine)
+            return
+        queue = self.__queues[key] = deque([coroutine])
+        try:
+            while queue:  # the updates are processed in the order they arrived in
+                try:
+                    await queue[0]
+                except Exception:  # pylint: disable=broad-exception-caught
+                    logger.exception("Processing an update with key %s", key)
+                queue.popleft()
+        finally:
+            del self.__queues[key]
+            for pending in queue:  # the processing has been cancelled
+                if asyncio.iscoroutine(pending):
+                    pending.close()
+
+    async def initialize(self):
+        """Does nothing"""
+
+    async def shutdown(self):
+        """Does nothing"""
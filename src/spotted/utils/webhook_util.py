@@ -0,0 +1,262 @@
+"""Minimal HTTP server that receives the updates pushed by Telegram to the webhook of the bot"""
+
+import asyncio
+import hmac
+import json
+import logging
+from contextlib import suppress
+from http import HTTPStatus
+from typing import Any
+
+from telegram import Update
+from telegram.ext import Application
+
+from spotted.utils.conversation_util import live_conversations
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PATH = "/health"
+"""Path of the endpoint that reports whether the bot is running"""
+MAX_BODY_SIZE = 1 << 20
+"""Maximum size in bytes of the body of a request"""
+MAX_HEADERS = 100
+"""Maximum number of headers of a request"""
+KEEP_ALIVE_TIMEOUT = 75
+"""Seconds an idle connection is kept open, waiting for the next request"""
+SECRET_TOKEN_HEADER = "x-telegram-bot-api-secret-token"
+
+
+class WebhookServer:
+    """HTTP/1.1 server, built on asyncio streams, that feeds the updates pushed by Telegram to the application.
+    It exposes two endpoints:
+
+    - ``POST /<url_path>``: receives an update, checking the secret token,
+      and puts it in the update queue of the application
+    - ``GET /health``: answers 200 while the application is running, 503 otherwise
+
+    Connections are kept alive, so that Telegram can reuse them for the following updates
+
+    Args:
+        application: application that will process the updates
+        listen: address the server listens on
+        port: port the server listens on. If 0, a free port is chosen
+        url_path: path the updates are posted to
+        secret_token: secret token Telegram sends with each update, which must match for the update to be accepted
+    """
+
+    def __init__(self, application: Application, listen: str, port: int, url_path: str, secret_token: str):
+        if not secret_token:
+            raise ValueError("The webhook server requires a secret token")
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.url_path = "/" + url_path.strip("/")
+        self.secret_token = secret_token
+        self.__server: asyncio.Server | None = None
+        self.__connections: set[asyncio.StreamWriter] = set()
+
+    async def start(self):
+        """Starts listening for the requests. If the port was 0, it is replaced with the one chosen"""
+        self.__server = await asyncio.start_server(self.__handle_connection, self.listen, self.port)
+        self.port = self.__server.sockets[0].getsockname()[1]
+        logger.info("Webhook server listening on %s:%d%s", self.listen, self.port, self.url_path)
+
+    async def stop(self):
+        """Stops listening and closes the open connections"""
+        if self.__server is None:
+            return
+        self.__server.close()
+        for writer in self.__connections:  # idle keep-alive connections would delay the shutdown
+            writer.close()
+        await self.__server.wait_closed()
+        self.__server = None
+
+    async def __handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serves all the requests received on a connection, until the client closes it or it stays idle too long
+
+        Args:
+            reader: stream the requests are read from
+            writer: stream the responses are written to
+        """
+        self.__connections.add(writer)
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), timeout=KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                except ValueError:  # the request line is longer than the limit of the stream
+                    self.__write_response(writer, HTTPStatus.BAD_REQUEST, keep_alive=False)
+                    await writer.drain()
+                    break
+                if not request_line:
+                    break
+                keep_alive = await self.__handle_request(request_line, reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.__connections.discard(writer)
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+    @staticmethod
+    async def __read_headers(reader: asyncio.StreamReader) -> dict[str, str] | None:
+        """Reads the headers of a request, up to the empty line that separates them from the body
+
+        Args:
+            reader: stream the headers are read from
+
+        Returns:
+            value of each header, by lowercase name, or None if there are too many headers or one is too long
+        """
+        headers: dict[str, str] = {}
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:  # the line is longer than the limit of the stream
+                return None
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                return None
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return headers
+
+    async def __handle_request(
+        self, request_line: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> bool:
+        """Reads the headers and the body of a request, then writes the response
+
+        Args:
+            request_line: first line of the request
+            reader: stream the rest of the request is read from
+            writer: stream the response is written to
+
+        Returns:
+            whether the connection can be used for another request
+        """
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3:
+            self.__write_response(writer, HTTPStatus.BAD_REQUEST, keep_alive=False)
+            return False
+        method, target, version = parts
+
+        headers = await self.__read_headers(reader)
+        if headers is None:
+            self.__write_response(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, keep_alive=False)
+            return False
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_BODY_SIZE:
+            self.__write_response(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, keep_alive=False)
+            return False
+        body = await reader.readexactly(length) if length > 0 else b""
+
+        status, payload = await self.__route(method, target.split("?", 1)[0], headers, body)
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        self.__write_response(writer, status, payload, keep_alive=keep_alive)
+        return keep_alive
+
+    async def __route(
+        self, method: str, path: str, headers: dict[str, str], body: bytes
+    ) -> tuple[HTTPStatus, dict[str, Any] | None]:
+        """Dispatches the request to the right endpoint
+
+        Args:
+            method: method of the request
+            path: path of the request, without the query string
+            headers: headers of the request, with lowercase names
+            body: body of the request
+
+        Returns:
+            status and content of the response
+        """
+        if path == HEALTH_PATH:
+            if method != "GET":
+                return HTTPStatus.METHOD_NOT_ALLOWED, None
+            return self.__health()
+        if path == self.url_path:
+            if method != "POST":
+                return HTTPStatus.METHOD_NOT_ALLOWED, None
+            return await self.__receive_update(headers, body)
+        return HTTPStatus.NOT_FOUND, None
+
+    def __health(self) -> tuple[HTTPStatus, dict[str, Any]]:
+        """Reports whether the application is running, how many updates are waiting to be processed
+        and how many conversations are in progress
+
+        Returns:
+            status and content of the response
+        """
+        running = self.application.running
+        payload = {
+            "status": "ok" if running else "unavailable",
+            "pending_updates": self.application.update_queue.qsize(),
+            "live_conversations": live_conversations(self.application),
+        }
+        return (HTTPStatus.OK if running else HTTPStatus.SERVICE_UNAVAILABLE), payload
+
+    async def __receive_update(self, headers: dict[str, str], body: bytes) -> tuple[HTTPStatus, dict[str, Any] | None]:
+        """Puts the update in the queue of the application, which will process it in the background
+
+        Args:
+            headers: headers of the request, with lowercase names
+            body: body of the request, containing the update as json
+
+        Returns:
+            status and content of the response
+        """
+        secret_token = headers.get(SECRET_TOKEN_HEADER, "").encode("latin-1")
+        if not hmac.compare_digest(secret_token, self.secret_token.encode()):
+            logger.warning("Webhook request with an invalid secret token")
+            return HTTPStatus.FORBIDDEN, None
+        try:
+            data = json.loads(body)
+        except ValueError as ex:
+            logger.warning("Invalid json received by the webhook: %s", ex)
+            return HTTPStatus.BAD_REQUEST, None
+        if not isinstance(data, dict):  # e.g. a list or a number, which Update.de_json can't handle
+            logger.warning("The webhook received a json %s instead of an update", type(data).__name__)
+            return HTTPStatus.BAD_REQUEST, None
+        try:
+            update = Update.de_json(data, self.application.bot)
+        except (ValueError, TypeError, KeyError) as ex:
+            logger.warning("Invalid update received by the webhook: %s", ex)
+            return HTTPStatus.BAD_REQUEST, None
+        if update is None:
+            return HTTPStatus.BAD_REQUEST, None
+        await self.application.update_queue.put(update)
+        return HTTPStatus.OK, None
+
+    @staticmethod
+    def __write_response(
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        payload: dict[str, Any] | None = None,
+        keep_alive: bool = True,
+    ):
+        """Writes the response to the stream
+
+        Args:
+            writer: stream the response is written to
+            status: status of the response
+            payload: content of the response, sent as json. If None, the body is empty
+            keep_alive: whether the connection will be used for another request
+        """
+        body = json.dumps(payload).encode() if payload is not None else b""
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        )
+        if payload is not None:
+            head += "Content-Type: application/json\r\n"
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
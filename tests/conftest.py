@@ -5,7 +5,15 @@ import os
 
 import pytest
 
-from spotted.data import Config, DbManager
+from spotted.data import (
+    ChatAdminsCache,
+    ChatCache,
+    Config,
+    DbManager,
+    MigrationManager,
+    PostAuthorStore,
+    UserFlagsCache,
+)
 
 
 @pytest.fixture(scope="class", autouse=True)
@@ -35,7 +43,10 @@ def create_test_db() -> DbManager:
     """
     DbManager.register_adapters_and_converters()
     yield DbManager
-    os.remove(Config.debug_get("db_file"))
+    DbManager.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(Config.debug_get("db_file") + suffix):
+            os.remove(Config.debug_get("db_file") + suffix)
 
 
 @pytest.fixture(scope="function")
@@ -44,5 +55,9 @@ def test_table(create_test_db: DbManager) -> DbManager:
     Resets the state of the database
     """
     create_test_db.query_from_file("config", "db", "post_db_del.sql")
-    create_test_db.query_from_file("config", "db", "post_db_init.sql")
+    MigrationManager.migrate()
+    UserFlagsCache.clear()
+    ChatCache.clear()
+    ChatAdminsCache.clear()
+    PostAuthorStore.clear_cache()
     return create_test_db
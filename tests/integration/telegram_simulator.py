@@ -18,6 +18,7 @@ from telegram import (
 from telegram.ext import Application
 from telegram_api import TelegramApi
 
+from spotted.data import Config, SqlitePersistence
 from spotted.handlers import add_handlers
 
 
@@ -31,8 +32,14 @@ class TelegramSimulator:  # pylint: disable=too-many-public-methods
 
     def __init__(self):
         warnings.filterwarnings("ignore", message=r"Setting custom attributes such as .*")
+        warnings.filterwarnings("ignore", message=r"Ignoring `conversation_timeout` .*")  # no job queue is running
         self.messages: list[Message] = []
-        self.app = Application.builder().token("1234567890:qY9gv7pRJgFj4EVmN3Z1gfJOgQpCbh0vmp5").build()
+        self.app = (
+            Application.builder()
+            .token("1234567890:qY9gv7pRJgFj4EVmN3Z1gfJOgQpCbh0vmp5")
+            .persistence(SqlitePersistence(update_interval=Config.debug_get("persistence_interval")))
+            .build()
+        )
         add_handlers(self.app)
         self.bot = self.app.bot
         self.bot.__class__._post = self.weaved_post().__get__(self.bot, self.bot.__class__)
@@ -1,6 +1,7 @@
 # pylint: disable=unused-argument,redefined-outer-name
 """Tests the bot functionality"""
 
+import asyncio
 import os
 from datetime import datetime, timedelta
 
@@ -8,17 +9,21 @@ import pytest
 import pytest_asyncio
 from telegram import Chat, Message, MessageEntity
 from telegram import User as TGUser
+from telegram.error import NetworkError
 from telegram_simulator import TelegramSimulator
 
 from spotted.data import (
     Config,
     DbManager,
     PendingPost,
+    PendingPostStatus,
     PublishedPost,
     Report,
     User,
     read_md,
 )
+from spotted.utils import EventInfo
+from spotted.utils.broadcast_util import follow_broadcaster
 from spotted.utils.constants import APPROVED_KB, REJECTED_KB
 
 
@@ -510,7 +515,9 @@ class TestBot:
                 telegram.messages[-2].text
                 == "Gli admin erano sicuramente molto impegnati e non sono riusciti a valutare lo spot in tempo"
             )
-            assert telegram.last_message.text == "Sono stati eliminati 1 messaggi rimasti in sospeso"
+            assert telegram.last_message.text.startswith(
+                "Sono stati eliminati 1 messaggi rimasti in sospeso\nTempo impiegato"
+            )
             assert PendingPost.from_user(user.id) is not None  # the recent pending post has not been deleted
             assert PendingPost.from_user(user2.id) is None  # the old pending post has been deleted
 
@@ -563,6 +570,19 @@ class TestBot:
             await telegram.send_command("/spot")
             assert telegram.last_message.text == "Invia il post che vuoi pubblicare"
 
+        async def test_spot_after_restart(self, telegram: TelegramSimulator):
+            """Tests that the spot conversation in progress survives a restart of the bot"""
+            await telegram.send_command("/spot")
+            await telegram.send_message("Test spot")
+            assert telegram.last_message.text == "Sei sicuro di voler pubblicare questo post?"
+            await telegram.app.update_persistence()
+            await telegram.app.persistence.flush()
+
+            restarted = TelegramSimulator()
+            restarted.messages = telegram.messages
+            await restarted.send_callback_query(text="Si")
+            assert restarted.messages[-2].text.startswith("Il tuo post è in fase di valutazione")
+
         async def test_spot_no_cmd(self, telegram: TelegramSimulator):
             """Tests the /spot command.
             Complete with no the spot conversation
@@ -923,6 +943,46 @@ class TestBot:
             else:
                 assert PublishedPost.from_channel(channel.id, c_message.id) is not None
 
+        async def test_concurrent_approve(
+            self, telegram: TelegramSimulator, admin_group: Chat, channel: Chat, pending_post: Message
+        ):
+            """Tests that a post approved by more admins at the same time is published only once"""
+            n_votes = Config.post_get("n_votes")
+            await asyncio.gather(
+                *(
+                    telegram.send_callback_query(
+                        text="🟢 0", message=pending_post, user=TGUser(i + 1, first_name=str(i), is_bot=False)
+                    )
+                    for i in range(n_votes + 2)
+                )
+            )
+
+            published = [message for message in telegram.messages if message.chat_id == channel.id]
+            assert len(published) == 1
+            notifications = [message for message in telegram.messages if message.text.startswith("Il tuo ultimo post")]
+            assert len(notifications) == 1
+            assert PendingPost.from_group(g_message_id=pending_post.message_id, admin_group_id=admin_group.id) is None
+
+        async def test_approve_failure(
+            self, telegram: TelegramSimulator, admin_group: Chat, channel: Chat, pending_post: Message, mocker
+        ):
+            """Tests that a post whose publication fails goes back to pending, so it can be approved again"""
+            n_votes = Config.post_get("n_votes")
+            mocker.patch.object(EventInfo, "send_post_to_channel", side_effect=NetworkError("Network down"))
+            for i in range(n_votes):
+                await telegram.send_callback_query(
+                    text="🟢 0", message=pending_post, user=TGUser(i + 1, first_name=str(i), is_bot=False)
+                )
+            stored_post = PendingPost.from_group(g_message_id=pending_post.message_id, admin_group_id=admin_group.id)
+            assert stored_post.status == PendingPostStatus.PENDING
+
+            mocker.stopall()
+            await telegram.send_callback_query(
+                text="🟢 0", message=pending_post, user=TGUser(n_votes + 1, first_name="last", is_bot=False)
+            )
+            assert any(message.chat_id == channel.id for message in telegram.messages)
+            assert PendingPost.from_group(g_message_id=pending_post.message_id, admin_group_id=admin_group.id) is None
+
     class TestRejectSpot:
         """Tests the complete publishing spot pipeline"""
 
@@ -994,9 +1054,7 @@ class TestBot:
 
             assert autoreply_found is True
 
-            await telegram.send_callback_query(
-                text=autoreply_key, data=f"autoreply,{autoreply_key}", message=telegram.last_message
-            )
+            await telegram.send_callback_query(text=autoreply_key, message=telegram.last_message)
 
             if Config.settings_get("post", "reject_after_autoreply"):
                 assert telegram.messages[-2].text == autoreply_message
@@ -1118,6 +1176,7 @@ class TestBot:
                 reply_to_message=message_thread_id,
                 message_thread_id=message_thread_id,
             )
+            await follow_broadcaster.join()  # the notifications are sent in the background
             assert telegram.last_message.text == "Test follow"
             assert telegram.last_message.from_user.is_bot is True
             assert telegram.last_message.chat_id == user.id
@@ -1140,5 +1199,6 @@ class TestBot:
                 reply_to_message=message_thread_id,
                 message_thread_id=message_thread_id,
             )
+            await follow_broadcaster.join()
             assert telegram.last_message.from_user.is_bot is False
             assert telegram.last_message.chat_id == channel_group.id  # The last message is stil the post
@@ -0,0 +1,307 @@
+# pylint: disable=redefined-outer-name
+"""Tests the rate limiting and the background delivery of the messages"""
+
+import asyncio
+import time
+from collections.abc import AsyncGenerator
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+import pytest_asyncio
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+from spotted.data import Config
+from spotted.utils.broadcast_util import Broadcaster
+from spotted.utils.rate_limit_util import OutboundRateLimiter, Priority, TokenBucket
+
+
+@pytest.fixture(scope="function")
+def broadcaster() -> Broadcaster:
+    """Return a broadcaster with a small concurrency"""
+    Config.override_settings({"debug": {"notification_concurrency": 4}})
+    return Broadcaster("test_broadcaster", max_retries=2)
+
+
+@pytest.mark.asyncio
+class TestTokenBucket:
+    """Tests the TokenBucket class"""
+
+    async def test_burst_and_refill(self):
+        """Tests that the bucket allows a burst up to its capacity, then waits for the refill"""
+        bucket = TokenBucket(rate=50, capacity=2)
+        assert bucket.try_acquire()
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+
+        start = time.monotonic()
+        await bucket.acquire()
+        assert time.monotonic() - start >= 0.015
+
+    async def test_rate(self):
+        """Tests that the tokens are consumed at most at the configured rate"""
+        bucket = TokenBucket(rate=100, capacity=1)
+        start = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(11)))
+        assert time.monotonic() - start >= 0.09
+
+    async def test_priority(self):
+        """Tests that the waiters with a lower priority value are served first"""
+        bucket = TokenBucket(rate=100, capacity=1)
+        assert bucket.try_acquire()
+        order: list[int] = []
+
+        async def acquire(priority: int):
+            await bucket.acquire(priority)
+            order.append(priority)
+
+        await asyncio.gather(acquire(3), acquire(2), acquire(0), acquire(1))
+        assert order == [0, 1, 2, 3]
+
+    async def test_cancelled_waiter(self):
+        """Tests that a cancelled waiter does not block the others"""
+        bucket = TokenBucket(rate=100, capacity=1)
+        assert bucket.try_acquire()
+        first = asyncio.create_task(bucket.acquire(0))
+        second = asyncio.create_task(bucket.acquire(1))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.wait_for(second, timeout=1)
+        assert second.done() and not second.cancelled()
+
+    async def test_idle(self, monkeypatch: pytest.MonkeyPatch):
+        """Tests that the bucket is idle once it has not been used for the time it takes to refill it"""
+        now = 1000.0
+        monkeypatch.setattr("spotted.utils.rate_limit_util.time.monotonic", lambda: now)
+        bucket = TokenBucket(rate=1, capacity=3)
+        assert bucket.try_acquire()
+        now += 2
+        assert not bucket.is_idle
+        now += 1
+        assert bucket.is_idle
+
+    async def test_invalid_rate(self):
+        """Tests that the rate must be positive"""
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0)
+
+
+@pytest.mark.asyncio
+class TestBroadcaster:
+    """Tests the Broadcaster class"""
+
+    async def test_broadcast_returns_immediately(self, broadcaster: Broadcaster):
+        """Tests that the messages are delivered in the background"""
+        event = asyncio.Event()
+
+        async def send():
+            await event.wait()
+
+        batch = broadcaster.broadcast(((chat_id, send) for chat_id in range(10)), label="test")
+        assert batch.metrics.submitted == 10
+        assert batch.metrics.sent == 0
+
+        event.set()
+        await broadcaster.join()
+        assert batch.metrics.sent == 10
+        assert batch.metrics.pending == 0
+        assert broadcaster.pending == 0
+
+    async def test_bounded_concurrency(self, broadcaster: Broadcaster):
+        """Tests that no more than notification_concurrency messages are sent at the same time"""
+        running = 0
+        max_running = 0
+
+        async def send():
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        broadcaster.broadcast(((chat_id, send) for chat_id in range(20)), label="test")
+        await broadcaster.join()
+        assert max_running == 4
+        assert broadcaster.metrics.sent == 20
+
+    async def test_retry_after(self, broadcaster: Broadcaster):
+        """Tests that a RetryAfter is not retried again, since the rate limiter has already retried it"""
+        send = AsyncMock(side_effect=[RetryAfter(0), None])
+
+        batch = broadcaster.broadcast([(1, send)], label="test")
+        await broadcaster.join()
+        assert send.await_count == 1
+        assert (batch.metrics.failed, batch.metrics.retried, batch.metrics.rate_limited) == (1, 0, 1)
+
+    async def test_failures(self, broadcaster: Broadcaster, monkeypatch: pytest.MonkeyPatch):
+        """Tests that only the requests that did not reach Telegram are retried, up to max_retries"""
+        monkeypatch.setattr("spotted.utils.broadcast_util.asyncio.sleep", AsyncMock())
+        blocked = AsyncMock(side_effect=Forbidden("blocked"))
+        deleted = AsyncMock(side_effect=BadRequest("message to reply not found"))
+        timed_out = AsyncMock(side_effect=TimedOut())
+        broken = AsyncMock(side_effect=TypeError("unexpected argument"))
+        unsent_error = NetworkError("httpx.ConnectError: connection refused")
+        unsent_error.__cause__ = httpx.ConnectError("connection refused")
+        unsent = AsyncMock(side_effect=[unsent_error, None])
+        unreachable = AsyncMock(side_effect=unsent_error)
+
+        deliveries = [(1, blocked), (2, deleted), (3, timed_out), (4, broken), (5, unsent), (6, unreachable)]
+        batch = broadcaster.broadcast(deliveries, label="test")
+        await broadcaster.join()
+        assert blocked.await_count == 1
+        assert deleted.await_count == 1
+        assert timed_out.await_count == 1  # the message may have been sent anyway
+        assert broken.await_count == 1
+        assert unsent.await_count == 2
+        assert unreachable.await_count == 3
+        assert (batch.metrics.sent, batch.metrics.failed, batch.metrics.retried) == (1, 5, 3)
+
+    async def test_close(self, broadcaster: Broadcaster):
+        """Tests that closing the broadcaster discards the messages not sent yet"""
+        event = asyncio.Event()
+
+        async def send():
+            await event.wait()
+
+        broadcaster.broadcast(((chat_id, send) for chat_id in range(10)), label="test")
+        await asyncio.sleep(0)
+        await broadcaster.close()
+        assert broadcaster.pending == 0
+        assert broadcaster.metrics.sent == 0
+
+
+@pytest_asyncio.fixture(scope="function")
+async def rate_limiter() -> AsyncGenerator[OutboundRateLimiter, None]:
+    """Return an initialized rate limiter"""
+    Config.override_settings(
+        {
+            "debug": {
+                "rate_limit_global": 1000,
+                "rate_limit_chat": 20,
+                "rate_limit_chat_burst": 1,
+                "rate_limit_group": 60,
+                "rate_limit_max_retries": 2,
+            }
+        }
+    )
+    limiter = OutboundRateLimiter()
+    await limiter.initialize()
+    yield limiter
+    await limiter.shutdown()
+
+
+@pytest.mark.asyncio
+class TestOutboundRateLimiter:
+    """Tests the OutboundRateLimiter class"""
+
+    async def process(
+        self,
+        limiter: OutboundRateLimiter,
+        callback: AsyncMock,
+        data: dict,
+        rate_limit_args=None,
+        endpoint: str = "sendMessage",
+    ):
+        """Sends a request through the rate limiter"""
+        return await limiter.process_request(
+            callback=callback,
+            args=(endpoint, data),
+            kwargs={},
+            endpoint=endpoint,
+            data=data,
+            rate_limit_args=rate_limit_args,
+        )
+
+    async def test_get_priority(self):
+        """Tests the priority assigned to the requests"""
+        admin_group_id = Config.post_get("admin_group_id")
+        assert OutboundRateLimiter.get_priority({"chat_id": admin_group_id}, None) == Priority.ADMIN
+        assert OutboundRateLimiter.get_priority({"chat_id": 1}, None) == Priority.USER
+        assert OutboundRateLimiter.get_priority({}, None) == Priority.USER
+        assert OutboundRateLimiter.get_priority({"chat_id": 1}, {"priority": Priority.BULK}) == Priority.BULK
+
+    async def test_process_request(self, rate_limiter: OutboundRateLimiter):
+        """Tests that the request is sent and its result returned"""
+        callback = AsyncMock(return_value={"ok": True})
+        assert await self.process(rate_limiter, callback, {"chat_id": 1}) == {"ok": True}
+        callback.assert_awaited_once_with("sendMessage", {"chat_id": 1})
+
+    async def test_chat_rate_limit(self, rate_limiter: OutboundRateLimiter):
+        """Tests that the requests to the same private chat are spaced, while different chats are not"""
+        callback = AsyncMock()
+        start = time.monotonic()
+        await asyncio.gather(*(self.process(rate_limiter, callback, {"chat_id": chat_id}) for chat_id in range(1, 6)))
+        assert time.monotonic() - start < 0.05
+
+        start = time.monotonic()
+        await asyncio.gather(*(self.process(rate_limiter, callback, {"chat_id": 1}) for _ in range(3)))
+        assert time.monotonic() - start >= 0.09
+
+    async def test_group_burst(self, rate_limiter: OutboundRateLimiter):
+        """Tests that groups allow a burst of requests"""
+        callback = AsyncMock()
+        start = time.monotonic()
+        await asyncio.gather(*(self.process(rate_limiter, callback, {"chat_id": -100}) for _ in range(10)))
+        assert time.monotonic() - start < 0.05
+        assert callback.await_count == 10
+
+    async def test_chat_burst(self, rate_limiter: OutboundRateLimiter):
+        """Tests that a private chat allows a short burst of messages"""
+        Config.override_settings({"debug": {"rate_limit_chat_burst": 3}})
+        callback = AsyncMock()
+        start = time.monotonic()
+        await asyncio.gather(*(self.process(rate_limiter, callback, {"chat_id": 1}) for _ in range(3)))
+        assert time.monotonic() - start < 0.05
+        Config.override_settings({"debug": {"rate_limit_chat_burst": 1}})
+
+    async def test_group_edits(self, rate_limiter: OutboundRateLimiter):
+        """Tests that only sending messages is limited in a group, while edits, deletions and bans are not"""
+        Config.override_settings({"debug": {"rate_limit_group": 1}})
+        callback = AsyncMock()
+        await self.process(rate_limiter, callback, {"chat_id": -100})
+        start = time.monotonic()
+        for endpoint in ("editMessageReplyMarkup", "deleteMessage", "banChatMember") * 5:
+            await self.process(rate_limiter, callback, {"chat_id": -100}, endpoint=endpoint)
+        assert time.monotonic() - start < 0.05
+        assert callback.await_count == 16
+        Config.override_settings({"debug": {"rate_limit_group": 60}})
+
+    async def test_chat_key(self):
+        """Tests that the same chat uses the same bucket, however it is referred to"""
+        assert OutboundRateLimiter.get_chat_key(Config.post_get("channel_tag")) == Config.post_get("channel_id")
+        assert OutboundRateLimiter.get_chat_key("-100") == -100
+        assert OutboundRateLimiter.get_chat_key(5) == 5
+        assert OutboundRateLimiter.get_chat_key("@Some_Group") == "@some_group"
+
+    async def test_chat_buckets_eviction(self, rate_limiter: OutboundRateLimiter, monkeypatch: pytest.MonkeyPatch):
+        """Tests that the number of buckets of the chats never exceeds the limit,
+        dropping the idle ones before the ones still in use
+        """
+        monkeypatch.setattr(rate_limiter, "MAX_CHAT_BUCKETS", 4)
+        callback = AsyncMock()
+        for chat_id in range(1, 11):
+            await self.process(rate_limiter, callback, {"chat_id": chat_id})
+            assert rate_limiter.chat_buckets <= 4
+
+        now = time.monotonic() + 1  # the buckets of the private chats refill in 1 / 20 seconds
+        monkeypatch.setattr("spotted.utils.rate_limit_util.time.monotonic", lambda: now)
+        await self.process(rate_limiter, callback, {"chat_id": -100})
+        assert rate_limiter.chat_buckets == 1  # all the others were idle
+
+        await asyncio.gather(*(self.process(rate_limiter, callback, {"chat_id": chat_id}) for chat_id in range(1, 11)))
+        assert rate_limiter.chat_buckets == 4
+        assert callback.await_count == 21
+
+    async def test_retry_after(self, rate_limiter: OutboundRateLimiter):
+        """Tests that the request is retried when Telegram asks to"""
+        callback = AsyncMock(side_effect=[RetryAfter(0), {"ok": True}])
+        assert await self.process(rate_limiter, callback, {"chat_id": 1}) == {"ok": True}
+        assert callback.await_count == 2
+        assert rate_limiter.retried == 1
+
+    async def test_retry_after_max_retries(self, rate_limiter: OutboundRateLimiter):
+        """Tests that the error is raised after max_retries attempts"""
+        callback = AsyncMock(side_effect=RetryAfter(0))
+        with pytest.raises(RetryAfter):
+            await self.process(rate_limiter, callback, {"chat_id": 1})
+        assert callback.await_count == 3
@@ -0,0 +1,81 @@
+# pylint: disable=unused-argument,redefined-outer-name
+"""Tests the clean_pending_job job handler"""
+
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock
+
+import pytest
+from telegram.error import BadRequest, Forbidden, NetworkError, TimedOut
+from telegram.ext import CallbackContext
+
+from spotted.data import Config, DbManager, PendingPost
+from spotted.handlers.job_handlers import clean_pending_job
+
+
+def create_pending_posts(n_posts: int):
+    """Saves n_posts expired pending posts in the admin group"""
+    for i in range(1, n_posts + 1):
+        PendingPost(
+            user_id=i,
+            u_message_id=i,
+            g_message_id=i,
+            admin_group_id=Config.post_get("admin_group_id"),
+            date=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        ).save_post()
+
+
+@pytest.mark.asyncio
+class TestCleanPendingJob:
+    """Tests the clean_pending_job job handler"""
+
+    async def test_bounded_concurrency(self, test_table, context_with_bot: CallbackContext, mock_bot: AsyncMock):
+        """Tests that the expired posts are removed from the database at once,
+        and no more than notification_concurrency messages are deleted at the same time
+        """
+        Config.override_settings({"debug": {"notification_concurrency": 3}})
+        create_pending_posts(10)
+        running = 0
+        max_running = 0
+
+        async def delete_message(**kwargs):
+            nonlocal running, max_running
+            assert PendingPost.get_all(admin_group_id=Config.post_get("admin_group_id")) == []
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        mock_bot.delete_message = AsyncMock(side_effect=delete_message)
+        await clean_pending_job(context_with_bot)
+        Config.override_settings({"debug": {"notification_concurrency": 8}})
+
+        assert max_running == 3
+        assert mock_bot.send_message.await_count == 11
+        text = mock_bot.send_message.await_args.kwargs["text"]
+        assert text.startswith("Sono stati eliminati 10 messaggi rimasti in sospeso\nTempo impiegato: ")
+
+    async def test_failures(self, test_table, context_with_bot: CallbackContext, mock_bot: AsyncMock):
+        """Tests that the messages that could not be deleted and the users not notified are counted"""
+        create_pending_posts(3)
+        mock_bot.delete_message = AsyncMock(side_effect=[None, None, BadRequest("Message to delete not found")])
+        mock_bot.send_message = AsyncMock(side_effect=[None, Forbidden("bot was blocked by the user"), None])
+
+        await clean_pending_job(context_with_bot)
+        text = mock_bot.send_message.await_args.kwargs["text"]
+        assert text.startswith(
+            "Sono stati eliminati 2 messaggi rimasti in sospeso\n1 messaggi non eliminati, 1 utenti non notificati\n"
+        )
+        assert DbManager.count_from(table_name="pending_post") == 0
+
+    async def test_network_errors(self, test_table, context_with_bot: CallbackContext, mock_bot: AsyncMock):
+        """Tests that any error of Telegram is counted as a failure, and the summary is always sent"""
+        create_pending_posts(4)
+        mock_bot.delete_message = AsyncMock(side_effect=[None, TimedOut(), NetworkError("Network down"), None])
+        mock_bot.send_message = AsyncMock(side_effect=[NetworkError("Connection reset"), None, None])
+
+        await clean_pending_job(context_with_bot)
+        text = mock_bot.send_message.await_args.kwargs["text"]
+        assert text.startswith(
+            "Sono stati eliminati 2 messaggi rimasti in sospeso\n2 messaggi non eliminati, 1 utenti non notificati\n"
+        )
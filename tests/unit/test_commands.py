@@ -5,12 +5,28 @@ from datetime import datetime
 from unittest.mock import AsyncMock
 
 import pytest
-from telegram import Chat, Message, Update, User
+from telegram import (
+    Chat,
+    ChatMemberAdministrator,
+    ChatMemberMember,
+    ChatMemberUpdated,
+    Message,
+    Update,
+    User,
+)
 from telegram.constants import ParseMode
 from telegram.ext import Application, CallbackContext
 
-from spotted.data import Config, read_md
-from spotted.handlers import help_cmd, rules_cmd, settings_cmd, start_cmd
+from spotted.data import ChatAdminsCache, Config, read_md
+from spotted.handlers import (
+    admins_changed_chat_member,
+    help_cmd,
+    mute_cmd,
+    rules_cmd,
+    settings_cmd,
+    start_cmd,
+    warn_cmd,
+)
 from spotted.utils import get_settings_kb
 
 
@@ -107,3 +123,68 @@ class TestCommands:
                 parse_mode=ParseMode.MARKDOWN_V2,
                 reply_markup=get_settings_kb(),
             )
+
+    @pytest.mark.asyncio
+    class TestAdminCommands:
+        """Tests the checks on the administrators of the community group"""
+
+        @pytest.fixture(autouse=True)
+        def admins(self, context: CallbackContext):
+            """Makes the user 1 the only administrator of the community group"""
+            ChatAdminsCache.clear()
+            admin = User(id=1, first_name="admin", is_bot=False)
+            context.bot.get_chat_administrators = AsyncMock(
+                return_value=(ChatMemberAdministrator(admin, *[False] * 12),)
+            )
+
+        @staticmethod
+        def get_update(context: CallbackContext, user_id: int) -> Update:
+            """Returns a command sent by the user in the community group"""
+            chat = Chat(id=Config.post_get("community_group_id"), type=Chat.SUPERGROUP)
+            user = User(id=user_id, first_name="user", is_bot=False)
+            message = Message(message_id=0, from_user=user, chat=chat, date=datetime.now())
+            message.set_bot(context.bot)
+            return Update(update_id=0, message=message)
+
+        @staticmethod
+        def get_member_update(user_id: int, promoted: bool) -> Update:
+            """Returns the update sent when the user is promoted or demoted in the community group"""
+            chat = Chat(id=Config.post_get("community_group_id"), type=Chat.SUPERGROUP)
+            user = User(id=user_id, first_name="user", is_bot=False)
+            admin = ChatMemberAdministrator(user, *[False] * 12)
+            member = ChatMemberMember(user)
+            return Update(
+                update_id=0,
+                chat_member=ChatMemberUpdated(
+                    chat=chat,
+                    from_user=user,
+                    date=datetime.now(),
+                    old_chat_member=member if promoted else admin,
+                    new_chat_member=admin if promoted else member,
+                ),
+            )
+
+        async def test_admins_cached(self, context: CallbackContext):
+            """Tests that the administrators are retrieved only once for consecutive commands"""
+            context.args = []
+            await warn_cmd(self.get_update(context, user_id=2), context)
+            context.bot.send_message.assert_called_once_with(chat_id=2, text="Non sei admin")
+            await mute_cmd(self.get_update(context, user_id=2), context)
+            context.bot.send_message.assert_called_with(chat_id=2, text="Non sei un admin")
+            assert context.bot.get_chat_administrators.await_count == 1
+
+        async def test_promotion_invalidates_cache(self, context: CallbackContext):
+            """Tests that the administrators are retrieved again after a promotion or a demotion"""
+            community_group_id = Config.post_get("community_group_id")
+            assert await ChatAdminsCache.is_admin(context.bot, community_group_id, 1)
+            assert await ChatAdminsCache.is_admin(context.bot, community_group_id, 1)
+            assert context.bot.get_chat_administrators.await_count == 1
+
+            await admins_changed_chat_member(self.get_member_update(user_id=2, promoted=True), context)
+            assert not await ChatAdminsCache.is_admin(context.bot, community_group_id, 2)
+            assert context.bot.get_chat_administrators.await_count == 2
+
+            await admins_changed_chat_member(self.get_member_update(user_id=2, promoted=False), context)
+            assert context.bot.get_chat_administrators.await_count == 2  # the update is cached until it is needed
+            assert not await ChatAdminsCache.is_admin(context.bot, community_group_id, 2)
+            assert context.bot.get_chat_administrators.await_count == 3
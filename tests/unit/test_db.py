@@ -1,10 +1,33 @@
 # pylint: disable=unused-argument,redefined-outer-name
 """Test all the modules related to data management"""
 
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable
+from unittest.mock import AsyncMock
+
 import pytest
 import yaml
 
-from spotted.data import DbManager
+from spotted.data import (
+    ChatCache,
+    Config,
+    DbManager,
+    PendingPost,
+    PendingPostStatus,
+    PostAuthorStore,
+    SqlitePersistence,
+    User,
+    UserFlagsCache,
+    UserStatus,
+)
+from spotted.data.db_manager import ConnectionPool
 
 TABLE_NAME = "test_table"
 
@@ -68,6 +91,14 @@ class TestDB:
         query_result = DbManager.select_from(table_name=TABLE_NAME, select="id")
         assert query_result == db_results["select_from3"]
 
+    def test_iter_select_from(self, db_results):
+        """Tests the iter_select_from function of the database"""
+        query_result = DbManager.iter_select_from(
+            table_name=TABLE_NAME, where="id = %s or id = %s", where_args=(2, 3), batch_size=1
+        )
+        assert list(query_result) == db_results["select_from1"]
+        assert list(DbManager.iter_select_from(table_name="missing_table")) == []
+
     def test_count_from(self, db_results):
         """Tests the count_from function of the database"""
 
@@ -133,3 +164,727 @@ class TestDB:
         assert count == 0
 
         DbManager.query_from_string("DROP TABLE temp;")
+
+
+class TestConnectionPool:
+    """Test the ConnectionPool used by the DbManager"""
+
+    def test_reuse_connections(self, db_results):
+        """Tests that the same connections are reused between queries"""
+        pool = DbManager.get_pool()
+
+        with pool.writer() as first_writer:
+            pass
+        with pool.writer() as second_writer:
+            pass
+        assert first_writer is second_writer
+
+        with pool.reader() as first_reader:
+            pass
+        with pool.reader() as second_reader:
+            pass
+        assert first_reader is second_reader
+        assert DbManager.get_pool() is pool
+
+    def test_max_readers(self, db_results):
+        """Tests that concurrent readers get different connections, up to the maximum"""
+        pool = ConnectionPool(Config.debug_get("db_file"), max_readers=2)
+
+        with pool.reader() as first_reader, pool.reader() as second_reader:
+            assert first_reader is not second_reader
+
+        pool.close()
+        assert pool.closed
+
+    def test_writer_rollback_on_error(self, db_results):
+        """Tests that the writer connection is rolled back and still usable after an error"""
+        pool = DbManager.get_pool()
+
+        with pytest.raises(ValueError):
+            with pool.writer() as conn:
+                conn.execute("INSERT INTO test_table (id, name, surname) VALUES (100, 'rollback', 'rb')")
+                raise ValueError("test error")
+
+        assert DbManager.count_from(table_name=TABLE_NAME, where="id = %s", where_args=(100,)) == 0
+        DbManager.insert_into(table_name=TABLE_NAME, values=(100, "rollback", "rb"))
+        assert DbManager.count_from(table_name=TABLE_NAME, where="id = %s", where_args=(100,)) == 1
+        DbManager.delete_from(table_name=TABLE_NAME, where="id = %s", where_args=(100,))
+
+    def test_close(self, db_results):
+        """Tests that closing the DbManager creates a new pool on the next query"""
+        pool = DbManager.get_pool()
+
+        DbManager.close()
+
+        assert pool.closed
+        with pytest.raises(sqlite3.ProgrammingError):
+            with pool.reader():
+                pass
+        assert DbManager.count_from(table_name=TABLE_NAME) == 5
+        assert DbManager.get_pool() is not pool
+
+
+@pytest.mark.asyncio
+class TestAsyncDB:
+    """Test the awaitable methods of the DBManager class"""
+
+    async def test_run_async(self, db_results):
+        """Tests that the queries are executed on the database executor, outside the event loop thread"""
+        thread_name = await DbManager.run_async(lambda: threading.current_thread().name)
+
+        assert thread_name.startswith("spotted_db")
+        assert thread_name != threading.current_thread().name
+
+    async def test_aselect_from(self, db_results):
+        """Tests the aselect_from function of the database"""
+        query_result = await DbManager.aselect_from(
+            table_name=TABLE_NAME, where="id = %s or id = %s", where_args=(2, 3)
+        )
+        assert query_result == db_results["select_from1"]
+
+    async def test_acount_from(self, db_results):
+        """Tests the acount_from function of the database"""
+        query_result = await DbManager.acount_from(table_name=TABLE_NAME, where="id = %s or id = %s", where_args=(2, 3))
+        assert query_result == db_results["count_from1"]
+
+    async def test_ainsert_update_delete(self, db_results):
+        """Tests the ainsert_into, aupdate_from and adelete_from functions of the database"""
+        await DbManager.ainsert_into(table_name=TABLE_NAME, values=(20, "test_async", "none"))
+        await DbManager.aupdate_from(table_name=TABLE_NAME, set_clause="surname = %s", where="id = %s", args=("a", 20))
+        assert DbManager.select_from(table_name=TABLE_NAME, select="surname", where="id = 20") == [["a"]]
+
+        await DbManager.adelete_from(table_name=TABLE_NAME, where="id = %s", where_args=(20,))
+        assert await DbManager.acount_from(table_name=TABLE_NAME, where="id = 20") == 0
+
+    async def test_aquery_from_string(self, db_results):
+        """Tests the aquery_from_string function of the database"""
+        await DbManager.aquery_from_string(
+            "DROP TABLE IF EXISTS temp;", "CREATE TABLE temp(id int NOT NULL, PRIMARY KEY (id));"
+        )
+        assert await DbManager.acount_from(table_name="temp") == 0
+        await DbManager.aquery_from_string("DROP TABLE temp;")
+
+
+class TestPragmas:
+    """Test the PRAGMA profile applied to the database connections"""
+
+    def test_default_pragmas(self, db_results):
+        """Tests that the default high-throughput profile is active on the pooled connections"""
+        pragmas = DbManager.get_pragmas()
+
+        assert pragmas["journal_mode"] == "wal"
+        assert pragmas["synchronous"] == 1  # normal
+        assert pragmas["temp_store"] == 2  # memory
+        assert pragmas["busy_timeout"] == Config.debug_get("sqlite_pragmas")["busy_timeout"]
+
+    def test_invalid_pragmas_ignored(self, db_results):
+        """Tests that pragmas with invalid names or values are not executed"""
+        conn = sqlite3.connect(":memory:")
+        ConnectionPool.apply_pragmas(conn, {"cache_size; DROP TABLE x": 1, "cache_size": "1; DROP", "user_version": 7})
+
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 7
+        conn.close()
+
+    def test_log_pragmas(self, db_results, caplog: pytest.LogCaptureFixture):
+        """Tests that the active pragmas are logged, with a warning for the ones that could not be applied"""
+        Config.override_settings({"debug": {"sqlite_pragmas": {"journal_mode": "invalid_mode"}}})
+        try:
+            with caplog.at_level(logging.INFO):
+                DbManager.log_pragmas()
+        finally:
+            Config.override_settings({"debug": {"sqlite_pragmas": {"journal_mode": "wal"}}})
+
+        assert "Database pragmas" in caplog.text
+        assert "'journal_mode' is 'wal' instead of 'invalid_mode'" in caplog.text
+
+    def test_backup(self, db_results, tmp_path):
+        """Tests that the backup contains the data still in the write-ahead log, in a single file"""
+        path = str(tmp_path / "backup.sqlite3")
+        DbManager.insert_into(table_name=TABLE_NAME, columns=("id",), values=(100,))
+        DbManager.backup(path)
+
+        assert not os.path.exists(path + "-wal")
+        with closing(sqlite3.connect(path)) as conn:
+            assert conn.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}").fetchone()[0] == DbManager.count_from(TABLE_NAME)
+
+
+class TestPendingPost:
+    """Test the queries of the PendingPost class"""
+
+    @staticmethod
+    def create_posts(n_posts: int, admin_group_id: int = -1) -> list[PendingPost]:
+        """Saves n_posts pending posts in the admin group, in reverse order of g_message_id"""
+        return [
+            PendingPost(
+                user_id=i,
+                u_message_id=i,
+                g_message_id=i,
+                admin_group_id=admin_group_id,
+                date=datetime(2024, 1, i, tzinfo=timezone.utc),
+                credit_username="credit" if i % 2 else None,
+            ).save_post()
+            for i in range(n_posts, 0, -1)
+        ]
+
+    def test_get_all(self, test_table: DbManager):
+        """Tests that get_all returns all the pending posts in the admin group, ordered by g_message_id"""
+        posts = self.create_posts(5)
+        self.create_posts(2, admin_group_id=-2)
+
+        assert PendingPost.get_all(admin_group_id=-1) == sorted(posts, key=lambda post: post.g_message_id)
+        assert PendingPost.get_all(admin_group_id=-3) == []
+
+    def test_get_all_before(self, test_table: DbManager):
+        """Tests that get_all only returns the pending posts sent before the timestamp"""
+        self.create_posts(5)
+
+        pending_posts = PendingPost.get_all(admin_group_id=-1, before=datetime(2024, 1, 3, tzinfo=timezone.utc))
+        assert [post.g_message_id for post in pending_posts] == [1, 2]
+
+    def test_iter_all(self, test_table: DbManager):
+        """Tests that iter_all lazily yields the same pending posts returned by get_all"""
+        self.create_posts(5)
+
+        iterator = PendingPost.iter_all(admin_group_id=-1, batch_size=2)
+        assert next(iterator).g_message_id == 1
+        assert [post.g_message_id for post in iterator] == [2, 3, 4, 5]
+        assert list(PendingPost.iter_all(admin_group_id=-1)) == PendingPost.get_all(admin_group_id=-1)
+        before = datetime(2024, 1, 3, tzinfo=timezone.utc)
+        assert list(PendingPost.iter_all(admin_group_id=-1, before=before)) == PendingPost.get_all(
+            admin_group_id=-1, before=before
+        )
+
+    def test_pop_all(self, test_table: DbManager):
+        """Tests that pop_all removes the expired pending posts and their votes, returning them"""
+        posts = self.create_posts(5)
+        self.create_posts(2, admin_group_id=-2)
+        for post in posts:
+            post.set_admin_vote(admin_id=1, approval=True)
+
+        popped = PendingPost.pop_all(admin_group_id=-1, before=datetime(2024, 1, 3, tzinfo=timezone.utc))
+        assert [post.g_message_id for post in popped] == [1, 2]
+        assert popped[0].date == datetime(2024, 1, 1, tzinfo=timezone.utc)
+        assert [post.g_message_id for post in PendingPost.get_all(admin_group_id=-1)] == [3, 4, 5]
+        assert DbManager.count_from(table_name="admin_votes") == 3
+        assert len(PendingPost.get_all(admin_group_id=-2)) == 2
+
+    def test_get_remaining(self, test_table: DbManager):
+        """Tests that get_remaining counts the pending posts and finds the oldest one, excluding the given post"""
+        assert PendingPost.get_remaining(admin_group_id=-1) == (0, None)
+        self.create_posts(5)
+        self.create_posts(2, admin_group_id=-2)
+
+        assert PendingPost.get_remaining(admin_group_id=-1) == (5, 1)
+        assert PendingPost.get_remaining(admin_group_id=-1, exclude_g_message_id=1) == (4, 2)
+        assert PendingPost.get_remaining(admin_group_id=-1, exclude_g_message_id=3) == (4, 1)
+        assert PendingPost.get_remaining(admin_group_id=-2, exclude_g_message_id=1) == (1, 2)
+        assert PendingPost.get_remaining(admin_group_id=-2, exclude_g_message_id=2) == (1, 1)
+
+    def test_set_admin_vote(self, test_table: DbManager):
+        """Tests that set_admin_vote keeps the vote counters of the pending post up to date"""
+        pending_post = self.create_posts(1)[0]
+
+        assert pending_post.set_admin_vote(admin_id=1, approval=True) == 1
+        assert pending_post.set_admin_vote(admin_id=2, approval=True) == 2
+        assert pending_post.set_admin_vote(admin_id=3, approval=False) == 1
+        assert pending_post.set_admin_vote(admin_id=3, approval=False) == -1  # the vote did not change
+        assert (pending_post.approve_count, pending_post.reject_count) == (2, 1)
+
+        assert pending_post.set_admin_vote(admin_id=1, approval=False) == 2  # the vote changed
+        assert (pending_post.approve_count, pending_post.reject_count) == (1, 2)
+        assert pending_post.get_votes(vote=True) == 1
+        assert pending_post.get_votes(vote=False) == 2
+
+        stored_post = PendingPost.from_group(g_message_id=1, admin_group_id=-1)
+        assert stored_post is not None
+        assert (stored_post.approve_count, stored_post.reject_count) == (1, 2)
+
+        DbManager.delete_from(table_name="admin_votes", where="admin_id = %s", where_args=(2,))
+        assert pending_post.get_votes(vote=True) == 0
+
+    def test_set_admin_vote_deleted_post(self, test_table: DbManager):
+        """Tests that voting on a post that is no longer pending does not report a change"""
+        pending_post = self.create_posts(1)[0]
+        pending_post.delete_post()
+
+        assert pending_post.set_admin_vote(admin_id=1, approval=True) == -1
+        assert pending_post.get_votes(vote=True) == 0
+
+    @pytest.mark.asyncio
+    async def test_claim_decision(self, test_table: DbManager):
+        """Tests that only one of the concurrent claims on the decision of a post succeeds,
+        and that the votes cast after the decision are ignored
+        """
+        pending_post = self.create_posts(1)[0]
+        pending_post.set_admin_vote(admin_id=1, approval=True)
+        copies = [PendingPost.from_group(g_message_id=1, admin_group_id=-1) for _ in range(4)]
+
+        claims = await asyncio.gather(
+            *(
+                post.aclaim_decision(PendingPostStatus.APPROVED if i % 2 else PendingPostStatus.REJECTED)
+                for i, post in enumerate(copies)
+            )
+        )
+        assert claims.count(True) == 1
+        winner = copies[claims.index(True)]
+        stored_post = PendingPost.from_group(g_message_id=1, admin_group_id=-1)
+        assert stored_post.status == winner.status != PendingPostStatus.PENDING
+
+        assert pending_post.set_admin_vote(admin_id=2, approval=True) == -1
+        assert pending_post.get_votes(vote=True) == 1
+        assert not pending_post.claim_decision(PendingPostStatus.APPROVED)
+
+        # the posts being decided are left alone by the clean up
+        assert PendingPost.get_all(admin_group_id=-1) == []
+        assert PendingPost.get_remaining(admin_group_id=-1) == (0, None)
+        assert PendingPost.pop_all(admin_group_id=-1) == []
+
+        await winner.arelease_decision()
+        assert winner.status == PendingPostStatus.PENDING
+        assert PendingPost.from_group(g_message_id=1, admin_group_id=-1).status == PendingPostStatus.PENDING
+        assert pending_post.set_admin_vote(admin_id=2, approval=True) == 2
+        assert PendingPost.get_remaining(admin_group_id=-1) == (1, 1)
+
+
+class TestUserStatus:
+    """Test the status snapshot of the User class"""
+
+    def test_load_status_empty(self, test_table: DbManager):
+        """Tests the status of a user without any moderation flag"""
+        assert User(1).load_status() == UserStatus(user_id=1)
+
+    def test_load_status(self, test_table: DbManager):
+        """Tests that load_status reads all the flags of the user, and only of that user"""
+        user = User(1)
+        user.ban()
+        user.become_credited()
+        DbManager.insert_into(
+            table_name="warned_users",
+            columns=("user_id", "warn_date", "expire_date"),
+            values=((1, datetime(2024, 1, 1), datetime.now()), (1, datetime(2024, 1, 2), datetime.now())),
+            multiple_rows=True,
+        )
+        DbManager.insert_into(table_name="muted_users", columns=("user_id", "expire_date"), values=(1, datetime.now()))
+        PendingPost(user_id=1, u_message_id=1, g_message_id=1, admin_group_id=-1, date=datetime.now()).save_post()
+
+        status = user.load_status()
+        assert status == UserStatus(
+            user_id=1, is_banned=True, is_muted=True, is_credited=True, is_pending=True, n_warns=2
+        )
+        assert status.is_banned == user.is_banned
+        assert status.is_muted == user.is_muted
+        assert status.is_credited == user.is_credited
+        assert status.is_pending == user.is_pending
+        assert status.n_warns == user.get_n_warns()
+        assert status.is_warn_bannable == user.is_warn_bannable
+        assert User(2).load_status() == UserStatus(user_id=2)
+
+    def test_status_is_immutable(self, test_table: DbManager):
+        """Tests that the snapshot cannot be modified"""
+        status = User(1).load_status()
+        with pytest.raises(AttributeError):
+            status.is_banned = True  # type: ignore[misc]
+
+    @pytest.mark.asyncio
+    async def test_aload_status(self, test_table: DbManager):
+        """Tests the awaitable version of load_status"""
+        User(1).ban()
+        assert await User(1).aload_status() == UserStatus(user_id=1, is_banned=True)
+
+
+class TestUserFlagsCache:
+    """Test the cache of the moderation flags of the users"""
+
+    @pytest.fixture(autouse=True)
+    def cache_settings(self):
+        """Restores the default settings of the cache before each test"""
+        Config.override_settings({"debug": {"user_cache_size": 1024, "user_cache_ttl": 300}})
+
+    def test_hit_and_miss(self, test_table: DbManager):
+        """Tests that a flag is read from the database only the first time"""
+        user = User(1)
+        assert not user.is_banned
+        assert (UserFlagsCache.hits, UserFlagsCache.misses) == (0, 1)
+        assert not user.is_banned
+        assert not User(1).is_banned
+        assert (UserFlagsCache.hits, UserFlagsCache.misses) == (2, 1)
+
+    def test_invalidation(self, test_table: DbManager):
+        """Tests that every method that changes a flag invalidates the cache"""
+        user = User(1)
+        assert not user.is_banned
+        user.ban()
+        assert user.is_banned
+        assert user.sban()
+        assert not user.is_banned
+
+        assert not user.is_credited
+        assert not user.become_credited()
+        assert user.is_credited
+        assert not user.become_anonym()
+        assert not user.is_credited
+
+    @pytest.mark.asyncio
+    async def test_invalidation_mute(self, test_table: DbManager):
+        """Tests that mute and unmute invalidate the cache"""
+        user = User(1)
+        assert not user.is_muted
+        await user.mute(bot=None, days=1)
+        assert user.is_muted
+        assert await user.unmute(bot=None)
+        assert not user.is_muted
+
+    def test_stale_value_not_stored(self, test_table: DbManager):
+        """Tests that a value read before an invalidation is not cached"""
+
+        def loader() -> bool:
+            UserFlagsCache.invalidate(1)  # simulate a concurrent write while the flag is being read
+            return False
+
+        assert not UserFlagsCache.get(1, "banned", loader)
+        assert UserFlagsCache.size() == 0
+
+    def test_stale_status_not_stored(self, test_table: DbManager, monkeypatch: pytest.MonkeyPatch):
+        """Tests that the flags loaded by load_status are not cached if they are invalidated during the query"""
+        select_values = DbManager.select_values
+
+        def select_and_ban(*args, **kwargs) -> dict:
+            status = select_values(*args, **kwargs)
+            User(1).ban()  # simulate a concurrent ban while the status is being read
+            return status
+
+        monkeypatch.setattr(DbManager, "select_values", select_and_ban)
+        assert not User(1).load_status().is_banned
+        monkeypatch.undo()
+        assert UserFlagsCache.size() == 0
+        assert User(1).is_banned
+
+    def test_lru_eviction(self, test_table: DbManager):
+        """Tests that the least recently used flags are evicted when the cache is full"""
+        Config.override_settings({"debug": {"user_cache_size": 2}})
+        assert not User(1).is_banned
+        assert not User(2).is_banned
+        assert not User(1).is_banned  # user 1 is now the most recently used
+        assert not User(3).is_banned  # user 2 is evicted
+
+        assert UserFlagsCache.size() == 2
+        misses = UserFlagsCache.misses
+        assert not User(1).is_banned
+        assert UserFlagsCache.misses == misses
+        assert not User(2).is_banned
+        assert UserFlagsCache.misses == misses + 1
+
+    def test_ttl(self, test_table: DbManager, monkeypatch: pytest.MonkeyPatch):
+        """Tests that the flags expire after the ttl"""
+        now = 1000.0
+        monkeypatch.setattr("spotted.data.user.time.monotonic", lambda: now)
+        assert not User(1).is_banned
+        DbManager.insert_into(table_name="banned_users", columns=("user_id",), values=(1,))
+        assert not User(1).is_banned  # still cached
+
+        now += Config.debug_get("user_cache_ttl") + 1
+        assert User(1).is_banned
+
+    def test_disabled(self, test_table: DbManager):
+        """Tests that a ttl of 0 disables the cache"""
+        Config.override_settings({"debug": {"user_cache_ttl": 0}})
+        assert not User(1).is_banned
+        assert not User(1).is_banned
+        assert UserFlagsCache.size() == 0
+        assert UserFlagsCache.hits == 0
+
+    def test_load_status_refreshes_cache(self, test_table: DbManager):
+        """Tests that the flags loaded by load_status are cached"""
+        DbManager.insert_into(table_name="credited_users", columns=("user_id",), values=(1,))
+        User(1).load_status()
+        assert User(1).is_credited
+        assert (UserFlagsCache.hits, UserFlagsCache.misses) == (1, 0)
+
+
+@pytest.mark.asyncio
+class TestChatCache:
+    """Test the cache of the chats retrieved from Telegram"""
+
+    @pytest.fixture(autouse=True)
+    def chat_cache(self):
+        """Restores the default settings of the cache and empties it before each test"""
+        Config.override_settings({"debug": {"chat_cache_size": 256, "chat_cache_ttl": 600}})
+        ChatCache.clear()
+
+    @staticmethod
+    def get_bot(delay: float = 0) -> SimpleNamespace:
+        """Returns a bot whose get_chat answers with a chat with the username equal to the id"""
+
+        async def get_chat(chat_id: int) -> SimpleNamespace:
+            await asyncio.sleep(delay)
+            return SimpleNamespace(id=chat_id, username=str(chat_id))
+
+        return SimpleNamespace(get_chat=AsyncMock(side_effect=get_chat))
+
+    async def test_hit_and_miss(self):
+        """Tests that a chat is retrieved from Telegram only the first time"""
+        bot = self.get_bot()
+        assert (await ChatCache.get_chat(bot, 1)).username == "1"
+        assert (await ChatCache.get_chat(bot, 1)).username == "1"
+        assert bot.get_chat.await_count == 1
+        assert (ChatCache.hits, ChatCache.misses) == (1, 1)
+
+    async def test_concurrent_requests(self):
+        """Tests that concurrent lookups of the same chat share a single request"""
+        bot = self.get_bot(delay=0.01)
+        chats = await asyncio.gather(*(ChatCache.get_chat(bot, chat_id) for chat_id in (1, 2, 1, 1, 2)))
+        assert [chat.username for chat in chats] == ["1", "2", "1", "1", "2"]
+        assert bot.get_chat.await_count == 2
+
+    async def test_cancelled_caller(self):
+        """Tests that a cancelled caller does not cancel the request for the others"""
+        bot = self.get_bot(delay=0.01)
+        first = asyncio.create_task(ChatCache.get_chat(bot, 1))
+        second = asyncio.create_task(ChatCache.get_chat(bot, 1))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert (await second).username == "1"
+        assert bot.get_chat.await_count == 1
+
+    async def test_errors_not_cached(self):
+        """Tests that a failed request is shared by the concurrent callers, but not cached"""
+        bot = SimpleNamespace(get_chat=AsyncMock(side_effect=[ValueError("chat not found"), SimpleNamespace(id=1)]))
+        results = await asyncio.gather(ChatCache.get_chat(bot, 1), ChatCache.get_chat(bot, 1), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert ChatCache.size() == 0
+        assert (await ChatCache.get_chat(bot, 1)).id == 1
+        assert bot.get_chat.await_count == 2
+
+    async def test_invalidation(self):
+        """Tests that an invalidated chat is retrieved again, even if it was being retrieved"""
+        bot = self.get_bot(delay=0.01)
+        task = asyncio.create_task(ChatCache.get_chat(bot, 1))
+        await asyncio.sleep(0)
+        ChatCache.invalidate(1)
+        await task
+        assert ChatCache.size() == 0
+
+        await ChatCache.get_chat(bot, 1)
+        ChatCache.invalidate(1)
+        await ChatCache.get_chat(bot, 1)
+        assert bot.get_chat.await_count == 3
+
+    async def test_lru_eviction(self):
+        """Tests that the least recently used chats are evicted when the cache is full"""
+        Config.override_settings({"debug": {"chat_cache_size": 2}})
+        bot = self.get_bot()
+        for chat_id in (1, 2, 1, 3):  # chat 2 is evicted
+            await ChatCache.get_chat(bot, chat_id)
+        assert ChatCache.size() == 2
+        await ChatCache.get_chat(bot, 1)
+        assert bot.get_chat.await_count == 3
+        await ChatCache.get_chat(bot, 2)
+        assert bot.get_chat.await_count == 4
+
+    async def test_ttl(self, monkeypatch: pytest.MonkeyPatch):
+        """Tests that the chats expire after the ttl"""
+        now = 1000.0
+        monkeypatch.setattr("spotted.data.chat_cache.time.monotonic", lambda: now)
+        bot = self.get_bot()
+        await ChatCache.get_chat(bot, 1)
+        await ChatCache.get_chat(bot, 1)
+        assert bot.get_chat.await_count == 1
+
+        now += Config.debug_get("chat_cache_ttl") + 1
+        await ChatCache.get_chat(bot, 1)
+        assert bot.get_chat.await_count == 2
+
+    async def test_disabled(self):
+        """Tests that a ttl of 0 disables the cache"""
+        Config.override_settings({"debug": {"chat_cache_ttl": 0}})
+        bot = self.get_bot()
+        await ChatCache.get_chat(bot, 1)
+        await ChatCache.get_chat(bot, 1)
+        assert ChatCache.size() == 0
+        assert bot.get_chat.await_count == 2
+
+
+MODEL_QUERIES = {
+    "pending_post_from_group": ("SELECT * FROM pending_post WHERE admin_group_id = ? and g_message_id = ?", (1, 1)),
+    "pending_post_from_user": ("SELECT * FROM pending_post WHERE user_id = ?", (1,)),
+    "pending_post_get_all": ("SELECT * FROM pending_post WHERE admin_group_id = ? ORDER BY g_message_id", (1,)),
+    "pending_post_get_all_before": (
+        "SELECT * FROM pending_post WHERE admin_group_id = ? and (message_date < ? or message_date IS NULL) "
+        "ORDER BY g_message_id",
+        (1, "2024-01-01"),
+    ),
+    "pending_post_remaining": (
+        "SELECT COUNT(*) as number, MIN(g_message_id) as oldest FROM pending_post "
+        "WHERE admin_group_id = ? and g_message_id != ?",
+        (1, 1),
+    ),
+    "pending_post_votes": (
+        "SELECT approve_count FROM pending_post WHERE admin_group_id = ? and g_message_id = ?",
+        (1, 1),
+    ),
+    "admin_votes_list": (
+        "SELECT admin_id, is_upvote FROM admin_votes WHERE g_message_id = ? and admin_group_id = ?",
+        (1, 1),
+    ),
+    "user_follow_following_users": (
+        "SELECT user_id, private_message_id, follow_date FROM user_follow WHERE message_id = ?",
+        (1,),
+    ),
+    "user_follow_is_following": ("SELECT COUNT(*) FROM user_follow WHERE user_id = ? and message_id = ?", (1, 1)),
+    "banned_users": ("SELECT COUNT(*) as number FROM banned_users WHERE user_id = ?", (1,)),
+    "muted_users": ("SELECT COUNT(*) as number FROM muted_users WHERE user_id = ?", (1,)),
+    "credited_users": ("SELECT COUNT(*) as number FROM credited_users WHERE user_id = ?", (1,)),
+    "warned_users": ("SELECT COUNT(*) as number FROM warned_users WHERE user_id = ?", (1,)),
+    "user_report_last": ("SELECT * FROM user_report WHERE user_id = ? ORDER BY message_date DESC", (1,)),
+    "user_report_from_group": ("SELECT * FROM user_report WHERE admin_group_id = ? and g_message_id = ?", (1, 1)),
+    "spot_report_get": (
+        "SELECT * FROM spot_report WHERE user_id = ? and channel_id = ? and c_message_id = ?",
+        (1, 1, 1),
+    ),
+    "spot_report_from_group": ("SELECT * FROM spot_report WHERE admin_group_id = ? and g_message_id = ?", (1, 1)),
+    "published_post_from_channel": (
+        "SELECT * FROM published_post WHERE channel_id = ? and c_message_id = ?",
+        (1, 1),
+    ),
+}
+
+
+class TestPostAuthorStore:
+    """Test the store of the authors of the posts published on the channel"""
+
+    @pytest.fixture(autouse=True)
+    def post_author_store(self):
+        """Restores the default settings of the store before each test"""
+        Config.override_settings({"debug": {"post_author_ttl": 86400, "post_author_cache_size": 256}})
+
+    def test_set_pop(self, test_table: DbManager):
+        """Tests that the author of a post is returned once, and survives the in-memory entries being lost"""
+        PostAuthorStore.set(channel_id=-2, c_message_id=10, user_id=1)
+        PostAuthorStore.set(channel_id=-2, c_message_id=11, user_id=2)
+        assert PostAuthorStore.get(channel_id=-2, c_message_id=10) == 1
+
+        PostAuthorStore.clear_cache()  # simulates a restart of the bot
+        assert PostAuthorStore.get(channel_id=-2, c_message_id=11) == 2
+        assert PostAuthorStore.pop(channel_id=-2, c_message_id=11) == 2
+        assert PostAuthorStore.pop(channel_id=-2, c_message_id=11) is None
+        assert PostAuthorStore.pop(channel_id=-3, c_message_id=10) is None
+        assert DbManager.count_from(table_name="post_author") == 1
+
+    def test_bounded_cache(self, test_table: DbManager):
+        """Tests that only the most recent entries are kept in memory, while all of them are stored"""
+        Config.override_settings({"debug": {"post_author_cache_size": 2}})
+        for c_message_id in range(5):
+            PostAuthorStore.set(channel_id=-2, c_message_id=c_message_id, user_id=c_message_id + 1)
+
+        assert PostAuthorStore.size() == 2
+        assert DbManager.count_from(table_name="post_author") == 5
+        assert [PostAuthorStore.pop(channel_id=-2, c_message_id=i) for i in range(5)] == [1, 2, 3, 4, 5]
+        assert PostAuthorStore.size() == 0
+
+    @pytest.mark.asyncio
+    async def test_expiration(self, test_table: DbManager):
+        """Tests that the expired entries are not returned, and they are removed when a new one is stored"""
+        Config.override_settings({"debug": {"post_author_ttl": -1}})
+        await PostAuthorStore.aset(channel_id=-2, c_message_id=10, user_id=1)
+        assert PostAuthorStore.get(channel_id=-2, c_message_id=10) is None
+        PostAuthorStore.clear_cache()
+        assert PostAuthorStore.get(channel_id=-2, c_message_id=10) is None
+
+        Config.override_settings({"debug": {"post_author_ttl": 86400}})
+        await PostAuthorStore.aset(channel_id=-2, c_message_id=11, user_id=2)
+        assert DbManager.count_from(table_name="post_author") == 1
+        assert await PostAuthorStore.apop(channel_id=-2, c_message_id=11) == 2
+
+
+@pytest.mark.asyncio
+class TestSqlitePersistence:
+    """Test the persistence of the data of the bot in the database"""
+
+    async def test_store_and_load(self, test_table: DbManager):
+        """Tests that the data handed over by the application is loaded back by a new instance"""
+        persistence = SqlitePersistence()
+        await persistence.update_user_data(1, {"show_preview": True})
+        await persistence.update_chat_data(-1, {"key": "value"})
+        await persistence.update_bot_data({"key": [1, 2]})
+        await persistence.update_conversation("spot", (1, 1), 2)
+        await persistence.flush()
+
+        restarted = SqlitePersistence()
+        assert await restarted.get_user_data() == {1: {"show_preview": True}}
+        assert await restarted.get_chat_data() == {-1: {"key": "value"}}
+        assert await restarted.get_bot_data() == {"key": [1, 2]}
+        assert await restarted.get_conversations("spot") == {(1, 1): 2}
+        assert await restarted.get_conversations("report_user") == {}
+        assert await restarted.get_callback_data() is None
+
+        await restarted.update_conversation("spot", (1, 1), None)  # the conversation ended
+        await restarted.drop_user_data(1)
+        await restarted.flush()
+        assert DbManager.count_from(table_name="persistence") == 2
+
+    async def test_dirty_tracking(self, test_table: DbManager, mocker):
+        """Tests that only the changed entries are written, all together in a single transaction"""
+        transaction = mocker.spy(DbManager, "transaction")
+        persistence = SqlitePersistence()
+        for user_id in range(5):
+            await persistence.update_user_data(user_id, {"n": user_id})
+        assert persistence.pending_writes == 5
+        await persistence.flush()
+        assert transaction.call_count == 1
+        assert persistence.pending_writes == 0
+
+        await persistence.update_user_data(1, {"n": 1})  # unchanged
+        await persistence.update_user_data(2, {"n": 3})
+        assert persistence.pending_writes == 1
+        await persistence.update_user_data(2, {"n": 2})  # changed back before being written
+        assert persistence.pending_writes == 0
+        await persistence.flush()
+        assert transaction.call_count == 1
+
+    async def test_flush_single_writer(self, test_table: DbManager, monkeypatch: pytest.MonkeyPatch):
+        """Tests that the entries changed while the remaining ones are being flushed are written by the same task,
+        so that two writes never run at the same time
+        """
+        persistence = SqlitePersistence()
+        run_async = DbManager.run_async
+        writers = 0
+        max_writers = 0
+        calls = 0
+
+        async def write(function: Callable, entries: dict) -> Any:
+            nonlocal writers, max_writers, calls
+            calls += 1
+            writers += 1
+            max_writers = max(max_writers, writers)
+            try:
+                if calls == 1:
+                    raise sqlite3.OperationalError("database is locked")
+                if calls == 2:
+                    await persistence.update_user_data(2, {"n": 2})  # changed while the flush is writing
+                await asyncio.sleep(0.01)
+                return await run_async(function, entries)
+            finally:
+                writers -= 1
+
+        monkeypatch.setattr(DbManager, "run_async", write)
+        await persistence.update_user_data(1, {"n": 1})
+        await persistence.flush()
+        assert max_writers == 1
+        assert persistence.pending_writes == 0
+        assert DbManager.count_from(table_name="persistence") == 2
+
+
+class TestIndexes:
+    """Test that the queries run by the data classes do not scan whole tables"""
+
+    @pytest.mark.parametrize("query_name", MODEL_QUERIES.keys())
+    def test_query_uses_index(self, test_table: DbManager, query_name: str):
+        """Tests that the query plan of each model query searches an index instead of scanning the table"""
+        query, args = MODEL_QUERIES[query_name]
+
+        with test_table.get_pool().reader() as conn:
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", args).fetchall()]
+
+        assert any("USING" in step and ("INDEX" in step or "PRIMARY KEY" in step) for step in plan), plan
+        assert not any(step.startswith("SCAN") for step in plan), plan
+        assert not any("TEMP B-TREE" in step for step in plan), plan
@@ -0,0 +1,108 @@
+# pylint: disable=unused-argument,redefined-outer-name
+"""Tests the versioned migrations of the database schema"""
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from spotted.data import DbManager, MigrationManager
+
+
+@pytest.fixture(scope="function")
+def migrations_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Points the migration manager to an empty temporary folder"""
+    monkeypatch.setattr(MigrationManager, "MIGRATIONS_PATH", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture(scope="function")
+def empty_db(test_table: DbManager) -> DbManager:
+    """Resets the database to a schema version of 0, with no tables"""
+    test_table.query_from_file("config", "db", "post_db_del.sql")
+    return test_table
+
+
+class TestMigrations:
+    """Tests the MigrationManager class"""
+
+    def test_migrate_fresh_db(self, empty_db: DbManager):
+        """A fresh database is brought to the latest version"""
+        assert MigrationManager.get_current_version() == 0
+        applied = MigrationManager.migrate()
+        assert [migration.version for migration in applied] == list(range(1, MigrationManager.get_latest_version() + 1))
+        assert MigrationManager.get_current_version() == MigrationManager.get_latest_version()
+        assert DbManager.count_from(table_name="pending_post") == 0
+
+    def test_migrate_up_to_date(self, test_table: DbManager):
+        """An up to date database does not apply any migration"""
+        assert MigrationManager.get_current_version() == MigrationManager.get_latest_version()
+        assert MigrationManager.migrate() == []
+
+    def test_migrate_target_version(self, empty_db: DbManager):
+        """Only the migrations up to the target version are applied"""
+        applied = MigrationManager.migrate(target_version=1)
+        assert [migration.version for migration in applied] == [1]
+        assert MigrationManager.get_current_version() == 1
+        applied = MigrationManager.migrate()
+        assert applied[0].version == 2
+        assert MigrationManager.get_current_version() == MigrationManager.get_latest_version()
+
+    def test_vote_counters_backfill(self, empty_db: DbManager):
+        """The vote counters are computed from the votes registered before the migration"""
+        MigrationManager.migrate(target_version=2)
+        DbManager.insert_into(
+            table_name="pending_post",
+            columns=("user_id", "u_message_id", "g_message_id", "admin_group_id"),
+            values=(1, 1, 1, -1),
+        )
+        DbManager.insert_into(
+            table_name="admin_votes",
+            columns=("admin_id", "g_message_id", "admin_group_id", "is_upvote"),
+            values=((1, 1, -1, True), (2, 1, -1, True), (3, 1, -1, False)),
+            multiple_rows=True,
+        )
+        MigrationManager.migrate(target_version=3)
+
+        assert DbManager.select_from(table_name="pending_post", select="approve_count, reject_count") == [
+            {"approve_count": 2, "reject_count": 1}
+        ]
+
+    def test_failing_migration_rollback(self, empty_db: DbManager, migrations_path: Path):
+        """A failing migration leaves the database untouched, while the previous ones are kept"""
+        (migrations_path / "0001_first.sql").write_text("CREATE TABLE first (id INTEGER)", encoding="utf-8")
+        (migrations_path / "0002_broken.sql").write_text(
+            "CREATE TABLE second (id INTEGER)\n-----\nINSERT INTO missing_table VALUES (1)", encoding="utf-8"
+        )
+        with pytest.raises(sqlite3.Error):
+            MigrationManager.migrate()
+        assert MigrationManager.get_current_version() == 1
+        tables = {row["name"] for row in DbManager.select_from("sqlite_master", "name", "type = 'table'")}
+        assert "first" in tables
+        assert "second" not in tables
+
+    def test_migration_ending_transaction(self, empty_db: DbManager, migrations_path: Path):
+        """The error of a migration whose failing statement has already rolled back the transaction is not hidden"""
+        (migrations_path / "0001_conflict.sql").write_text(
+            "CREATE TABLE unique_ids (id INTEGER UNIQUE ON CONFLICT ROLLBACK)\n-----\n"
+            "INSERT INTO unique_ids VALUES (1)\n-----\nINSERT INTO unique_ids VALUES (1)",
+            encoding="utf-8",
+        )
+        with pytest.raises(sqlite3.IntegrityError):
+            MigrationManager.migrate()
+        assert MigrationManager.get_current_version() == 0
+        tables = {row["name"] for row in DbManager.select_from("sqlite_master", "name", "type = 'table'")}
+        assert "unique_ids" not in tables
+
+    def test_non_contiguous_migrations(self, migrations_path: Path):
+        """Migrations with a missing version are rejected"""
+        (migrations_path / "0001_first.sql").write_text("SELECT 1", encoding="utf-8")
+        (migrations_path / "0003_third.sql").write_text("SELECT 1", encoding="utf-8")
+        (migrations_path / "README.md").write_text("not a migration", encoding="utf-8")
+        with pytest.raises(ValueError):
+            MigrationManager.get_migrations()
+
+    def test_no_migrations(self, migrations_path: Path):
+        """An empty migrations folder has version 0"""
+        assert MigrationManager.get_migrations() == []
+        assert MigrationManager.get_latest_version() == 0
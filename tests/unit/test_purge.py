@@ -0,0 +1,195 @@
+# pylint: disable=unused-argument,redefined-outer-name
+"""Tests the /purge command and the background check of the published posts"""
+
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from telegram import Chat, Message, MessageId, Update, User
+from telegram.error import BadRequest
+from telegram.ext import CallbackContext
+
+from spotted.data import Config, DbManager, PublishedPost, PurgeCheckpoint
+from spotted.handlers.job_handlers import resume_purge_job
+from spotted.handlers.purge import purge_cmd
+from spotted.utils.purge_util import PurgeEngine, purge_engine
+
+CHANNEL_ID = -100
+
+
+@pytest.fixture(scope="function")
+def purge_bot(mock_bot: AsyncMock) -> AsyncMock:
+    """Return a bot whose channel contains only the posts with an even id, and records the forwarded ids"""
+    mock_bot.forwarded = []
+
+    async def forward_messages(chat_id: int, from_chat_id: int, message_ids: list[int], **kwargs) -> tuple:
+        mock_bot.forwarded.append(list(message_ids))
+        return tuple(MessageId(message_id=1000 + message_id) for message_id in message_ids if message_id % 2 == 0)
+
+    mock_bot.forward_messages = AsyncMock(side_effect=forward_messages)
+    mock_bot.delete_messages = AsyncMock(return_value=True)
+    mock_bot.send_message = AsyncMock(return_value=MagicMock(message_id=42))
+    return mock_bot
+
+
+@pytest.fixture(autouse=True)
+def purge_settings():
+    """Restores the default settings of the purge before each test"""
+    Config.override_settings({"debug": {"purge_concurrency": 2, "purge_progress_interval": 30}})
+
+
+def add_posts(*c_message_ids: int, channel_id: int = CHANNEL_ID):
+    """Adds some published posts to the database"""
+    for c_message_id in c_message_ids:
+        PublishedPost.create(channel_id=channel_id, c_message_id=c_message_id)
+
+
+def get_post_ids() -> list[int]:
+    """Returns the ids of the published posts still in the database"""
+    return [post.c_message_id for post in PublishedPost.get_after(limit=1000)]
+
+
+@pytest.mark.asyncio
+class TestPurgeEngine:
+    """Tests the PurgeEngine class"""
+
+    async def test_find_lost(self, test_table: DbManager, purge_bot: AsyncMock):
+        """Tests that the lost posts are found by splitting the batch, and the forwarded copies are deleted"""
+        posts = [PublishedPost(channel_id=CHANNEL_ID, c_message_id=i, date=datetime.now()) for i in (2, 4, 6, 7)]
+        lost = await PurgeEngine().find_lost(purge_bot, 1, posts)
+        assert [post.c_message_id for post in lost] == [7]
+        assert purge_bot.forwarded == [[2, 4, 6, 7], [2, 4], [6, 7], [6], [7]]
+        assert purge_bot.delete_messages.await_count == 4
+
+    async def test_find_lost_all(self, test_table: DbManager, purge_bot: AsyncMock):
+        """Tests that no split is needed when all or none of the posts exist"""
+        engine = PurgeEngine()
+        posts = [PublishedPost(channel_id=CHANNEL_ID, c_message_id=i, date=datetime.now()) for i in (1, 3, 5)]
+        assert await engine.find_lost(purge_bot, 1, posts) == posts
+        posts = [PublishedPost(channel_id=CHANNEL_ID, c_message_id=i, date=datetime.now()) for i in (2, 4)]
+        assert await engine.find_lost(purge_bot, 1, posts) == []
+        assert len(purge_bot.forwarded) == 2
+
+        purge_bot.forward_messages.side_effect = BadRequest("Message to forward not found")
+        assert await engine.find_lost(purge_bot, 1, posts) == posts
+
+    async def test_run(self, test_table: DbManager, purge_bot: AsyncMock):
+        """Tests that the lost posts are deleted in batches of at most 100 posts of the same channel"""
+        add_posts(*range(1, 251))
+        add_posts(1, 2, channel_id=-200)
+        checkpoint = PurgeCheckpoint(chat_id=1, total=252).save()
+
+        await PurgeEngine().run(purge_bot, checkpoint)
+        assert all(len(batch) <= 100 for batch in purge_bot.forwarded)
+        assert {post.channel_id for post in PublishedPost.get_after(limit=1000)} == {CHANNEL_ID, -200}
+        assert get_post_ids() == [2] + list(range(2, 251, 2))
+        assert PurgeCheckpoint.load() is None
+        purge_bot.send_message.assert_awaited_with(1, text="Dei 252 totali, 126 sono andati persi. Il rapporto è 0.5")
+
+    async def test_resume(self, test_table: DbManager, purge_bot: AsyncMock):
+        """Tests that the posts before the checkpoint are not checked again"""
+        add_posts(*range(1, 11))
+        checkpoint = PurgeCheckpoint(chat_id=1, last_channel_id=CHANNEL_ID, last_c_message_id=6, checked=6).save()
+
+        await PurgeEngine().run(purge_bot, checkpoint)
+        assert purge_bot.forwarded[0] == [7, 8, 9, 10]
+        assert get_post_ids() == [1, 2, 3, 4, 5, 6, 8, 10]
+        assert checkpoint.checked == 10
+
+    async def test_interrupted(self, test_table: DbManager, purge_bot: AsyncMock):
+        """Tests that an unexpected error stops the purge, keeping the checkpoint and all the posts"""
+        Config.override_settings({"debug": {"purge_concurrency": 1}})
+        add_posts(*range(1, 151))
+        purge_bot.forward_messages.side_effect = [
+            tuple(MessageId(message_id=i) for i in range(100)),
+            BadRequest("Chat not found"),
+        ]
+        checkpoint = PurgeCheckpoint(chat_id=1).save()
+
+        await PurgeEngine().run(purge_bot, checkpoint)
+        assert PurgeCheckpoint.load() == PurgeCheckpoint(
+            chat_id=1, last_channel_id=CHANNEL_ID, last_c_message_id=100, checked=100
+        )
+        assert len(get_post_ids()) == 150
+
+    async def test_unexpected_error(self, test_table: DbManager, purge_bot: AsyncMock):
+        """Tests that an error that is not returned by Telegram in one of the batches is logged,
+        waiting for the other batches and keeping the checkpoint, so that the purge can be resumed
+        """
+        add_posts(*range(1, 151))
+        forward_messages = purge_bot.forward_messages.side_effect
+
+        async def failing_forward(chat_id: int, from_chat_id: int, message_ids: list[int], **kwargs) -> tuple:
+            if message_ids[0] > 100:
+                raise RuntimeError("unexpected")
+            return await forward_messages(chat_id, from_chat_id, message_ids, **kwargs)
+
+        purge_bot.forward_messages.side_effect = failing_forward
+        checkpoint = PurgeCheckpoint(chat_id=1).save()
+
+        await PurgeEngine().run(purge_bot, checkpoint)
+        assert PurgeCheckpoint.load() == PurgeCheckpoint(chat_id=1)
+        assert checkpoint == PurgeCheckpoint(chat_id=1)
+        assert len(get_post_ids()) == 150
+        purge_bot.send_message.assert_awaited_with(
+            1, text="✖️ Purge interrotto dopo 0 post: unexpected\nUsa /purge per riprenderlo"
+        )
+
+    async def test_progress(self, test_table: DbManager, purge_bot: AsyncMock):
+        """Tests that the progress message is updated"""
+        Config.override_settings({"debug": {"purge_progress_interval": 0}})
+        add_posts(1, 2)
+        checkpoint = PurgeCheckpoint(chat_id=1, progress_message_id=42, total=2).save()
+
+        await PurgeEngine().run(purge_bot, checkpoint)
+        purge_bot.edit_message_text.assert_awaited_once()
+        assert (
+            purge_bot.edit_message_text.await_args.kwargs["text"] == "Purge in corso: controllati 2 post su 2, 1 persi"
+        )
+
+
+@pytest.fixture(scope="function")
+def update() -> Update:
+    """Return a /purge command sent in the admin group"""
+    chat = Chat(id=Config.post_get("admin_group_id"), type=Chat.GROUP)
+    user = User(id=999, first_name="admin", is_bot=False)
+    message = Message(message_id=1, from_user=user, chat=chat, date=datetime.now(), text="/purge")
+    return Update(update_id=0, message=message)
+
+
+@pytest.mark.asyncio
+class TestPurgeCmd:
+    """Tests the /purge command handler"""
+
+    async def test_purge_cmd(
+        self, test_table: DbManager, update: Update, context_with_bot: CallbackContext, purge_bot: AsyncMock
+    ):
+        """Tests that the purge runs in the background, and a second /purge does not start another one"""
+        add_posts(1, 2)
+        await purge_cmd(update, context_with_bot)
+        assert purge_engine.running
+        assert PurgeCheckpoint.load() == PurgeCheckpoint(
+            chat_id=update.message.chat_id, progress_message_id=42, total=2
+        )
+
+        await purge_cmd(update, context_with_bot)
+        purge_bot.send_message.assert_awaited_with(update.message.chat_id, text="Il comando /purge è già in esecuzione")
+
+        await purge_engine.join()
+        assert get_post_ids() == [2]
+        assert PurgeCheckpoint.load() is None
+
+    async def test_resume_purge_job(
+        self, test_table: DbManager, context_with_bot: CallbackContext, purge_bot: AsyncMock
+    ):
+        """Tests that the purge interrupted by a restart is resumed"""
+        add_posts(1, 2, 3)
+        await resume_purge_job(context_with_bot)
+        assert not purge_engine.running
+
+        PurgeCheckpoint(chat_id=1, last_channel_id=CHANNEL_ID, last_c_message_id=1, checked=1, lost=1).save()
+        await resume_purge_job(context_with_bot)
+        assert purge_engine.running
+        await purge_engine.join()
+        assert purge_bot.forwarded == [[2, 3], [2], [3]]
+        purge_bot.send_message.assert_awaited_with(1, text="Dei 3 totali, 2 sono andati persi. Il rapporto è 0.667")
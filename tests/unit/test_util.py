@@ -1,13 +1,47 @@
 # pylint: disable=unused-argument redefined-outer-name
 """Tests the utility package"""
 
+import asyncio
+import re
 from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
 
 import pytest
 from telegram import CallbackQuery, Chat, Message, MessageOriginChat, Update, User
-from telegram.ext import Application, CallbackContext
-
+from telegram.ext import (
+    Application,
+    CallbackContext,
+    ConversationHandler,
+    MessageHandler,
+    filters,
+)
+
+from spotted.data import ChatCache, Config
 from spotted.utils import EventInfo
+from spotted.utils.blacklist_util import REGEX_MIN_WORDS, BlacklistMatcher
+from spotted.utils.callback_util import (
+    CallbackData,
+    CallbackRouter,
+    decode_autoreply,
+    encode_autoreply,
+    get_autoreplies_version,
+)
+from spotted.utils.constants import APPROVED_KB
+from spotted.utils.conversation_util import (
+    conv_timeout,
+    get_conversation_timeout,
+    live_conversations,
+)
+from spotted.utils.keyboard_util import (
+    KeyboardCache,
+    get_autoreply_kb,
+    get_confirm_kb,
+    get_paused_kb,
+    get_post_outcome_kb,
+    get_published_post_kb,
+)
+from spotted.utils.update_processor_util import ChatUpdateProcessor
 
 
 @pytest.fixture(scope="class")
@@ -212,3 +246,278 @@ class TestUtil:
             assert info.query_data is None
             assert info.forward_from_id is None
             assert info.forward_from_chat_id is None
+
+    @pytest.mark.asyncio
+    class TestKeyboardUtil:
+        """Tests the keyboard utilities"""
+
+        async def test_post_outcome_kb(self):
+            """Tests that the outcome keyboard shows the username of each voter, retrieving each of them once"""
+            ChatCache.clear()
+            bot = SimpleNamespace(
+                get_chat=AsyncMock(side_effect=lambda chat_id: SimpleNamespace(username=f"admin{chat_id}"))
+            )
+            keyboard = await get_post_outcome_kb(bot, [(1, True), (2, False), (3, True)])
+            assert [[button.text for button in row] for row in keyboard.inline_keyboard] == [
+                ["🟢 admin1", "🔴 admin2"],
+                ["🟢 admin3", ""],
+                [APPROVED_KB],
+            ]
+            assert bot.get_chat.await_count == 3
+
+            keyboard = await get_post_outcome_kb(bot, [(1, False), (2, False)], reason="spam")
+            assert keyboard.inline_keyboard[-1][0].text.endswith("[spam]")
+            assert bot.get_chat.await_count == 3
+
+        async def test_keyboard_cache(self):
+            """Tests that the keyboards are built once, until the configuration changes"""
+            KeyboardCache.clear()
+            assert get_confirm_kb() is get_confirm_kb()
+            assert get_paused_kb(0, 6) is get_paused_kb(0, 6)
+            assert get_paused_kb(1, 6) is not get_paused_kb(0, 6)
+            assert KeyboardCache.misses == 5  # each paused page also builds the autoreply rows of the page
+            assert KeyboardCache.hits == 3
+
+            rows = get_autoreply_kb(0, 6)
+            rows.append([])  # the returned rows can be modified without affecting the cache
+            assert get_autoreply_kb(0, 6) == rows[:-1]
+
+            report = Config.post_get("report")
+            Config.override_settings({"post": {"report": not report}})
+            assert KeyboardCache.size() > 0
+            published_post_kb = get_published_post_kb()
+            assert KeyboardCache.size() == 1
+            assert (len(published_post_kb.inline_keyboard) == 2) is not report
+            Config.override_settings({"post": {"report": report}})
+            assert get_published_post_kb() is not published_post_kb
+
+    @pytest.mark.asyncio
+    class TestUpdateProcessor:
+        """Tests the ChatUpdateProcessor class"""
+
+        @staticmethod
+        def make_update(chat_id: int, chat_type: str = "private", query_message_id: int | None = None) -> Update:
+            """Creates an update coming from the given chat, with a callback query if a message id is provided"""
+            chat = Chat(chat_id, chat_type)
+            user = User(1, "user", False)
+            message = Message(query_message_id or 1, datetime.now(), chat, from_user=user)
+            if query_message_id is None:
+                return Update(0, message=message)
+            return Update(0, callback_query=CallbackQuery("1", user, "instance", message=message, data="approve_yes"))
+
+        async def test_update_key(self):
+            """Tests the key the updates are serialized by"""
+            assert ChatUpdateProcessor.get_update_key(self.make_update(5)) == ("chat", 5)
+            assert ChatUpdateProcessor.get_update_key(self.make_update(5, query_message_id=3)) == ("chat", 5)
+            assert ChatUpdateProcessor.get_update_key(self.make_update(-5, "supergroup")) == ("chat", -5)
+            assert ChatUpdateProcessor.get_update_key(self.make_update(-5, "supergroup", 3)) == ("message", -5, 3)
+            assert ChatUpdateProcessor.get_update_key(Update(0)) is None
+            assert ChatUpdateProcessor.get_update_key(object()) is None
+
+        async def test_process_updates(self):
+            """Tests that updates with different keys run in parallel, while the ones with the same key keep their order"""
+            processor = ChatUpdateProcessor(16)
+            events = []
+            gates = {key: asyncio.Event() for key in ("a1", "a2", "b1", "c1")}
+
+            async def handle(name: str):
+                events.append(f"start {name}")
+                await gates[name].wait()
+                events.append(f"end {name}")
+
+            updates = [
+                ("a1", self.make_update(1)),
+                ("a2", self.make_update(1)),
+                ("b1", self.make_update(2)),
+                ("c1", self.make_update(-3, "supergroup", 7)),
+            ]
+            tasks = [asyncio.create_task(processor.process_update(update, handle(name))) for name, update in updates]
+            await asyncio.sleep(0)
+            assert events == ["start a1", "start b1", "start c1"]
+            assert processor.active_keys == 3
+
+            gates["a2"].set()  # a2 must still wait for a1, even if it could complete
+            await asyncio.sleep(0)
+            assert "start a2" not in events
+
+            gates["a1"].set()
+            gates["b1"].set()
+            gates["c1"].set()
+            await asyncio.gather(*tasks)
+            assert events.index("end a1") < events.index("start a2")
+            assert processor.active_keys == 0
+
+        async def test_waiting_updates_free_slots(self):
+            """Tests that the updates waiting for their turn don't take the slots of the updates of other chats"""
+            processor = ChatUpdateProcessor(2)
+            events = []
+            gate = asyncio.Event()
+
+            async def handle(name: str):
+                events.append(f"start {name}")
+                await gate.wait()
+
+            tasks = [
+                asyncio.create_task(processor.process_update(self.make_update(-3, "supergroup"), handle(f"group{i}")))
+                for i in range(3)
+            ]
+            tasks.append(asyncio.create_task(processor.process_update(self.make_update(1), handle("private"))))
+            await asyncio.sleep(0)
+            assert events == ["start group0", "start private"]
+            assert processor.current_concurrent_updates == 2
+
+            gate.set()
+            await asyncio.gather(*tasks)
+            assert events == ["start group0", "start private", "start group1", "start group2"]
+            assert processor.active_keys == 0
+
+    @pytest.mark.asyncio
+    class TestConversationUtil:
+        """Tests the conversation utilities"""
+
+        async def test_conversation_timeout(self):
+            """Tests the timeouts read from the settings, where 0 means no timeout"""
+            Config.override_settings({"debug": {"conversation_timeouts": {"spot": 0, "report_user": 60}}})
+            assert get_conversation_timeout("spot") is None
+            assert get_conversation_timeout("report_user") == 60
+            assert get_conversation_timeout("unknown") is None
+            Config.override_settings({"debug": {"conversation_timeouts": {"spot": 1800, "report_user": 600}}})
+
+        async def test_conv_timeout(self, get_message: Message):
+            """Tests that the timeout frees the user_data of the conversation and notifies the user"""
+            update = Update(0, message=get_message)
+            application = SimpleNamespace(drop_user_data=Mock())
+            context = SimpleNamespace(
+                user_data={"current_report_target": "@user", "show_preview": False},
+                application=application,
+                bot=SimpleNamespace(send_message=AsyncMock()),
+            )
+            timeout = conv_timeout("report", ("current_report_target",))
+
+            await timeout(update, context)
+            assert context.user_data == {"show_preview": False}
+            application.drop_user_data.assert_not_called()
+            context.bot.send_message.assert_awaited_once()
+            assert context.bot.send_message.await_args.kwargs["chat_id"] == get_message.from_user.id
+
+            Config.override_settings({"debug": {"conversation_timeout_notify": False}})
+            await conv_timeout("spot", ("show_preview",))(update, context)
+            application.drop_user_data.assert_called_once_with(get_message.from_user.id)
+            assert context.bot.send_message.await_count == 1
+            Config.override_settings({"debug": {"conversation_timeout_notify": True}})
+
+        async def test_live_conversations(self, app: Application, get_message: Message):
+            """Tests that the conversations in progress are counted for each named conversation handler"""
+
+            async def start(_: Update, __: CallbackContext) -> int:
+                return 1
+
+            conversation = ConversationHandler(
+                entry_points=[MessageHandler(filters.TEXT, start)], states={1: []}, fallbacks=[], name="test"
+            )
+            app.add_handler(conversation, group=10)
+            assert live_conversations(app) == {"test": 0}
+            update = Update(0, message=get_message)
+            check = conversation.check_update(update)
+            await conversation.handle_update(update, app, check, CallbackContext.from_update(update, app))
+            assert live_conversations(app) == {"test": 1}
+            app.remove_handler(conversation, group=10)
+
+    @pytest.mark.asyncio
+    class TestCallbackUtil:
+        """Tests the routing of the callback queries"""
+
+        async def test_callback_router(self, app: Application, get_callback_query: CallbackQuery):
+            """Tests that the router parses the callback data once and calls the callback of its prefix"""
+            settings_callback = AsyncMock()
+            router = CallbackRouter({"settings": settings_callback})
+            update = Update(0, callback_query=get_callback_query)
+            assert router.check_update(update) is None  # 'Test data' has no registered prefix
+            assert router.check_update(Update(0, message=get_callback_query.message)) is None
+
+            query = CallbackQuery(
+                id="11",
+                from_user=get_callback_query.from_user,
+                chat_instance="Test chat",
+                message=get_callback_query.message,
+                data="settings,anonimo",
+            )
+            update = Update(1, callback_query=query)
+            check = router.check_update(update)
+            assert check == CallbackData("settings", ("anonimo",))
+
+            context = CallbackContext.from_update(update, app)
+            await router.handle_update(update, app, check, context)
+            settings_callback.assert_awaited_once_with(update, context)
+            assert await router.handle_update(update, app, None, context) is None
+            settings_callback.assert_awaited_once()
+            assert context.args == ["anonimo"]
+            assert EventInfo.from_callback(update, context).args == ["anonimo"]
+
+            router.add_route("approve_yes", AsyncMock())
+            assert router.check_update(
+                Update(2, callback_query=CallbackQuery("12", query.from_user, "c", data="approve_yes"))
+            )
+
+        async def test_autoreply_short_ids(self):
+            """Tests that the autoreply buttons carry a short versioned id, which is resolved back to the key"""
+            keys = list(Config.autoreplies_get("autoreplies"))
+            for key in keys:
+                data = encode_autoreply(key)
+                assert len(data.encode()) <= 64
+                assert decode_autoreply(CallbackData.parse(data).args) == key
+
+            version = get_autoreplies_version()
+            assert decode_autoreply([keys[0]]) == keys[0]  # buttons sent before the short ids
+            assert decode_autoreply(["000000" if version != "000000" else "ffffff", "0"]) is None  # stale version
+            assert decode_autoreply([version, str(len(keys))]) is None
+            assert decode_autoreply(["unknown key"]) is None
+
+    class TestBlacklistUtil:
+        """Tests the matching of the comments against the blacklist"""
+
+        def test_build_regex(self):
+            """Tests that the words are merged in a single expression, sharing their prefixes"""
+            assert BlacklistMatcher.build_regex([]) == ""
+            assert BlacklistMatcher.build_regex(["", "spam"]) == "spam"
+            assert BlacklistMatcher.build_regex(["spam", "spa", "spot"]) == "sp(?:ot|a)"
+            regex = BlacklistMatcher.build_regex(["ab", "ac", "a.d", "b+"])
+            assert regex == r"(?:a(?:\.d|[bc])|b\+)"
+            pattern = re.compile(regex)
+            assert pattern.search("xx a.d yy") and pattern.search("b+") and pattern.search("cab")
+            assert not pattern.search("aad") and not pattern.search("bb")
+
+        def test_matches(self):
+            """Tests the matcher with the options of the configuration, recompiled each time they change"""
+            blacklist = Config.post_get("blacklist_messages")
+            Config.override_settings({"post": {"blacklist_messages": ["spam", "Free Money"]}})
+            assert BlacklistMatcher.matches("this is spam!")
+            assert BlacklistMatcher.matches("get Free Money now")
+            assert not BlacklistMatcher.matches("get free money now")
+            assert not BlacklistMatcher.matches("sраm")  # cyrillic 'р' and 'а'
+
+            Config.override_settings({"post": {"blacklist_ignore_case": True}})
+            assert BlacklistMatcher.matches("get FREE money now")
+            assert not BlacklistMatcher.matches("ｓｐａｍ")
+
+            Config.override_settings({"post": {"blacklist_normalize": True}})
+            for evasion in ("ｓｐａｍ", "sраm", "s\u200bpam", "sp\u00e1m", "FRЕЕ MОNЕY"):
+                assert BlacklistMatcher.matches(evasion), evasion
+            assert not BlacklistMatcher.matches("a regular comment")
+
+            long_blacklist = [f"spam{i}word" for i in range(REGEX_MIN_WORDS)]
+            Config.override_settings({"post": {"blacklist_messages": long_blacklist}})
+            assert BlacklistMatcher.matches("SPAM42WОRD")  # cyrillic 'О'
+            assert not BlacklistMatcher.matches("spam42 word")
+
+            Config.override_settings({"post": {"blacklist_messages": []}})
+            assert not BlacklistMatcher.matches("this is spam!")
+            Config.override_settings(
+                {
+                    "post": {
+                        "blacklist_messages": blacklist,
+                        "blacklist_normalize": False,
+                        "blacklist_ignore_case": False,
+                    }
+                }
+            )
@@ -0,0 +1,193 @@
+# pylint: disable=redefined-outer-name
+"""Tests the embedded webhook server"""
+
+import asyncio
+import json
+from collections.abc import AsyncGenerator
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+import pytest_asyncio
+from telegram import Update
+from telegram.ext import Application
+
+from spotted import run_webhook
+from spotted.data import Config
+from spotted.utils.webhook_util import WebhookServer
+
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 10,
+        "date": 1700000000,
+        "chat": {"id": 5, "type": "private", "first_name": "user"},
+        "from": {"id": 5, "is_bot": False, "first_name": "user"},
+        "text": "/start",
+    },
+}
+
+
+@pytest_asyncio.fixture(scope="function")
+async def server() -> AsyncGenerator[WebhookServer, None]:
+    """Return a webhook server listening on a free local port"""
+    app = Application.builder().token("1234567890:qY9gv7pRJgFj4EVmN3Z1gfJOgQpCbh0vmp5").updater(None).build()
+    webhook_server = WebhookServer(app, listen="127.0.0.1", port=0, url_path="webhook", secret_token="secret")
+    await webhook_server.start()
+    yield webhook_server
+    await webhook_server.stop()
+
+
+class HttpClient:
+    """Minimal HTTP/1.1 client that keeps the connection open between requests"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, port: int) -> "HttpClient":
+        """Opens a connection to the local port"""
+        return cls(*await asyncio.open_connection("127.0.0.1", port))
+
+    async def request(
+        self, method: str, path: str, body: bytes = b"", headers: dict[str, str] | None = None
+    ) -> tuple[int, dict[str, str], bytes]:
+        """Sends a request and returns the status, the headers and the body of the response"""
+        head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+        self.writer.write(head.encode() + b"\r\n" + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while (line := await self.reader.readline()) != b"\r\n":
+            name, _, value = line.decode().partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        content = await self.reader.readexactly(int(response_headers["content-length"]))
+        return status, response_headers, content
+
+    async def close(self):
+        """Closes the connection"""
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+@pytest.mark.asyncio
+class TestWebhookServer:
+    """Tests the WebhookServer class"""
+
+    async def test_receive_update(self, server: WebhookServer):
+        """Tests that the updates posted with the right secret token are put in the update queue,
+        using the same connection for multiple requests
+        """
+        client = await HttpClient.connect(server.port)
+        headers = {"X-Telegram-Bot-Api-Secret-Token": "secret", "Content-Type": "application/json"}
+        for update_id in (1, 2):
+            body = json.dumps(UPDATE | {"update_id": update_id}).encode()
+            status, response_headers, _ = await client.request("POST", "/webhook", body, headers)
+            assert status == 200
+            assert response_headers["connection"] == "keep-alive"
+        await client.close()
+
+        first = await server.application.update_queue.get()
+        second = await server.application.update_queue.get()
+        assert isinstance(first, Update)
+        assert (first.update_id, second.update_id) == (1, 2)
+        assert first.message.text == "/start"
+
+    async def test_rejected_requests(self, server: WebhookServer):
+        """Tests that the invalid requests are rejected without queueing any update"""
+        client = await HttpClient.connect(server.port)
+        body = json.dumps(UPDATE).encode()
+        secret = {"X-Telegram-Bot-Api-Secret-Token": "secret"}
+        assert (await client.request("POST", "/webhook", body))[0] == 403
+        assert (await client.request("POST", "/webhook", body, {"X-Telegram-Bot-Api-Secret-Token": "wrong"}))[0] == 403
+        assert (await client.request("POST", "/webhook", b"{", secret))[0] == 400
+        for payload in (b"[]", b"1", b'"update"', b"null"):
+            assert (await client.request("POST", "/webhook", payload, secret))[0] == 400
+        assert (await client.request("POST", "/webhook", body, {"X-Telegram-Bot-Api-Secret-Token": "sécret"}))[0] == 403
+        assert (await client.request("GET", "/webhook"))[0] == 405
+        assert (await client.request("POST", "/other", body, secret))[0] == 404
+        await client.close()
+        assert server.application.update_queue.empty()
+
+    async def test_health(self, server: WebhookServer):
+        """Tests that the health endpoint reports whether the application is running"""
+        client = await HttpClient.connect(server.port)
+        status, _, content = await client.request("GET", "/health")
+        assert status == 503
+        assert json.loads(content) == {"status": "unavailable", "pending_updates": 0, "live_conversations": {}}
+
+        server.application = SimpleNamespace(running=True, update_queue=asyncio.Queue(), handlers={})
+        status, _, content = await client.request("GET", "/health")
+        assert status == 200
+        assert json.loads(content) == {"status": "ok", "pending_updates": 0, "live_conversations": {}}
+        await client.close()
+
+    async def test_connection_close(self, server: WebhookServer):
+        """Tests that the connection is closed when the client asks to"""
+        client = await HttpClient.connect(server.port)
+        _, headers, _ = await client.request("GET", "/health", headers={"Connection": "close"})
+        assert headers["connection"] == "close"
+        assert await client.reader.read() == b""
+        await client.close()
+
+    async def test_line_too_long(self, server: WebhookServer):
+        """Tests that a request line or a header longer than the limit of the stream is answered with an error"""
+        client = await HttpClient.connect(server.port)
+        status, headers, _ = await client.request("GET", "/health", headers={"X-Long": "a" * (1 << 17)})
+        assert status == 431
+        assert headers["connection"] == "close"
+        await client.close()
+
+        client = await HttpClient.connect(server.port)
+        status, _, _ = await client.request("GET", "/" + "a" * (1 << 17))
+        assert status == 400
+        await client.close()
+
+    async def test_stop_closes_idle_connections(self, server: WebhookServer):
+        """Tests that stopping the server does not wait for the idle keep-alive connections"""
+        client = await HttpClient.connect(server.port)
+        await client.request("GET", "/health")
+        await asyncio.wait_for(server.stop(), timeout=1)
+        assert await client.reader.read() == b""
+        await client.close()
+
+    async def test_secret_token_required(self):
+        """Tests that the server can not be created without a secret token"""
+        app = Application.builder().token("1234567890:qY9gv7pRJgFj4EVmN3Z1gfJOgQpCbh0vmp5").updater(None).build()
+        with pytest.raises(ValueError):
+            WebhookServer(app, listen="127.0.0.1", port=0, url_path="webhook", secret_token="")
+
+    async def test_run_webhook_random_secret_token(self):
+        """Tests that a random secret token is registered with the webhook if none is set"""
+        Config.override_settings(
+            {"debug": {"webhook_listen": "127.0.0.1", "webhook_port": 0, "webhook_secret_token": ""}}
+        )
+        application = Mock(running=False, post_init=None, post_shutdown=None)
+        application.initialize = AsyncMock()
+        application.start = AsyncMock()
+        application.shutdown = AsyncMock()
+        application.bot.set_webhook = AsyncMock(side_effect=RuntimeError("set_webhook failed"))
+
+        with pytest.raises(RuntimeError):
+            await run_webhook(application)
+        secret_token = application.bot.set_webhook.await_args.kwargs["secret_token"]
+        assert isinstance(secret_token, str) and len(secret_token) >= 32
+        application.shutdown.assert_awaited_once()
+        Config.override_settings({"debug": {"webhook_listen": "0.0.0.0", "webhook_port": 8080}})
+
+    async def test_run_webhook_failure(self):
+        """Tests that the application is shut down even if starting it fails"""
+        application = Mock(running=False, post_init=AsyncMock(side_effect=RuntimeError("post_init failed")))
+        application.initialize = AsyncMock()
+        application.shutdown = AsyncMock()
+        application.post_stop = AsyncMock()
+        application.post_shutdown = AsyncMock()
+
+        with pytest.raises(RuntimeError):
+            await run_webhook(application)
+        application.shutdown.assert_awaited_once()
+        application.post_shutdown.assert_awaited_once_with(application)
+        application.post_stop.assert_not_awaited()